@@ -0,0 +1,275 @@
+import numpy as np
+from OpenGL.GL import *
+
+from memory import TRACKER
+
+
+def dirty_ranges(old: np.ndarray | None, new: np.ndarray, merge_gap: int = 256, max_ranges: int = 64):
+    """
+    byte ranges where new data differs from old
+    :param old: previous data (uint8) or None
+    :param new: current data (uint8)
+    :param merge_gap: ranges closer than merge_gap bytes are merged
+    :param max_ranges: more ranges -> one covering range
+    :return: list of (start, end) byte offsets
+    """
+    if old is None or len(old) != len(new):
+        return [(0, len(new))]
+
+    # compare by 4 byte words when possible
+    word = 4 if len(new) % 4 == 0 else 1
+    a = old.view(np.uint32) if word == 4 else old
+    b = new.view(np.uint32) if word == 4 else new
+
+    changed = np.flatnonzero(a != b)
+    if len(changed) == 0:
+        return []
+
+    breaks = np.flatnonzero(np.diff(changed) * word > merge_gap)
+    starts = np.concatenate([[changed[0]], changed[breaks + 1]]) * word
+    ends = (np.concatenate([changed[breaks], [changed[-1]]]) + 1) * word
+
+    if len(starts) > max_ranges:
+        return [(int(starts[0]), int(ends[-1]))]
+
+    return list(zip(starts.tolist(), ends.tolist()))
+
+
+class StreamingBuffer:
+    """
+    ring buffered dynamic VBO \n
+    one GL buffer of ring_size slots, each frame writes next slot with glBufferSubData
+    of dirty ranges only. Slot reuse is guarded by fences, if GPU still reads the slot
+    the buffer is orphaned instead of waiting
+    """
+
+    def __init__(self, slot_size: int, ring_size: int = 3, merge_gap: int = 256, owner=None):
+        """
+        :param slot_size: bytes of one frame data
+        :param ring_size: count of slots
+        :param merge_gap: see dirty_ranges
+        :param owner: object reported as buffer owner, see memory.MemoryTracker
+        """
+        self.slot_size = slot_size
+        self.ring_size = ring_size
+        self.merge_gap = merge_gap
+
+        self.vbo = glGenBuffers(1)
+        glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
+        glBufferData(GL_ARRAY_BUFFER, slot_size * ring_size, None, GL_STREAM_DRAW)
+        TRACKER.register("buffer", self.vbo, slot_size * ring_size, owner)
+
+        # copies of data written into each slot
+        self.shadows = [None] * ring_size
+        self.fences = [None] * ring_size
+        self.slot = -1
+
+        # stats
+        self.bytes_uploaded = 0
+        self.frames = 0
+        self.orphans = 0
+
+    def write(self, data: np.ndarray, ranges: list[tuple[int, int]] = None) -> int:
+        """
+        uploads data into next slot
+        :param data: uint8 data of slot_size bytes
+        :param ranges: known dirty ranges, None -> diff against slot content
+        :return: slot index
+        """
+        slot = (self.slot + 1) % self.ring_size
+
+        glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
+
+        fence = self.fences[slot]
+        if fence is not None:
+            status = glClientWaitSync(fence, 0, 0)
+            glDeleteSync(fence)
+            self.fences[slot] = None
+            if status == GL_TIMEOUT_EXPIRED:
+                self._orphan()
+
+        shadow = self.shadows[slot]
+        if shadow is None or ranges is None:
+            ranges = dirty_ranges(shadow, data, self.merge_gap)
+
+        base = slot * self.slot_size
+        for start, end in ranges:
+            glBufferSubData(GL_ARRAY_BUFFER, base + start, end - start, data[start:end])
+            self.bytes_uploaded += end - start
+
+        if shadow is None:
+            self.shadows[slot] = data.copy()
+        else:
+            for start, end in ranges:
+                shadow[start:end] = data[start:end]
+
+        self.slot = slot
+        self.frames += 1
+        return slot
+
+    def fence(self):
+        """
+        marks current slot as used by submitted draw calls
+        """
+        if self.slot >= 0:
+            # slot drawn again without write(), e.g. unchanged data, last fence covers all draws
+            if self.fences[self.slot] is not None:
+                glDeleteSync(self.fences[self.slot])
+            self.fences[self.slot] = glFenceSync(GL_SYNC_GPU_COMMANDS_COMPLETE, 0)
+
+    def _orphan(self):
+        glBufferData(GL_ARRAY_BUFFER, self.slot_size * self.ring_size, None, GL_STREAM_DRAW)
+        for fence in self.fences:
+            if fence is not None:
+                glDeleteSync(fence)
+        self.fences = [None] * self.ring_size
+        self.shadows = [None] * self.ring_size
+        self.orphans += 1
+
+    def destroy(self):
+        for fence in self.fences:
+            if fence is not None:
+                glDeleteSync(fence)
+        glDeleteBuffers(1, (self.vbo,))
+        TRACKER.unregister("buffer", self.vbo)
+
+
+class MeshBuffers:
+    """
+    GPU buffers of one mesh: VAO, vertex buffer (static or streaming) and index buffer
+    """
+
+    def __init__(self, vert_data: np.ndarray, indexes: np.ndarray, setup_attrs, dynamic: bool = False,
+                 ring_size: int = 3, owner=None):
+        """
+        :param vert_data: uint8 vertex data
+        :param indexes: index data
+        :param setup_attrs: callback setting attribute pointers, called with VAO and VBO bound
+        :param dynamic: stream vertex data every frame
+        :param ring_size: streaming ring size
+        :param owner: object reported as buffers owner, see memory.MemoryTracker
+        """
+        self.dynamic = dynamic
+        self.vertex_bytes = len(vert_data)
+        self.base_slot = 0
+
+        self.vao = glGenVertexArrays(1)
+        glBindVertexArray(self.vao)
+        TRACKER.register("vertex_array", self.vao, 0, owner)
+
+        if dynamic:
+            self.stream = StreamingBuffer(self.vertex_bytes, ring_size, owner=owner)
+            self.vbo = self.stream.vbo
+            self.stream.write(vert_data)
+        else:
+            self.stream = None
+            self.vbo = glGenBuffers(1)
+            glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
+            glBufferData(GL_ARRAY_BUFFER, vert_data, GL_STATIC_DRAW)
+            TRACKER.register("buffer", self.vbo, self.vertex_bytes, owner)
+
+        glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
+        setup_attrs()
+
+        self.ebo = glGenBuffers(1)
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, self.ebo)
+        glBufferData(GL_ELEMENT_ARRAY_BUFFER, indexes, GL_STATIC_DRAW)
+        TRACKER.register("buffer", self.ebo, indexes.nbytes, owner)
+
+        glBindVertexArray(0)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+
+    def update(self, vert_data: np.ndarray, ranges: list[tuple[int, int]] = None, previous: np.ndarray = None):
+        """
+        uploads changed vertex data
+        :param ranges: known dirty ranges, None -> diff against previous data
+        :param previous: static buffer: data of last upload, unchanged since then (no copy is kept).
+            None -> whole buffer. Streamed buffers diff against their slot copies
+        """
+        if self.dynamic:
+            self.base_slot = self.stream.write(vert_data, ranges)
+            return
+
+        if ranges is None:
+            ranges = dirty_ranges(previous, vert_data)
+        if not ranges:
+            return
+
+        glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
+        for start, end in ranges:
+            glBufferSubData(GL_ARRAY_BUFFER, start, end - start, vert_data[start:end])
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+
+    def draw(self, mode, count, gl_type, vertex_count):
+        """
+        draws current slot, VAO must be bound
+        """
+        if self.dynamic:
+            glDrawElementsBaseVertex(mode, count, gl_type, None, self.base_slot * vertex_count)
+            self.stream.fence()
+        else:
+            glDrawElements(mode, count, gl_type, None)
+
+    def destroy(self):
+        glDeleteVertexArrays(1, (self.vao,))
+        TRACKER.unregister("vertex_array", self.vao)
+        if self.stream is not None:
+            self.stream.destroy()
+        else:
+            glDeleteBuffers(1, (self.vbo,))
+            TRACKER.unregister("buffer", self.vbo)
+        glDeleteBuffers(1, (self.ebo,))
+        TRACKER.unregister("buffer", self.ebo)
+
+
+class OverlayBuffers:
+    """
+    VAO over vertex buffer of MeshBuffers for another program (wireframe, normals): own attribute
+    pointers, own index buffer or the mesh one. Streamed meshes are drawn from their current slot
+    """
+
+    def __init__(self, mesh: MeshBuffers, indexes: np.ndarray | None, setup_attrs, owner=None):
+        """
+        :param mesh: MeshBuffers whose vertex buffer is shared
+        :param indexes: index data, None -> index buffer of mesh
+        :param setup_attrs: callback setting attribute pointers, called with VAO and VBO bound
+        :param owner: object reported as buffers owner, see memory.MemoryTracker
+        """
+        self.mesh = mesh
+        self.dynamic = mesh.dynamic
+
+        self.vao = glGenVertexArrays(1)
+        glBindVertexArray(self.vao)
+        TRACKER.register("vertex_array", self.vao, 0, owner)
+
+        glBindBuffer(GL_ARRAY_BUFFER, mesh.vbo)
+        setup_attrs()
+
+        if indexes is None:
+            self.ebo = None
+            glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, mesh.ebo)
+        else:
+            self.ebo = glGenBuffers(1)
+            glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, self.ebo)
+            glBufferData(GL_ELEMENT_ARRAY_BUFFER, indexes, GL_STATIC_DRAW)
+            TRACKER.register("buffer", self.ebo, indexes.nbytes, owner)
+
+        glBindVertexArray(0)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+
+    def draw(self, mode, count, gl_type, vertex_count):
+        """
+        draws current slot of mesh, VAO must be bound
+        """
+        if self.mesh.dynamic:
+            glDrawElementsBaseVertex(mode, count, gl_type, None, self.mesh.base_slot * vertex_count)
+            self.mesh.stream.fence()
+        else:
+            glDrawElements(mode, count, gl_type, None)
+
+    def destroy(self):
+        glDeleteVertexArrays(1, (self.vao,))
+        TRACKER.unregister("vertex_array", self.vao)
+        if self.ebo is not None:
+            glDeleteBuffers(1, (self.ebo,))
+            TRACKER.unregister("buffer", self.ebo)
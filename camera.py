@@ -0,0 +1,241 @@
+"""
+Explicit camera: view and perspective projection with cached derived matrices \n
+matrices are recomputed only after a change, publish() uploads them into uniform buffer bound
+to CAMERA_BINDING, shared by all programs declaring block
+
+    layout(std140) uniform Camera {
+        mat4 View;
+        mat4 Projection;
+        mat4 View_projection;
+        mat4 Inverse_view;
+        mat4 Inverse_projection;
+        mat4 Inverse_view_projection;
+        vec4 Eye_position;
+        vec4 Viewport;
+    } camera;
+"""
+
+import math
+
+import numpy as np
+from OpenGL.GL import *
+
+from memory import TRACKER
+
+# uniform buffer binding point of Camera block, see MaterialBase.compile_shader
+CAMERA_BINDING = 0
+# std140 size of Camera block
+CAMERA_BLOCK_SIZE = 6 * 64 + 2 * 16
+
+
+def translation_matrix(x: float, y: float, z: float) -> np.ndarray:
+    m = np.identity(4)
+    m[:3, 3] = (x, y, z)
+    return m
+
+
+def rotation_matrix(angle: float, x: float, y: float, z: float) -> np.ndarray:
+    """
+    same matrix as glRotatef
+    :param angle: degrees
+    """
+    axis = np.array([x, y, z], dtype=np.float64)
+    axis /= np.linalg.norm(axis)
+    x, y, z = axis
+    c = math.cos(math.radians(angle))
+    s = math.sin(math.radians(angle))
+
+    m = np.identity(4)
+    m[:3, :3] = [[x * x * (1 - c) + c, x * y * (1 - c) - z * s, x * z * (1 - c) + y * s],
+                 [y * x * (1 - c) + z * s, y * y * (1 - c) + c, y * z * (1 - c) - x * s],
+                 [x * z * (1 - c) - y * s, y * z * (1 - c) + x * s, z * z * (1 - c) + c]]
+    return m
+
+
+def perspective_matrix(fov: float, aspect: float, near: float, far: float) -> np.ndarray:
+    """
+    same matrix as gluPerspective
+    :param fov: vertical field of view, degrees
+    """
+    f = 1 / math.tan(math.radians(fov) / 2)
+    return np.array([[f / aspect, 0, 0, 0],
+                     [0, f, 0, 0],
+                     [0, 0, (far + near) / (near - far), 2 * far * near / (near - far)],
+                     [0, 0, -1, 0]], dtype=np.float64)
+
+
+class Camera:
+    """
+    view matrix is built like GL matrix stack: translate() and rotate() multiply it from the right \n
+    view, projection, view_projection and inverses are cached until the camera changes, version
+    counts changes
+    """
+
+    def __init__(self, fov: float = 90.0, aspect: float = 4 / 3, near: float = 0.001, far: float = 100.0):
+        """
+        :param fov: vertical field of view, degrees
+        """
+        self.fov = fov
+        self.aspect = aspect
+        self.near = near
+        self.far = far
+        self.viewport = (0, 0, 800, 600)
+
+        self._view = np.identity(4)
+        self.version = 0
+
+        # name -> matrix of current version
+        self._cache = {}
+        self._cache_version = -1
+
+        self.ubo = None
+        self._published_version = -1
+        self._loaded_version = -1
+
+    def _changed(self):
+        self.version += 1
+
+    def set_perspective(self, fov: float = None, aspect: float = None, near: float = None, far: float = None):
+        """
+        changes given projection params
+        """
+        self.fov = self.fov if fov is None else fov
+        self.aspect = self.aspect if aspect is None else aspect
+        self.near = self.near if near is None else near
+        self.far = self.far if far is None else far
+        self._changed()
+
+    def set_viewport(self, x: int, y: int, width: int, height: int):
+        """
+        viewport and aspect ratio of projection
+        """
+        self.viewport = (x, y, width, height)
+        self.aspect = width / height
+        self._changed()
+
+    def set_view(self, view: np.ndarray):
+        self._view = np.array(view, dtype=np.float64)
+        self._changed()
+
+    def translate(self, x: float, y: float, z: float):
+        """
+        same as glTranslatef on view
+        """
+        if x == 0 and y == 0 and z == 0:
+            return
+        self._view = self._view @ translation_matrix(x, y, z)
+        self._changed()
+
+    def rotate(self, angle: float, x: float, y: float, z: float):
+        """
+        same as glRotatef on view
+        :param angle: degrees
+        """
+        if angle == 0:
+            return
+        self._view = self._view @ rotation_matrix(angle, x, y, z)
+        self._changed()
+
+    def _matrix(self, name: str) -> np.ndarray:
+        if self._cache_version != self.version:
+            self._cache = {}
+            self._cache_version = self.version
+
+        m = self._cache.get(name)
+        if m is None:
+            if name == "view":
+                m = self._view
+            elif name == "projection":
+                m = perspective_matrix(self.fov, self.aspect, self.near, self.far)
+            elif name == "view_projection":
+                m = self.projection @ self.view
+            elif name.startswith("inverse_"):
+                m = np.linalg.inv(self._matrix(name[len("inverse_"):]))
+            else:
+                raise Exception("Invalid camera matrix {}".format(name))
+            self._cache[name] = m
+        return m
+
+    @property
+    def view(self) -> np.ndarray:
+        return self._matrix("view")
+
+    @property
+    def projection(self) -> np.ndarray:
+        return self._matrix("projection")
+
+    @property
+    def view_projection(self) -> np.ndarray:
+        return self._matrix("view_projection")
+
+    @property
+    def inverse_view(self) -> np.ndarray:
+        return self._matrix("inverse_view")
+
+    @property
+    def inverse_projection(self) -> np.ndarray:
+        return self._matrix("inverse_projection")
+
+    @property
+    def inverse_view_projection(self) -> np.ndarray:
+        return self._matrix("inverse_view_projection")
+
+    @property
+    def eye(self) -> np.ndarray:
+        """
+        camera position in world space
+        """
+        return self.inverse_view[:3, 3]
+
+    def block_data(self) -> np.ndarray:
+        """
+        Camera block in std140 layout, float32 column major matrices
+        """
+        data = np.zeros(CAMERA_BLOCK_SIZE // 4, dtype=np.float32)
+        matrices = (self.view, self.projection, self.view_projection,
+                    self.inverse_view, self.inverse_projection, self.inverse_view_projection)
+        for i, m in enumerate(matrices):
+            data[i * 16:(i + 1) * 16] = m.T.ravel()
+        data[96:99] = self.eye
+        data[99] = 1
+        data[100:104] = self.viewport
+        return data
+
+    def publish(self):
+        """
+        uploads Camera block if camera changed and binds it to CAMERA_BINDING, once per frame before drawing
+        """
+        if self.ubo is None:
+            self.ubo = glGenBuffers(1)
+            glBindBuffer(GL_UNIFORM_BUFFER, self.ubo)
+            glBufferData(GL_UNIFORM_BUFFER, CAMERA_BLOCK_SIZE, None, GL_DYNAMIC_DRAW)
+            TRACKER.register("buffer", self.ubo, CAMERA_BLOCK_SIZE, self)
+
+        if self._published_version != self.version:
+            glBindBuffer(GL_UNIFORM_BUFFER, self.ubo)
+            glBufferSubData(GL_UNIFORM_BUFFER, 0, CAMERA_BLOCK_SIZE, self.block_data())
+            glBindBuffer(GL_UNIFORM_BUFFER, 0)
+            self._published_version = self.version
+
+        glBindBufferBase(GL_UNIFORM_BUFFER, CAMERA_BINDING, self.ubo)
+
+    def load_gl(self):
+        """
+        compatibility path for shaders reading fixed function matrices: view_projection on
+        projection stack, identity modelview (shading in world space), viewport. Only after change
+        """
+        if self._loaded_version == self.version:
+            return
+
+        glMatrixMode(GL_PROJECTION)
+        glLoadMatrixf(np.asarray(self.view_projection.T, dtype=np.float32))
+        glMatrixMode(GL_MODELVIEW)
+        glLoadIdentity()
+        glViewport(*self.viewport)
+        self._loaded_version = self.version
+
+    def destroy(self):
+        if self.ubo is not None:
+            glDeleteBuffers(1, (self.ubo,))
+            TRACKER.unregister("buffer", self.ubo)
+            self.ubo = None
@@ -0,0 +1,184 @@
+import ctypes
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from OpenGL.GL import *
+
+from memory import TRACKER
+
+
+def encode_frame(pixels: np.ndarray, path: str, fmt: str):
+    """
+    writes frame read by glReadPixels, worker thread
+    :param pixels: np.ndarray of shape (height, width, 4), bottom row first
+    :param fmt: "png" | "raw" (RGBA bytes, top row first)
+    """
+    image = pixels[::-1]
+    if fmt == "png":
+        from PIL import Image
+        Image.fromarray(image, "RGBA").save(path, compress_level=1)
+    elif fmt == "raw":
+        with open(path, "wb") as f:
+            f.write(np.ascontiguousarray(image).tobytes())
+    else:
+        raise Exception("Invalid capture format {}".format(fmt))
+
+
+class FrameCapture:
+    """
+    asynchronous readback of framebuffer \n
+    capture() starts glReadPixels into next PBO of ring and returns immediately, frames are mapped
+    ring_size - 1 frames later when GPU finished them, encoding runs on worker threads
+    """
+
+    def __init__(self, width: int, height: int, out_dir: str = "captures", fmt: str = "png",
+                 ring_size: int = 3, workers: int = 2, max_pending: int = 8):
+        """
+        :param width: framebuffer width
+        :param height: framebuffer height
+        :param out_dir: directory of frame files
+        :param fmt: "png" | "raw"
+        :param ring_size: count of PBOs, readback latency in frames
+        :param workers: encoding threads
+        :param max_pending: max frames waiting for encoding, GL thread waits when exceeded
+        """
+        self.width = width
+        self.height = height
+        self.out_dir = out_dir
+        self.fmt = fmt
+        self.ring_size = ring_size
+        self.max_pending = max_pending
+        self.size = width * height * 4
+
+        os.makedirs(out_dir, exist_ok=True)
+
+        self.pbos = list(glGenBuffers(ring_size)) if ring_size > 1 else [glGenBuffers(1)]
+        for pbo in self.pbos:
+            glBindBuffer(GL_PIXEL_PACK_BUFFER, pbo)
+            glBufferData(GL_PIXEL_PACK_BUFFER, self.size, None, GL_STREAM_READ)
+            TRACKER.register("buffer", pbo, self.size, self, "FrameCapture")
+        glBindBuffer(GL_PIXEL_PACK_BUFFER, 0)
+
+        # (frame, fence) of PBO, None -> free
+        self.in_flight = [None] * ring_size
+        self.slot = 0
+
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="FrameCapture")
+        self.pending = []
+
+        # stats since reset_stats: GL thread times, encode times of workers
+        self.frames = 0
+        self.read_time = 0.0
+        self.map_time = 0.0
+        self.stall_time = 0.0
+        self.encode_time = 0.0
+        self.encoded = 0
+        # frames written since start
+        self.saved = 0
+
+    def capture(self, frame: int):
+        """
+        starts readback of current read framebuffer, call after drawing and before swap
+        """
+        start = time.perf_counter()
+
+        # ring full: oldest frame is collected first
+        if self.in_flight[self.slot] is not None:
+            self._collect(self.slot, wait=True)
+
+        glBindBuffer(GL_PIXEL_PACK_BUFFER, self.pbos[self.slot])
+        glPixelStorei(GL_PACK_ALIGNMENT, 1)
+        glReadPixels(0, 0, self.width, self.height, GL_RGBA, GL_UNSIGNED_BYTE, ctypes.c_void_p(0))
+        glBindBuffer(GL_PIXEL_PACK_BUFFER, 0)
+        self.in_flight[self.slot] = (frame, glFenceSync(GL_SYNC_GPU_COMMANDS_COMPLETE, 0))
+        self.slot = (self.slot + 1) % self.ring_size
+
+        # frames GPU already finished
+        for i in range(self.ring_size):
+            if self.in_flight[i] is not None and i != (self.slot - 1) % self.ring_size:
+                self._collect(i, wait=False)
+
+        self.frames += 1
+        self.read_time += time.perf_counter() - start
+
+    def _collect(self, i: int, wait: bool):
+        frame, fence = self.in_flight[i]
+
+        if wait:
+            start = time.perf_counter()
+            glClientWaitSync(fence, GL_SYNC_FLUSH_COMMANDS_BIT, 1000000000)
+            self.stall_time += time.perf_counter() - start
+        elif glClientWaitSync(fence, 0, 0) == GL_TIMEOUT_EXPIRED:
+            return
+
+        glDeleteSync(fence)
+        self.in_flight[i] = None
+
+        start = time.perf_counter()
+        pixels = np.empty((self.height, self.width, 4), dtype=np.uint8)
+        glBindBuffer(GL_PIXEL_PACK_BUFFER, self.pbos[i])
+        pointer = glMapBufferRange(GL_PIXEL_PACK_BUFFER, 0, self.size, GL_MAP_READ_BIT)
+        ctypes.memmove(pixels.ctypes.data, pointer, self.size)
+        glUnmapBuffer(GL_PIXEL_PACK_BUFFER)
+        glBindBuffer(GL_PIXEL_PACK_BUFFER, 0)
+        self.map_time += time.perf_counter() - start
+
+        self._submit(frame, pixels)
+
+    def _submit(self, frame: int, pixels: np.ndarray):
+        self.pending = [f for f in self.pending if not f.done()]
+        if len(self.pending) >= self.max_pending:
+            # encoders can't keep up, wait instead of growing memory
+            start = time.perf_counter()
+            self.pending.pop(0).result()
+            self.stall_time += time.perf_counter() - start
+
+        path = os.path.join(self.out_dir, "frame_{:06d}.{}".format(frame, self.fmt))
+        self.pending.append(self.pool.submit(self._encode, pixels, path))
+
+    def _encode(self, pixels, path):
+        start = time.perf_counter()
+        encode_frame(pixels, path, self.fmt)
+        # += of float is atomic enough for stats
+        self.encode_time += time.perf_counter() - start
+        self.encoded += 1
+        self.saved += 1
+
+    def finish(self):
+        """
+        collects frames in flight and waits for encoding
+        """
+        for k in range(self.ring_size):
+            i = (self.slot + k) % self.ring_size
+            if self.in_flight[i] is not None:
+                self._collect(i, wait=True)
+        for future in self.pending:
+            future.result()
+        self.pending = []
+
+    def destroy(self):
+        self.finish()
+        self.pool.shutdown()
+        glDeleteBuffers(len(self.pbos), self.pbos)
+        for pbo in self.pbos:
+            TRACKER.unregister("buffer", pbo)
+
+    def reset_stats(self):
+        self.frames = 0
+        self.read_time = 0.0
+        self.map_time = 0.0
+        self.stall_time = 0.0
+        self.encode_time = 0.0
+        self.encoded = 0
+
+    def report(self):
+        """
+        capture - GL thread time per frame (readback start, map, stalls), encode - worker time per frame,
+        saved - frames written since start
+        """
+        frames = max(self.frames, 1)
+        return "capture {:.2f} ms (map {:.2f}, stall {:.2f}), encode {:.1f} ms, {} saved".format(
+            self.read_time / frames * 1000, self.map_time / frames * 1000, self.stall_time / frames * 1000,
+            self.encode_time / max(self.encoded, 1) * 1000, self.saved)
@@ -1,6 +1,249 @@
-from scipy.interpolate import BPoly
+from math import comb
+
 import numpy as np
-from geometrix import Point, Object3D
+from geometrix import Point, Object3D, vertex_normals
+
+
+def bernstein_basis(degree: int, t: np.ndarray | list[float] | float) -> np.ndarray:
+    """
+    Bernstein basis of given degree evaluated for array of params
+    :param degree: polynomial degree
+    :param t: params t є [0, 1]
+    :return: np.ndarray of shape (len(t), degree + 1)
+    """
+    t = np.atleast_1d(np.asarray(t, dtype=np.float64))[:, None]
+    k = np.arange(degree + 1)
+    coefs = np.array([comb(degree, i) for i in k], dtype=np.float64)
+    return coefs * t ** k * (1 - t) ** (degree - k)
+
+
+def bernstein_derivative(degree: int, t: np.ndarray | list[float] | float) -> np.ndarray:
+    """
+    derivative of Bernstein basis
+    :return: np.ndarray of shape (len(t), degree + 1)
+    """
+    t = np.atleast_1d(np.asarray(t, dtype=np.float64))
+    if degree == 0:
+        return np.zeros((len(t), 1))
+
+    lower = bernstein_basis(degree - 1, t)
+    zeros = np.zeros((len(t), 1))
+    return degree * (np.hstack([zeros, lower]) - np.hstack([lower, zeros]))
+
+
+def points_array(points: list[Point] | np.ndarray) -> np.ndarray:
+    """
+    Points (or raw coords) to np.ndarray of shape (..., 3)
+    """
+    if isinstance(points, np.ndarray) and points.dtype != object:
+        return points.astype(np.float64)
+    # lists and object arrays of Points
+    return np.array([p.to_list() if isinstance(p, Point) else points_array(p) for p in points], dtype=np.float64)
+
+
+def rational_bezier(control_points: np.ndarray, weights: np.ndarray, t: np.ndarray | list[float] | float) -> np.ndarray:
+    """
+    rational Bézier curve points
+    :param control_points: np.ndarray of shape (n, 3)
+    :param weights: np.ndarray of shape (n,)
+    :param t: params t є [0, 1]
+    :return: np.ndarray of shape (len(t), 3)
+    """
+    basis = bernstein_basis(len(control_points) - 1, t)
+    weights = np.asarray(weights, dtype=np.float64)
+
+    if np.all(weights == 1):
+        return basis @ control_points
+
+    basis = basis * weights
+    return (basis @ control_points) / basis.sum(axis=1, keepdims=True)
+
+
+def rational_bezier_derivative(control_points: np.ndarray, weights: np.ndarray, t: np.ndarray | list[float] | float):
+    """
+    rational Bézier curve points and first derivative
+    :return: (points, derivatives), each np.ndarray of shape (len(t), 3)
+    """
+    degree = len(control_points) - 1
+    weights = np.asarray(weights, dtype=np.float64)
+    basis = bernstein_basis(degree, t) * weights
+    d_basis = bernstein_derivative(degree, t) * weights
+
+    w = basis.sum(axis=1, keepdims=True)
+    dw = d_basis.sum(axis=1, keepdims=True)
+
+    points = (basis @ control_points) / w
+    derivatives = (d_basis @ control_points - points * dw) / w
+
+    return points, derivatives
+
+
+def surface_derivatives(curves: list[np.ndarray], weights: list[np.ndarray], t, u):
+    """
+    BezierSurface points and first partial derivatives at (t, u) pairs \n
+    S(t, u) = sum_j B_j(t) * C_j(u), C_j - generating curves
+    :param curves: control points of generating curves
+    :param weights: weights of generating curves
+    :param t: params along secondary curves
+    :param u: params along generating curves
+    :return: (points, dS/dt, dS/du)
+    """
+    t = np.atleast_1d(np.asarray(t, dtype=np.float64))
+    u = np.atleast_1d(np.asarray(u, dtype=np.float64))
+
+    evaluated = [rational_bezier_derivative(c, w, u) for c, w in zip(curves, weights)]
+    c = np.stack([e[0] for e in evaluated], axis=1)
+    dc = np.stack([e[1] for e in evaluated], axis=1)
+
+    basis = bernstein_basis(len(curves) - 1, t)
+    d_basis = bernstein_derivative(len(curves) - 1, t)
+
+    points = np.einsum("mj,mjc->mc", basis, c)
+    d_t = np.einsum("mj,mjc->mc", d_basis, c)
+    d_u = np.einsum("mj,mjc->mc", basis, dc)
+
+    return points, d_t, d_u
+
+
+def surface_normals(curves: list[np.ndarray], weights: list[np.ndarray], t, u, eps: float = 1e-4):
+    """
+    unit normals cross(dS/du, dS/dt) at (t, u) pairs \n
+    degenerate points (collapsed edges) are re-evaluated slightly inside the patch
+    :return: (points, normals)
+    """
+    t = np.atleast_1d(np.asarray(t, dtype=np.float64))
+    u = np.atleast_1d(np.asarray(u, dtype=np.float64))
+
+    points, d_t, d_u = surface_derivatives(curves, weights, t, u)
+    normals = np.cross(d_u, d_t)
+    lengths = np.linalg.norm(normals, axis=1)
+
+    degenerate = lengths < eps * eps
+    if np.any(degenerate):
+        t_in = t[degenerate] + np.sign(0.5 - t[degenerate]) * eps
+        u_in = u[degenerate] + np.sign(0.5 - u[degenerate]) * eps
+        _, d_t, d_u = surface_derivatives(curves, weights, t_in, u_in)
+        normals[degenerate] = np.cross(d_u, d_t)
+        lengths[degenerate] = np.linalg.norm(normals[degenerate], axis=1)
+
+    normals = np.divide(normals, lengths[:, None], out=np.zeros_like(normals), where=lengths[:, None] > 0)
+
+    return points, normals
+
+
+def surface_grid(curves: list[np.ndarray], weights: list[np.ndarray], secondary_count: int, quality: int):
+    """
+    points and normals in BezierSurface vertexes order: secondary curve i -> u = i / len(curves),
+    vertex k -> t = k / quality
+    :return: (points, normals)
+    """
+    u = np.repeat(np.arange(secondary_count) / len(curves), quality + 1)
+    t = np.tile(np.arange(quality + 1) * (1 / quality), secondary_count)
+    return surface_normals(curves, weights, t, u)
+
+
+def grid_indices(rows: int, quality: int) -> np.ndarray:
+    """
+    triangle indexes of vertex grid with rows of (quality + 1) vertexes, same order as BezierSurface.set_surfs
+    :return: np.ndarray of shape (triangles, 3)
+    """
+    row = quality + 1
+    i = np.arange(1, (rows - 1) * row)
+    i = i[i % row != 0]
+
+    trn1 = np.stack([quality + i + 1, quality + i, i], axis=1)
+    trn2 = np.stack([quality + i, i - 1, i], axis=1)
+
+    return np.stack([trn1, trn2], axis=1).reshape(-1, 3).astype(np.uint32)
+
+
+def grid_edges(rows: int, quality: int) -> list[tuple[int, int]]:
+    """
+    edges indexes of vertex grid, same order as BezierSurface.set_edges
+    """
+    edges = []
+
+    for i in range(1, (rows - 1) * (quality + 1)):
+        if i % (quality + 1) == 0:
+            continue
+        edges.append((i - 1, i))
+        edges.append((i, quality + i + 1))
+        edges.append((i - 1, quality + i + 1))
+
+    return edges
+
+
+def uniform_knots(count: int, degree: int) -> np.ndarray:
+    """
+    clamped uniform knot vector on [0, 1]
+    :param count: control points count
+    :param degree: basis degree
+    """
+    inner = np.linspace(0, 1, count - degree + 1)
+    return np.concatenate([np.zeros(degree), inner, np.ones(degree)])
+
+
+def find_span(knots: np.ndarray, degree: int, count: int, t: np.ndarray) -> np.ndarray:
+    """
+    knot span index for each param, knots[span] <= t < knots[span + 1]
+    :param count: control points count
+    """
+    spans = np.searchsorted(knots, t, side="right") - 1
+    return np.clip(spans, degree, count - 1)
+
+
+def basis_functions(knots: np.ndarray, degree: int, count: int, t: np.ndarray | list[float] | float):
+    """
+    batched Cox–de Boor recursion (non-zero basis functions only)
+    :param knots: knot vector
+    :param degree: basis degree
+    :param count: control points count
+    :param t: params
+    :return: (spans of shape (m,), basis of shape (m, degree + 1)),
+     basis[:, k] is weight of control point spans - degree + k
+    """
+    t = np.atleast_1d(np.asarray(t, dtype=np.float64))
+    spans = find_span(knots, degree, count, t)
+
+    m = len(t)
+    basis = np.zeros((m, degree + 1))
+    basis[:, 0] = 1
+    left = np.zeros((m, degree + 1))
+    right = np.zeros((m, degree + 1))
+
+    for j in range(1, degree + 1):
+        left[:, j] = t - knots[spans + 1 - j]
+        right[:, j] = knots[spans + j] - t
+        saved = np.zeros(m)
+
+        for r in range(j):
+            denom = right[:, r + 1] + left[:, j - r]
+            temp = np.divide(basis[:, r], denom, out=np.zeros(m), where=denom != 0)
+            basis[:, r] = saved + right[:, r + 1] * temp
+            saved = left[:, j - r] * temp
+
+        basis[:, j] = saved
+
+    return spans, basis
+
+
+# (knots, degree, count, samples) -> (spans, basis)
+_basis_cache = {}
+
+
+def basis_table(knots: np.ndarray, degree: int, count: int, samples: int):
+    """
+    cached basis_functions for samples + 1 uniform params over knots domain
+    """
+    key = (knots.tobytes(), degree, count, samples)
+    table = _basis_cache.get(key)
+
+    if table is None:
+        t = np.linspace(knots[degree], knots[count], samples + 1)
+        table = basis_functions(knots, degree, count, t)
+        _basis_cache[key] = table
+
+    return table
 
 
 class BezierCurve(Object3D):
@@ -17,10 +260,8 @@ class BezierCurve(Object3D):
 
     def set_verts(self):
         step = 1 / self.quality
-        vertexes = []
-        for i in range(self.quality + 1):
-            vertexes.append(self.B(i * step))
-        return vertexes
+        t = np.arange(self.quality + 1) * step
+        return [Point.from_list(v) for v in self.evaluate(t)]
 
     def set_surfs(self):
         return []
@@ -30,12 +271,15 @@ class BezierCurve(Object3D):
         :param t: param t є [0, 1]
         :return: Point
         """
+        return Point.from_list(self.evaluate(t)[0])
 
-        points_list = [[f.to_list()] for f in self.control_points]
-        bp = BPoly(points_list, [0, 1])  # Bernstein polynomial
-        result = Point.from_list(bp(t))
-
-        return result
+    def evaluate(self, t: np.ndarray | list[float] | float) -> np.ndarray:
+        """
+        batched (rational) evaluation
+        :param t: params t є [0, 1]
+        :return: np.ndarray of shape (len(t), 3)
+        """
+        return rational_bezier(points_array(self.control_points), self.weights, t)
 
     def __init__(self, control_points: list[Point], weights: list[float] = None, quality=10):
         """
@@ -46,8 +290,8 @@ class BezierCurve(Object3D):
         """
         self.control_points = control_points
 
-        if weights:
-            self.weights = weights
+        if weights is not None:
+            self.weights = np.asarray(weights, dtype=np.float64)
         else:
             self.weights = np.ones(len(control_points))
 
@@ -120,21 +364,38 @@ class BezierSurface(Object3D):
         return surfs
 
 
-    def S(self, t, u, segments_count=3):
+    def S(self, t, u):
         """
-        :param t: t param
-        :param u: u param
+        :param t: t param, along secondary curves
+        :param u: u param, along generating curves
         :return: Point on surface
         """
+        points, _, _ = self.evaluate(t, u)
+        return Point.from_list(points[0])
 
-        result = Point(0, 0, 0)
+    def evaluate(self, t, u):
+        """
+        batched evaluation at (t, u) pairs
+        :param t: params along secondary curves
+        :param u: params along generating curves
+        :return: (points, dS/dt, dS/du), each np.ndarray of shape (len(t), 3)
+        """
+        return surface_derivatives(self._curves_arrays(), self._curves_weights(), t, u)
 
-        for curve in self.secondary_curves:
-            points_list = [[f.to_list()] for f in curve.control_points]
-            bp = BPoly(points_list, [0, 1])
-            result += Point.from_list(bp(t))
+    def calc_normals(self):
+        """
+        analytic unit normals at vertexes
+        :return:
+        """
+        _, normals = surface_grid(self._curves_arrays(), self._curves_weights(),
+                                  len(self.secondary_curves), self.quality)
+        return normals
 
-        return result
+    def _curves_arrays(self):
+        return [points_array(curve.control_points) for curve in self.curves]
+
+    def _curves_weights(self):
+        return [curve.weights for curve in self.curves]
 
     def __init__(self, curves: list[BezierCurve], quality: int = 10, count: int = 0, last: bool = True):
         """
@@ -146,6 +407,7 @@ class BezierSurface(Object3D):
         """
         self.curves = curves
         self.quality = quality
+        self.count = count
         self.last = last
 
         curves_count = len(self.curves)
@@ -179,3 +441,205 @@ class BezierSurface(Object3D):
         edges = []
         # for i in range(len(self.curves)):
         return (x.edges() for x in self.curves)
+
+
+class NurbsCurve(Object3D):
+    """
+    NURBS curve \n
+    control_points: array of Points np.array(type=Point)
+    """
+
+    def set_tex_coords(self):
+        return []
+
+    def set_edges(self):
+        return zip(range(self.quality), range(1, self.quality + 1))
+
+    def set_verts(self):
+        return [Point.from_list(v) for v in self.evaluate_table(self.quality)]
+
+    def set_surfs(self):
+        return []
+
+    def B(self, t: float):
+        """
+        :param t: param t є [knots[degree], knots[-degree - 1]]
+        :return: Point
+        """
+        return Point.from_list(self.evaluate(t)[0])
+
+    def evaluate(self, t: np.ndarray | list[float] | float) -> np.ndarray:
+        """
+        batched evaluation
+        :return: np.ndarray of shape (len(t), 3)
+        """
+        spans, basis = basis_functions(self.knots, self.degree, len(self), t)
+        return self._combine(spans, basis)
+
+    def evaluate_table(self, samples: int) -> np.ndarray:
+        """
+        evaluation at samples + 1 uniform params using cached basis table
+        """
+        spans, basis = basis_table(self.knots, self.degree, len(self), samples)
+        return self._combine(spans, basis)
+
+    def _combine(self, spans, basis):
+        idx = spans[:, None] - self.degree + np.arange(self.degree + 1)
+        w = basis * self.weights[idx]
+        points = np.einsum("mk,mkc->mc", w, points_array(self.control_points)[idx])
+        return points / w.sum(axis=1, keepdims=True)
+
+    def __init__(self, control_points: list[Point], weights: list[float] = None, knots: list[float] = None,
+                 degree: int = 3, quality=10):
+        """
+        NURBS curve
+        :param control_points: points
+        :param weights: points weights
+        :param knots: knot vector of len(control_points) + degree + 1 values. None -> clamped uniform
+        :param degree: basis degree, clamped to len(control_points) - 1
+        :param quality: count of interpolated points
+        """
+        self.control_points = control_points
+        self.degree = min(degree, len(control_points) - 1)
+
+        if weights is not None:
+            self.weights = np.asarray(weights, dtype=np.float64)
+        else:
+            self.weights = np.ones(len(control_points))
+
+        if knots is not None:
+            self.knots = np.asarray(knots, dtype=np.float64)
+        else:
+            self.knots = uniform_knots(len(control_points), self.degree)
+
+        if len(self.knots) != len(control_points) + self.degree + 1:
+            raise Exception("Invalid knot vector length {}, expected {}".format(
+                len(self.knots), len(control_points) + self.degree + 1))
+
+        self.quality = quality
+
+        super(NurbsCurve, self).__init__()
+
+    def __len__(self):
+        """
+        count of control points
+        """
+        return len(self.control_points)
+
+    @staticmethod
+    def circle(radius: float = 1, surface: str = "xy", depth: float = 0, quality=32):
+        """
+        exact circle: 9 control points, degree 2
+        :param radius: circle radius
+        :param surface: circle plane: "xy", "xz" or "yz"
+        :param depth: plane depth
+        """
+        square = [(1, 0), (1, 1), (0, 1), (-1, 1), (-1, 0), (-1, -1), (0, -1), (1, -1), (1, 0)]
+        points = [Point(a * radius, b * radius, surface, depth=depth) for a, b in square]
+        w = np.sqrt(2) / 2
+        weights = [1, w, 1, w, 1, w, 1, w, 1]
+        knots = [0, 0, 0, 1 / 4, 1 / 4, 1 / 2, 1 / 2, 3 / 4, 3 / 4, 1, 1, 1]
+        return NurbsCurve(points, weights, knots, degree=2, quality=quality)
+
+
+class NurbsSurface(Object3D):
+    """
+    NURBS surface \n
+    control_net: grid of Points, shape (count_u, count_v)
+    """
+
+    def set_tex_coords(self):
+        t = np.arange(self.quality + 1) / self.quality
+        u, v = np.meshgrid(t, t, indexing="ij")
+        return np.stack([u.ravel(), v.ravel()], axis=1)
+
+    def set_edges(self):
+        return grid_edges(self.quality + 1, self.quality)
+
+    def set_verts(self):
+        return [Point.from_list(v) for v in self.evaluate_grid(self.quality).reshape(-1, 3)]
+
+    def set_surfs(self):
+        return grid_indices(self.quality + 1, self.quality)
+
+    def calc_normals(self):
+        return vertex_normals(points_array(self.vertexes), self.surfaces)
+
+    def S(self, u: float, v: float):
+        """
+        :return: Point on surface
+        """
+        return Point.from_list(self.evaluate(u, v)[0])
+
+    def evaluate(self, u: np.ndarray | list[float] | float, v: np.ndarray | list[float] | float) -> np.ndarray:
+        """
+        batched evaluation at (u, v) pairs
+        :return: np.ndarray of shape (len(u), 3)
+        """
+        count_u, count_v = self.weights.shape
+        spans_u, basis_u = basis_functions(self.knots_u, self.degree_u, count_u, u)
+        spans_v, basis_v = basis_functions(self.knots_v, self.degree_v, count_v, v)
+
+        idx_u = spans_u[:, None] - self.degree_u + np.arange(self.degree_u + 1)
+        idx_v = spans_v[:, None] - self.degree_v + np.arange(self.degree_v + 1)
+
+        net = self._homogeneous()[idx_u[:, :, None], idx_v[:, None, :]]
+        points = np.einsum("mk,ml,mklc->mc", basis_u, basis_v, net)
+        return points[:, :3] / points[:, 3:]
+
+    def evaluate_grid(self, samples: int) -> np.ndarray:
+        """
+        evaluation on (samples + 1) x (samples + 1) uniform grid using cached basis tables
+        :return: np.ndarray of shape (samples + 1, samples + 1, 3)
+        """
+        count_u, count_v = self.weights.shape
+        spans_u, basis_u = basis_table(self.knots_u, self.degree_u, count_u, samples)
+        spans_v, basis_v = basis_table(self.knots_v, self.degree_v, count_v, samples)
+
+        idx_u = spans_u[:, None] - self.degree_u + np.arange(self.degree_u + 1)
+        idx_v = spans_v[:, None] - self.degree_v + np.arange(self.degree_v + 1)
+
+        rows = np.einsum("ak,akvc->avc", basis_u, self._homogeneous()[idx_u])
+        points = np.einsum("bl,ablc->abc", basis_v, rows[:, idx_v])
+        return points[..., :3] / points[..., 3:]
+
+    def _homogeneous(self):
+        net = points_array(self.control_net)
+        return np.concatenate([net * self.weights[..., None], self.weights[..., None]], axis=-1)
+
+    def __init__(self, control_net: list[list[Point]], weights: list[list[float]] = None,
+                 knots_u: list[float] = None, knots_v: list[float] = None,
+                 degree_u: int = 3, degree_v: int = 3, quality: int = 10):
+        """
+        NURBS surface
+        :param control_net: grid of points
+        :param weights: points weights, same shape as control_net
+        :param knots_u: knot vector along u. None -> clamped uniform
+        :param knots_v: knot vector along v. None -> clamped uniform
+        :param degree_u: basis degree along u
+        :param degree_v: basis degree along v
+        :param quality: generated grid quality
+        """
+        self.control_net = control_net
+        count_u = len(control_net)
+        count_v = len(control_net[0])
+
+        self.degree_u = min(degree_u, count_u - 1)
+        self.degree_v = min(degree_v, count_v - 1)
+
+        if weights is not None:
+            self.weights = np.asarray(weights, dtype=np.float64)
+        else:
+            self.weights = np.ones((count_u, count_v))
+
+        self.knots_u = np.asarray(knots_u, dtype=np.float64) if knots_u is not None \
+            else uniform_knots(count_u, self.degree_u)
+        self.knots_v = np.asarray(knots_v, dtype=np.float64) if knots_v is not None \
+            else uniform_knots(count_v, self.degree_v)
+
+        if len(self.knots_u) != count_u + self.degree_u + 1 or len(self.knots_v) != count_v + self.degree_v + 1:
+            raise Exception("Invalid knot vector length")
+
+        self.quality = quality
+
+        super(NurbsSurface, self).__init__()
@@ -0,0 +1,66 @@
+"""
+View and animation of demo scene, shared by main.py, render_batch.py and perf.py
+"""
+
+import math
+
+from OpenGL.GL import *
+
+from camera import Camera
+
+# anim_curve phase per millisecond
+ANIM_SPEED = 0.001
+
+
+def demo_camera(width: int, height: int):
+    """
+    camera of main.py
+    """
+    camera = Camera(90, width / height, 0.001, 100.0)
+    camera.set_viewport(0, 0, width, height)
+    camera.translate(0.0, -6, -20)
+    camera.rotate(-90, 1, 0, 0)
+    return camera
+
+
+def setup_view(width: int, height: int):
+    """
+    GL state and camera of main.py, camera matrices are loaded into GL and published
+    :return: camera.Camera
+    """
+    glEnable(GL_LIGHTING)
+    glEnable(GL_COLOR_MATERIAL)
+    glEnable(GL_BLEND)
+    glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
+
+    glEnable(GL_LIGHT0)
+    glEnable(GL_DEPTH_TEST)
+    glDepthFunc(GL_LESS)
+
+    camera = demo_camera(width, height)
+    camera.load_gl()
+    camera.publish()
+
+    # world space, modelview is identity
+    glLightfv(GL_LIGHT0, GL_POSITION, [10, 10, 10])
+
+    return camera
+
+
+def anim_position(anim_curve, ticks: float) -> list:
+    """
+    position of animated surface
+    :param ticks: milliseconds since start
+    """
+    return anim_curve.B(math.sin(ticks * ANIM_SPEED) * 0.5 + 0.5).to_list()
+
+
+def curve_batch(scene):
+    """
+    anim_curve and curves of bsCurves in one polylines.CurveBatch, needs GL context
+    """
+    from lightning import Color, Polyline
+    from polylines import CurveBatch
+
+    curves = [scene["anim_curve"]] + list(scene["bsCurves"].objects)
+    return CurveBatch(curves, Polyline((*Color.MINT, 1), 2.0), Polyline((*Color.GRAY, 1), 1.0))
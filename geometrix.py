@@ -5,7 +5,11 @@ import numpy as np
 from OpenGL.GL import *
 from OpenGL.arrays import vbo
 
-from lightning import Color, BRDF
+from buffers import MeshBuffers, OverlayBuffers
+from indexing import build_index_buffer, build_line_index_buffer
+from render_queue import DrawItem, RenderQueue
+from lightning import Color, BRDF, FaceNormals, Wireframe
+from vertex_format import FLOAT32
 from misc import try_cast, load_file
 
 
@@ -116,6 +120,31 @@ class Transform:
 
         return transformed_v
 
+    def matrix(self):
+        """
+        4x4 model matrix, same transform as local_to_global
+        """
+        rmy, rmx, rmz = self._rotation_matrix()
+        return self._translate_matrix() @ rmz @ rmx @ rmy @ self._scale_matrix()
+
+    def apply(self, points: np.ndarray) -> np.ndarray:
+        """
+        batched local_to_global
+        :param points: np.ndarray of shape (n, 3)
+        :return: np.ndarray of shape (n, 3)
+        """
+        m = self.matrix()
+        return np.asarray(points, dtype=np.float64) @ m[:3, :3].T + m[:3, 3]
+
+    def apply_normals(self, normals: np.ndarray) -> np.ndarray:
+        """
+        normals to global space (inverse transpose), normalized
+        """
+        m = np.linalg.inv(self.matrix()[:3, :3]).T
+        normals = np.asarray(normals, dtype=np.float64) @ m.T
+        lengths = np.linalg.norm(normals, axis=1, keepdims=True)
+        return np.divide(normals, lengths, out=np.zeros_like(normals), where=lengths > 0)
+
     def _translate_matrix(self):
         mx = np.array([[1, 0, 0, self.position[0]],
                        [0, 1, 0, self.position[1]],
@@ -151,6 +180,32 @@ class Transform:
         return mx
 
 
+def vertex_normals(vertexes: np.ndarray, indices: np.ndarray) -> np.ndarray:
+    """
+    sum of normalized face normals for each vertex, same as Object3D.calc_normals
+    :param vertexes: np.ndarray of shape (n, 3)
+    :param indices: triangles indexes, np.ndarray of shape (m, 3)
+    :return: np.ndarray of shape (n, 3)
+    """
+    v0 = vertexes[indices[:, 0]]
+    v1 = vertexes[indices[:, 2]] - v0
+    v2 = vertexes[indices[:, 1]] - v0
+    face_normals = np.cross(v1, v2)
+
+    lengths = np.linalg.norm(face_normals, axis=1, keepdims=True)
+    face_normals = np.divide(face_normals, lengths, out=np.zeros_like(face_normals), where=lengths > 0)
+
+    normals = np.zeros_like(vertexes)
+    for corner in range(3):
+        np.add.at(normals, indices[:, corner], face_normals)
+
+    return normals
+
+
+# overlay materials of objects without own ones, created on first use
+_OVERLAY_MATERIALS = {}
+
+
 class Object3D(ABC):
 
     def __init__(self, transform=None, parent_transform=None):
@@ -170,54 +225,264 @@ class Object3D(ABC):
         self.colors = np.array([Color.TWILIGHT] * len(self.vertexes))
         self.tex_coords = self.set_tex_coords()
 
-    def apply_material(self):
+        # index post-processing
+        self.optimize_indices = True
+        self.use_strips = False
+        self._index_buffer = None
+        self._edge_index_buffer = None
+
+        # vertex encoding, see vertex_format.VertexFormat
+        self.vertex_format = FLOAT32
+
+        # GPU buffers, dynamic objects stream vertex data through ring buffer
+        self.dynamic = False
+        self._buffers = None
+        self._buffers_material = None
+        # VAO attribute pointers depend on format, formats of same stride need new buffers too
+        self._buffers_format = None
+        self._vertex_key = None
+        self._vert_data = None
+        self._uploaded_data = None
+        self._center = np.zeros(3)
+        # transform applied by shader Model uniform instead of vertex data, moving object uploads nothing
+        self.model_transform = None
+
+        # debug overlays: kind -> (OverlayBuffers, material, vertex format), None materials -> shared defaults
+        self._overlays = {}
+        self.wire_material = None
+        self.normals_material = None
+
+    def mark_dirty(self):
         """
-        shader rendering
-        :return:
+        vertexes, normals or tex coords were changed in place, vertex data is packed again on next draw
         """
+        self._vertex_key = None
 
-        if self.material is None:
-            return False
+    def vertex_data(self):
+        """
+        packed vertex data, re-packed only when transforms, vertex format or geometry changed
+        :return: uint8 np.ndarray
+        """
+        if self._vertex_data_key(self.parent_transform) != self._vertex_key:
+            self.use_vertex_data(self.pack_vertex_data(self.parent_transform))
 
-        if len(self.surfaces) == 0:
-            return False
+        return self._vert_data
 
-        # vertexes = np.array([p.to_list() for p in self.get_verts()], dtype=np.float32)
+    def pack_vertex_data(self, parent_transform=None, out: np.ndarray = None):
+        """
+        packs vertex data without changing object state, safe to call off GL thread
+        :param parent_transform: parent transform to bake, None -> no parent
+        :param out: uint8 array to pack into
+        :return: packed data for use_vertex_data
+        """
+        vertexes, normals, tex_coords = self._vertex_arrays(parent_transform)
+        data = self.vertex_format.pack(vertexes, normals, tex_coords, out)
+        center = vertexes.mean(axis=0) if len(vertexes) else np.zeros(3)
 
-        vertexes = np.array([p.to_list() for p in self.vertexes], dtype=np.float32)
-        vertexes = np.array([self.transform.local_to_global(v) for v in vertexes], dtype=np.float32)
-        if self.parent_transform:
-            vertexes = np.array([self.parent_transform.local_to_global(v) for v in vertexes], dtype=np.float32)
+        return self._vertex_data_key(parent_transform), data, center
+
+    def use_vertex_data(self, packed):
+        """
+        installs data from pack_vertex_data, it is used while transforms match
+        """
+        self._vertex_key, self._vert_data, self._center = packed
+
+    def _vertex_data_key(self, parent_transform):
+        return (self.transform.matrix().tobytes(),
+                parent_transform.matrix().tobytes() if parent_transform else None,
+                id(self.vertex_format))
 
-        normals = np.array([n for n in self.normals], dtype=np.float32)
-        #colors = np.array([c for c in self.colors], dtype=np.float32)
-        tex_coords = np.array([t for t in self.tex_coords], dtype=np.float32)
+    def release_buffers(self):
+        """
+        deletes GPU buffers of object
+        """
+        for overlay, _, _ in self._overlays.values():
+            overlay.destroy()
+        self._overlays = {}
+
+        if self._buffers is not None:
+            self._buffers.destroy()
+            self._buffers = None
+
+    def vertex_arrays(self):
+        """
+        vertex attributes in global space
+        :return: (positions, normals, tex_coords) np arrays
+        """
+        return self._vertex_arrays(self.parent_transform)
+
+    def _vertex_arrays(self, parent_transform):
+        vertexes = np.array([p.to_list() for p in self.vertexes], dtype=np.float64).reshape(-1, 3)
+        vertexes = self.transform.apply(vertexes)
+        if parent_transform:
+            vertexes = parent_transform.apply(vertexes)
+
+        normals = np.asarray(self.normals, dtype=np.float64).reshape(-1, 3)
+
+        # missing tex coords are zero filled
+        tex_coords = np.zeros((len(vertexes), 2))
+        coords = np.asarray(self.tex_coords, dtype=np.float64).reshape(-1, 2)[:len(vertexes)]
+        tex_coords[:len(coords)] = coords
 
-        indexes = np.array(self.surfaces, dtype=np.uint32).flatten()
+        return vertexes, normals, tex_coords
 
-        vert_data = np.append(vertexes, normals)
-        vert_data = np.append(vert_data, tex_coords)
+    def vertex_error_report(self):
+        """
+        vertex_format encoding error against float32 reference
+        :return: dict, see VertexFormat.error_report
+        """
+        return self.vertex_format.error_report(*self.vertex_arrays())
+
+    def index_buffer(self):
+        """
+        cache optimized index data, built once per object
+        :return: IndexBuffer
+        """
+        if self._index_buffer is None:
+            self._index_buffer = build_index_buffer(self.surfaces, len(self.vertexes),
+                                                    optimize=self.optimize_indices, strips=self.use_strips)
+        return self._index_buffer
+
+    def edge_index_buffer(self):
+        """
+        line index data of edges, built once per object
+        :return: IndexBuffer of GL_LINES
+        """
+        if self._edge_index_buffer is None:
+            self._edge_index_buffer = build_line_index_buffer(self.edges, len(self.vertexes))
+        return self._edge_index_buffer
 
-        VAO = glGenVertexArrays(1)
-        VBO = glGenBuffers(1)
-        EBO = glGenBuffers(1)
+    def overlay_material(self, kind: str):
+        """
+        :param kind: "edges" | "normals"
+        :return: own overlay material or shared default
+        """
+        if kind == "edges":
+            own, default = self.wire_material, Wireframe
+        elif kind == "normals":
+            own, default = self.normals_material, FaceNormals
+        else:
+            raise Exception("Invalid overlay {}".format(kind))
 
-        glBindVertexArray(VAO)
+        if own is not None:
+            return own
+        if kind not in _OVERLAY_MATERIALS:
+            _OVERLAY_MATERIALS[kind] = default()
+        return _OVERLAY_MATERIALS[kind]
 
-        glBindBuffer(GL_ARRAY_BUFFER, VBO)
-        #glBufferData(GL_ARRAY_BUFFER, vertexes, GL_STATIC_DRAW)
-        glBufferData(GL_ARRAY_BUFFER, vert_data, GL_STATIC_DRAW)
+    def prepare_overlay(self, kind: str):
+        """
+        buffers of edges or face normals overlay, vertex buffer is shared with mesh
+        :param kind: "edges" (lines of edges) | "normals" (mesh triangles, lines made by geometry shader)
+        :return: (OverlayBuffers, IndexBuffer, material) or None if object can't be drawn
+        """
+        prepared = self.prepare()
+        if prepared is None:
+            return None
+
+        buffers, index_buffer = prepared
+        material = self.overlay_material(kind)
+
+        indexes = None
+        if kind == "edges":
+            index_buffer = self.edge_index_buffer()
+            if len(index_buffer) == 0:
+                return None
+            indexes = index_buffer.indices
+
+        overlay = self._overlays.get(kind)
+        if overlay is None or overlay[0].mesh is not buffers or overlay[1] is not material \
+                or overlay[2] is not self.vertex_format:
+            if overlay is not None:
+                overlay[0].destroy()
+            overlay = (OverlayBuffers(buffers, indexes, lambda: material.apply_attrs(self.vertex_format), owner=self),
+                       material, self.vertex_format)
+            self._overlays[kind] = overlay
+
+        return overlay[0], index_buffer, material
+
+    def prepare(self):
+        """
+        uploads changed vertex data, creates GPU buffers on first use
+        :return: (MeshBuffers, IndexBuffer) or None if object can't be drawn
+        """
+        if self.material is None:
+            return None
 
-        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, EBO)
-        glBufferData(GL_ELEMENT_ARRAY_BUFFER, indexes, GL_STATIC_DRAW)
+        if len(self.surfaces) == 0:
+            return None
+
+        vert_data = self.vertex_data()
+
+        index_buffer = self.index_buffer()
+        indexes = index_buffer.indices
+
+        buffers = self._buffers
+        if buffers is None or buffers.vertex_bytes != len(vert_data) or buffers.dynamic != self.dynamic \
+                or self._buffers_material is not self.material or self._buffers_format is not self.vertex_format:
+            self.release_buffers()
+            buffers = MeshBuffers(vert_data, indexes, lambda: self.material.apply_attrs(self.vertex_format),
+                                  dynamic=self.dynamic, owner=self)
+            self._buffers = buffers
+            self._buffers_material = self.material
+            self._buffers_format = self.vertex_format
+        elif vert_data is not self._uploaded_data:
+            # static buffers keep no copy, last uploaded data is diffed
+            buffers.update(vert_data, previous=self._uploaded_data)
+        self._uploaded_data = vert_data
+
+        return buffers, index_buffer
+
+    def submit(self, queue):
+        """
+        adds draw item of object into render queue
+        :param queue: render_queue.RenderQueue
+        """
+        prepared = self.prepare()
+        if prepared is None:
+            return False
 
-        #glVertexAttribPointer(0, 3, GL_FLOAT, GL_FALSE, 0, None)
-        #glEnableVertexAttribArray(0)
+        buffers, index_buffer = prepared
+        model = self.model_matrix()
+        queue.submit(DrawItem(self.material, self.vertex_format, buffers, index_buffer, len(self.vertexes),
+                              queue.depth(self._model_center(model)), model))
+        return True
 
-        self.material.apply_attrs()
+    def model_matrix(self) -> np.ndarray | None:
+        """
+        matrix of Model uniform, None -> identity
+        """
+        return self.model_transform.matrix() if self.model_transform is not None else None
 
-        glBindBuffer(GL_ARRAY_BUFFER, 0)
-        glBindVertexArray(0)
+    def _model_center(self, model):
+        return self._center if model is None else model[:3, :3] @ self._center + model[:3, 3]
+
+    def submit_overlay(self, queue, kind: str):
+        """
+        adds draw item of overlay into render queue, see prepare_overlay
+        """
+        prepared = self.prepare_overlay(kind)
+        if prepared is None:
+            return False
+
+        buffers, index_buffer, material = prepared
+        model = self.model_matrix()
+        queue.submit(DrawItem(material, self.vertex_format, buffers, index_buffer, len(self.vertexes),
+                              queue.depth(self._model_center(model)), model))
+        return True
+
+    def apply_material(self):
+        """
+        shader rendering
+        :return:
+        """
+
+        prepared = self.prepare()
+        if prepared is None:
+            return False
+
+        buffers, index_buffer = prepared
+        indexes = index_buffer.indices
 
         glUseProgram(self.material.shader)
 
@@ -230,9 +495,17 @@ class Object3D(ABC):
 
                 #self.material.apply_transform(self.transform)
                 self.material.apply_uniform()
-
-                glBindVertexArray(VAO)
-                glDrawElements(GL_TRIANGLES, len(indexes), GL_UNSIGNED_INT, None)
+                self.material.apply_vertex_format(self.vertex_format)
+                self.material.apply_model(self.model_matrix())
+                self.material.use_texture()
+
+                glBindVertexArray(buffers.vao)
+                if index_buffer.restart_index is not None:
+                    glEnable(GL_PRIMITIVE_RESTART)
+                    glPrimitiveRestartIndex(index_buffer.restart_index)
+                buffers.draw(index_buffer.mode, len(indexes), index_buffer.gl_type, len(self.vertexes))
+                if index_buffer.restart_index is not None:
+                    glDisable(GL_PRIMITIVE_RESTART)
 
                 # glEnableVertexAttribArray(self.material.Vertex_position_loc)
                 # glEnableVertexAttribArray(self.material.Vertex_normal_loc)
@@ -259,6 +532,7 @@ class Object3D(ABC):
             finally:
                 #self.vbo.unbind()
 
+                glBindVertexArray(0)
                 glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, 0)  # reset
                 glDisableClientState(GL_COLOR_ARRAY)
                 glDisableClientState(GL_NORMAL_ARRAY)
@@ -329,68 +603,31 @@ class Object3D(ABC):
         """
         pass
 
-    def draw(self, draw_warframe=False):
-
-        #print(type(self.material))
-        self.apply_material()
-
-        return
-
-        glBegin(GL_TRIANGLES)
-
-        for i, surface in enumerate(self.surfaces):
-            x = 0
-
-            for vertex in surface:
-                x += 1
-                color = self.colors[vertex]
-                glColor3fv(color)
-
-                nx, ny, nz = self.normals[vertex]
-                glNormal(nx, ny, nz)
-                # point = self.pos + vertexes[vertex] * self.size
-                v = self.vertexes[vertex].to_list()
-                point = self.transform.local_to_global(v)
-                if self.parent_transform:
-                    point = self.parent_transform.local_to_global(point)
-                # glVertex3fv(point.to_list())
-                glVertex3fv(point)
-        glEnd()
-
-        if not draw_warframe:
-            return
-
-        glColor3fv(Color.WHITE)
-
-        glBegin(GL_LINES)
-
-        for edge in self.edges:
-            for vertex in edge:
-                # point = self.pos + vertexes[vertex] * self.size
-                # point = vertexes[vertex]
-                v = self.vertexes[vertex].to_list()
-                point = self.transform.local_to_global(v)
-                if parent_transform:
-                    point = parent_transform.local_to_global(point)
-                # glVertex3fv(point.to_list())
-                glVertex3fv(point)
-
-        # normals
-
-        # for i, surface in enumerate(surfaces):
-        #     nx, ny, nz = normals[i]
-        #     center = vertexes[surfaces[i][0]].to_list()
-        #     norm = center + Point(nx, ny, nz).to_list()
-        #
-        #     center = self.transform.local_to_global(center)
-        #     norm = self.transform.local_to_global(norm)
-        #
-        #     glVertex3fv(center)
-        #     glVertex3fv(norm)
+    def draw(self, draw_warframe=False, queue=None, draw_normals=False):
+        """
+        :param draw_warframe: draw edges
+        :param queue: RenderQueue, None -> draw immediately
+        :param draw_normals: draw face normals
+        """
+        immediate = queue is None
+
+        if immediate:
+            self.apply_material()
+            if not draw_warframe and not draw_normals:
+                return
+            # overlays drawn through one-off queue
+            queue = RenderQueue()
+            queue.begin_frame()
+        else:
+            self.submit(queue)
 
-        glEnd()
+        if draw_warframe:
+            self.submit_overlay(queue, "edges")
+        if draw_normals:
+            self.submit_overlay(queue, "normals")
 
-    pass
+        if immediate:
+            queue.flush()
 
 
 class Cube3D(Object3D):
@@ -399,7 +636,7 @@ class Cube3D(Object3D):
     """
 
     def set_tex_coords(self):
-        return [[i % 3, (i+1) % 3] for i in range(len(self.set_surfs()))]
+        return [[i % 3, (i+1) % 3] for i in range(len(self.set_verts()))]
 
     def __init__(self):
         super(Cube3D, self).__init__()
@@ -457,19 +694,217 @@ class Cube3D(Object3D):
         return vertexes
 
 
+def _cell_hash(cells: np.ndarray) -> np.ndarray:
+    # wrapping int64 hash, collisions only add candidates rejected by distance test
+    return (cells[:, 0] * 73856093) ^ (cells[:, 1] * 19349663) ^ (cells[:, 2] * 83492791)
+
+
+def weld_vertexes(vertexes: np.ndarray, tolerance: float = 1e-6):
+    """
+    merges coincident vertexes using spatial hash with cell size = tolerance. Each vertex is merged into
+    the first vertex closer than tolerance, chains of close vertexes end in their first one
+    :param vertexes: np.ndarray of shape (n, 3)
+    :param tolerance: max distance between merged vertexes
+    :return: (indexes of kept vertexes, remap of shape (n,) to new vertex index)
+    """
+    vertexes = np.asarray(vertexes, dtype=np.float64)
+    n = len(vertexes)
+    cells = np.floor(vertexes / tolerance).astype(np.int64)
+
+    keys = _cell_hash(cells)
+    order = np.argsort(keys, kind="stable")
+    sorted_keys = keys[order]
+    parent = np.arange(n)
+
+    # own cell and half of neighbours, each pair of cells is visited once
+    offsets = [(dx, dy, dz) for dx in (-1, 0, 1) for dy in (-1, 0, 1) for dz in (-1, 0, 1)]
+    for offset in np.array(offsets[13:]):
+        keys = _cell_hash(cells + offset)
+        # sorted needles, much faster lookup
+        needles = np.argsort(keys)
+        lo = np.empty(n, dtype=np.int64)
+        counts = np.empty(n, dtype=np.int64)
+        lo[needles] = np.searchsorted(sorted_keys, keys[needles], "left")
+        counts[needles] = np.searchsorted(sorted_keys, keys[needles], "right") - lo[needles]
+
+        # all (vertex, candidate in neighbour cell) pairs
+        i = np.repeat(np.arange(n), counts)
+        starts = np.repeat(np.cumsum(counts) - counts, counts)
+        j = order[np.repeat(lo, counts) + np.arange(len(i)) - starts]
+
+        close = i != j
+        close[close] = ((vertexes[i[close]] - vertexes[j[close]]) ** 2).sum(axis=1) <= tolerance * tolerance
+        i, j = i[close], j[close]
+        np.minimum.at(parent, np.maximum(i, j), np.minimum(i, j))
+
+    # pointer jumping to first vertex of chain
+    while True:
+        root = parent[parent]
+        if np.array_equal(root, parent):
+            break
+        parent = root
+
+    kept = np.nonzero(parent == np.arange(n))[0]
+    return kept, np.searchsorted(kept, parent)
+
+
+class WeldedMesh(Object3D):
+    """
+    single vertex / index buffer built from several objects
+    """
+
+    def __init__(self, vertexes: np.ndarray, normals: np.ndarray, surfaces: np.ndarray, tex_coords: np.ndarray,
+                 source_vertex_count: int = 0):
+        """
+        :param vertexes: np.ndarray of shape (n, 3)
+        :param normals: unit normals, np.ndarray of shape (n, 3)
+        :param surfaces: triangles indexes, np.ndarray of shape (m, 3)
+        :param tex_coords: np.ndarray of shape (n, 2)
+        :param source_vertex_count: vertexes count before welding
+        """
+        self.source_vertex_count = source_vertex_count or len(vertexes)
+        self._vertexes = vertexes
+        self._normals = normals
+        self._surfaces = surfaces
+        self._tex_coords = tex_coords
+
+        super(WeldedMesh, self).__init__()
+
+    def set_vertexes(self, vertexes: np.ndarray, normals: np.ndarray):
+        """
+        deformed vertexes of same topology, packed and uploaded on next draw, dynamic meshes stream them
+        :param vertexes: np.ndarray of shape (n, 3)
+        :param normals: unit normals, np.ndarray of shape (n, 3)
+        """
+        self._vertexes = vertexes
+        self._normals = normals
+        self.vertexes = self.set_verts()
+        self.normals = self.calc_normals()
+        self.mark_dirty()
+
+    def pack_deformed(self, vertexes: np.ndarray, normals: np.ndarray, out: np.ndarray = None):
+        """
+        packs deformed vertexes of same topology without changing mesh, safe to call off GL thread.
+        Installed data is used until transforms change or set_vertexes / mark_dirty, see use_vertex_data
+        :param vertexes: np.ndarray of shape (n, 3)
+        :param normals: unit normals, np.ndarray of shape (n, 3)
+        :param out: uint8 array to pack into
+        :return: packed data for use_vertex_data
+        """
+        vertexes = self.transform.apply(vertexes)
+        if self.parent_transform:
+            vertexes = self.parent_transform.apply(vertexes)
+        data = self.vertex_format.pack(vertexes, normals, self._tex_coords, out)
+
+        return self._vertex_data_key(self.parent_transform), data, vertexes.mean(axis=0)
+
+    def set_verts(self):
+        return [Point.from_list(v) for v in self._vertexes]
+
+    def set_surfs(self):
+        return self._surfaces
+
+    def set_edges(self):
+        edges = np.sort(np.concatenate([self._surfaces[:, [0, 1]],
+                                        self._surfaces[:, [1, 2]],
+                                        self._surfaces[:, [2, 0]]]), axis=1)
+        return np.unique(edges, axis=0)
+
+    def set_tex_coords(self):
+        return self._tex_coords
+
+    def calc_normals(self):
+        return self._normals
+
+
 class Composed:
 
     def __init__(self, objects: list[Object3D] | np.ndarray):
         self.transform = Transform()
         self.objects = objects
+        self.welded = None
 
         for o in self.objects:
             o.parent_transform = self.transform
 
-    def draw_all(self):
+    def weld(self, tolerance: float = 1e-6):
+        """
+        merges objects into one WeldedMesh, coincident vertexes are shared
+        and their normals are averaged across seams. Seam vertexes with different tex coords stay separate
+        vertexes with the shared normal. Objects must have the same material
+        :param tolerance: max distance between merged vertexes
+        :return: WeldedMesh, None if no object has surfaces (curves), objects are drawn separately
+        """
+        vertexes, normals, tex_coords, surfaces = [], [], [], []
+        offset = 0
+        material = None
+
+        for o in self.objects:
+            surfs = np.asarray(o.surfaces, dtype=np.int64).reshape(-1, 3)
+            if len(surfs) == 0:
+                continue
+
+            # one buffer is drawn with one material
+            if vertexes and o.material is not material:
+                raise Exception("Objects of Composed have different materials, weld objects of each material")
+            material = o.material
+
+            verts = np.array([p.to_list() for p in o.vertexes], dtype=np.float64)
+            vertexes.append(o.transform.apply(verts))
+            normals.append(o.transform.apply_normals(o.normals))
+            tex_coords.append(np.asarray(o.tex_coords, dtype=np.float64).reshape(len(verts), -1)[:, :2])
+
+            # mirroring transform flips winding
+            if np.linalg.det(o.transform.matrix()[:3, :3]) < 0:
+                surfs = surfs[:, ::-1]
+            surfaces.append(surfs + offset)
+            offset += len(verts)
+
+        if not vertexes:
+            self.welded = None
+            return None
+
+        vertexes = np.concatenate(vertexes)
+        normals = np.concatenate(normals)
+        tex_coords = np.concatenate(tex_coords)
+        surfaces = np.concatenate(surfaces)
+
+        kept, remap = weld_vertexes(vertexes, tolerance)
+
+        merged_normals = np.zeros((len(kept), 3))
+        np.add.at(merged_normals, remap, normals)
+        lengths = np.linalg.norm(merged_normals, axis=1, keepdims=True)
+        merged_normals = np.divide(merged_normals, lengths, out=np.zeros_like(merged_normals), where=lengths > 0)
+
+        # triangles collapsed by welding
+        welded = remap[surfaces]
+        surfaces = surfaces[(welded[:, 0] != welded[:, 1]) &
+                            (welded[:, 1] != welded[:, 2]) &
+                            (welded[:, 2] != welded[:, 0])]
+
+        # vertex per (position, tex coords)
+        uv_cells = np.round(tex_coords / tolerance).astype(np.int64)
+        _, first, vertex_of = np.unique(np.column_stack([remap, uv_cells]), axis=0,
+                                        return_index=True, return_inverse=True)
+        surfaces = vertex_of.reshape(-1)[surfaces]
+
+        self.welded = WeldedMesh(vertexes[first], merged_normals[remap[first]], surfaces, tex_coords[first],
+                                 len(vertexes))
+        self.welded.parent_transform = self.transform
+        self.welded.material = material
+
+        return self.welded
+
+    def draw_all(self, queue=None, draw_warframe=False, draw_normals=False):
+        if self.welded is not None:
+            self.welded.draw(draw_warframe, queue, draw_normals)
+            return
+
         for o in self.objects:
-            o.draw()
+            o.draw(draw_warframe, queue, draw_normals)
 
     def set_material_all(self, material):
         for o in self.objects:
             o.material = material
+        if self.welded is not None:
+            self.welded.material = material
@@ -0,0 +1,279 @@
+"""
+Optional GL call tracing \n
+replaces GL functions imported by `from OpenGL.GL import *` in traced modules with counting wrappers:
+calls and time per function and frame, redundant state changes, GL objects created during frames,
+call log of captured frames for diffing between versions
+"""
+
+import sys
+import time
+from collections import Counter
+
+import numpy as np
+import OpenGL.GL as GL
+
+# modules with GL calls of render loop
+TRACED_MODULES = ("geometrix", "curves", "lightning", "buffers", "render_queue", "camera", "lights", "capture",
+                  "pointcloud", "polylines", "main", "__main__")
+
+# object creation; fences are created every frame by streaming buffers on purpose
+CREATE_PREFIXES = ("glGen", "glCreate")
+
+
+def _value(value):
+    """
+    hashable, comparable form of call argument
+    """
+    if isinstance(value, np.ndarray):
+        return value.dtype.str, value.shape, value.tobytes()
+    if isinstance(value, (list, tuple)):
+        return tuple(_value(v) for v in value)
+    if isinstance(value, (int, float, str, bytes)) or value is None:
+        return value
+    return repr(value)
+
+
+def _format(value) -> str:
+    """
+    call argument for capture log, no addresses or timings so logs can be diffed
+    """
+    if isinstance(value, np.ndarray):
+        if value.size <= 16:
+            return "array({})".format(np.array2string(value.ravel(), precision=4, separator=","))
+        return "array({}, {})".format(value.dtype, value.shape)
+    if isinstance(value, np.generic):
+        return _format(value.item())
+    if isinstance(value, float):
+        return "{:.6g}".format(value)
+    if isinstance(value, (list, tuple)):
+        return "[{}]".format(", ".join(_format(v) for v in value))
+    if isinstance(value, bytes):
+        return repr(value)
+    if hasattr(value, "value") and not isinstance(value, int):
+        # ctypes values, attribute offsets
+        return "{}({})".format(type(value).__name__, value.value)
+    text = repr(value)
+    if " at 0x" in text:
+        # opaque handles, e.g. GLsync
+        return "<{}>".format(type(value).__name__)
+    return text
+
+
+class FrameTrace:
+    """
+    calls of one frame or sum of frames
+    """
+
+    def __init__(self):
+        self.frames = 0
+        self.calls = Counter()
+        self.time = Counter()
+        self.redundant = Counter()
+        self.created = Counter()
+
+    def add(self, other):
+        self.frames += other.frames
+        self.calls.update(other.calls)
+        self.time.update(other.time)
+        self.redundant.update(other.redundant)
+        self.created.update(other.created)
+
+    def total_calls(self):
+        return sum(self.calls.values())
+
+
+class GLTracer:
+    """
+    install() -> begin_frame() / end_frame() around each frame -> uninstall() \n
+    state tracking only sees calls of traced modules, state changed elsewhere
+    (e.g. OpenGL.GL.shaders) may hide or fake redundancy
+    """
+
+    def __init__(self, modules=TRACED_MODULES, warmup_frames: int = 1):
+        """
+        :param modules: names of modules to patch, missing ones are skipped
+        :param warmup_frames: frames where object creation is expected (first uploads)
+        """
+        self.module_names = modules
+        self.warmup_frames = warmup_frames
+        self._patched = []
+
+        self.frame = 0
+        self.current = FrameTrace()
+        self.last = FrameTrace()
+        self.total = FrameTrace()
+
+        self._state = {}
+        self._locations = set()
+
+        self.capturing = False
+        self.log = []
+
+        # seconds added by tracing per call, not part of reported call times
+        self.overhead = 0.0
+
+    def install(self):
+        if self._patched:
+            return self
+
+        for module_name in self.module_names:
+            module = sys.modules.get(module_name)
+            if module is None:
+                continue
+            for name, value in list(vars(module).items()):
+                if name.startswith("gl") and callable(value) and getattr(GL, name, None) is value:
+                    setattr(module, name, self._wrap(name, value))
+                    self._patched.append((module, name, value))
+
+        self.overhead = self._calibrate()
+        return self
+
+    def uninstall(self):
+        for module, name, value in self._patched:
+            setattr(module, name, value)
+        self._patched = []
+
+    def _wrap(self, name, func):
+        record = self._record
+
+        def traced(*args, **kwargs):
+            start = time.perf_counter()
+            result = func(*args, **kwargs)
+            record(name, args, result, time.perf_counter() - start)
+            return result
+
+        traced.__wrapped__ = func
+        traced.__name__ = name
+        return traced
+
+    def _calibrate(self, count: int = 2000):
+        """
+        tracing cost: timed wrapped no-op call, state checks included
+        """
+        saved = self.current, self.capturing
+        self.current, self.capturing = FrameTrace(), False
+
+        noop = self._wrap("glNoop", lambda *args: None)
+        start = time.perf_counter()
+        for _ in range(count):
+            noop(0)
+        overhead = (time.perf_counter() - start) / count
+
+        self.current, self.capturing = saved
+        return overhead
+
+    def _redundant(self, name, args) -> bool:
+        """
+        compares call with tracked GL state, updates state
+        """
+        if name == "glGetUniformLocation" or name == "glGetAttribLocation":
+            key = (name, int(args[0]), _value(args[1]))
+            if key in self._locations:
+                return True
+            self._locations.add(key)
+            return False
+
+        if name == "glUseProgram":
+            key, value = "program", args[0]
+        elif name == "glActiveTexture":
+            key, value = "active_texture", args[0]
+        elif name == "glBindTexture":
+            key, value = ("texture", self._state.get("active_texture"), args[0]), args[1]
+        elif name == "glBindVertexArray":
+            # element array binding is part of VAO
+            self._state.pop(("buffer", int(GL.GL_ELEMENT_ARRAY_BUFFER)), None)
+            key, value = "vertex_array", args[0]
+        elif name == "glBindBuffer":
+            key, value = ("buffer", int(args[0])), args[1]
+        elif name == "glBindFramebuffer":
+            key, value = ("framebuffer", int(args[0])), args[1]
+        elif name == "glEnable" or name == "glDisable":
+            key, value = ("enable", int(args[0])), name == "glEnable"
+        elif name in ("glBlendFunc", "glDepthMask", "glDepthFunc", "glClearColor"):
+            key, value = name, args
+        elif name.startswith("glUniform"):
+            key, value = ("uniform", self._state.get("program"), _value(args[0])), args[1:]
+        else:
+            return False
+
+        value = _value(value)
+        if key in self._state and self._state[key] == value:
+            return True
+        self._state[key] = value
+        return False
+
+    def _record(self, name, args, result, elapsed):
+        frame = self.current
+        frame.calls[name] += 1
+        frame.time[name] += elapsed
+
+        redundant = self._redundant(name, args)
+        if redundant:
+            frame.redundant[name] += 1
+
+        created = name.startswith(CREATE_PREFIXES) and self.frame >= self.warmup_frames
+        if created:
+            frame.created[name] += 1
+
+        if self.capturing:
+            line = "{}({})".format(name, ", ".join(_format(a) for a in args))
+            if redundant:
+                line += "  # redundant"
+            if created:
+                line += "  # created in frame"
+            self.log.append(line)
+
+    def begin_frame(self, capture: bool = False):
+        """
+        :param capture: record call log of frame
+        """
+        self.current = FrameTrace()
+        self.capturing = capture
+        if capture:
+            self.log = ["# frame {}".format(self.frame)]
+
+    def end_frame(self):
+        self.current.frames = 1
+        self.last = self.current
+        self.total.add(self.current)
+        # calls between frames are not counted
+        self.current = FrameTrace()
+        self.capturing = False
+        self.frame += 1
+
+    def reset_stats(self):
+        self.total = FrameTrace()
+
+    def write_capture(self, path: str):
+        """
+        call log of last captured frame, one call per line
+        """
+        with open(path, "w") as f:
+            f.write("\n".join(self.log) + "\n")
+
+    def report(self):
+        """
+        short summary for window caption, averages since reset_stats
+        """
+        trace = self.total
+        frames = max(trace.frames, 1)
+        calls = trace.total_calls()
+        traced_time = sum(trace.time.values())
+        return "gl {:.0f} calls/frame, {:.0f} redundant, {:.1f} created, {:.2f} ms".format(
+            calls / frames, sum(trace.redundant.values()) / frames,
+            sum(trace.created.values()) / frames, traced_time / frames * 1000)
+
+    def table(self, trace: FrameTrace = None) -> str:
+        """
+        per function calls, redundant calls, creations and mean time per call
+        """
+        trace = trace or self.total
+        frames = max(trace.frames, 1)
+        lines = ["{:<28} {:>10} {:>10} {:>9} {:>10}".format("function", "calls/fr", "redund/fr", "new/fr", "us/call")]
+        for name, calls in trace.calls.most_common():
+            per_call = trace.time[name] / calls
+            lines.append("{:<28} {:>10.1f} {:>10.1f} {:>9.1f} {:>10.2f}".format(
+                name, calls / frames, trace.redundant[name] / frames, trace.created[name] / frames,
+                per_call * 1e6))
+        lines.append("tracing adds {:.2f} us/call, not included".format(self.overhead * 1e6))
+        return "\n".join(lines)
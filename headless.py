@@ -0,0 +1,105 @@
+"""
+Offscreen GL context without window or display server: EGL (surfaceless Mesa or pbuffer) + framebuffer object \n
+must be imported before anything imports OpenGL, PyOpenGL picks platform on first import
+"""
+
+import ctypes
+import os
+
+import numpy as np
+
+os.environ.setdefault("PYOPENGL_PLATFORM", "egl")
+
+# EGL_PLATFORM_SURFACELESS_MESA
+_PLATFORM_SURFACELESS = 0x31DD
+
+
+class HeadlessContext:
+    """
+    compatibility profile context rendering into RGBA8 + depth framebuffer of given size
+    """
+
+    def __init__(self, width: int = 800, height: int = 600):
+        from OpenGL import EGL
+
+        self.width = width
+        self.height = height
+
+        self.display = self._get_display(EGL)
+        major, minor = EGL.EGLint(), EGL.EGLint()
+        if not EGL.eglInitialize(self.display, ctypes.pointer(major), ctypes.pointer(minor)):
+            raise Exception("EGL initialization failed")
+        EGL.eglBindAPI(EGL.EGL_OPENGL_API)
+
+        attrs = (EGL.EGLint * 5)(EGL.EGL_RENDERABLE_TYPE, EGL.EGL_OPENGL_BIT,
+                                 EGL.EGL_SURFACE_TYPE, EGL.EGL_PBUFFER_BIT, EGL.EGL_NONE)
+        config = EGL.EGLConfig()
+        count = EGL.EGLint()
+        EGL.eglChooseConfig(self.display, attrs, ctypes.pointer(config), 1, ctypes.pointer(count))
+        if count.value == 0:
+            raise Exception("No EGL config with desktop GL support")
+
+        self.context = EGL.eglCreateContext(self.display, config, EGL.EGL_NO_CONTEXT, None)
+        if self.context == EGL.EGL_NO_CONTEXT:
+            raise Exception("EGL context creation failed")
+        self.make_current()
+
+        self._create_framebuffer()
+
+    @staticmethod
+    def _get_display(EGL):
+        try:
+            from OpenGL.EGL.EXT.platform_base import eglGetPlatformDisplayEXT
+            display = eglGetPlatformDisplayEXT(_PLATFORM_SURFACELESS, EGL.EGL_DEFAULT_DISPLAY, None)
+            if display:
+                return display
+        except Exception:
+            pass
+        return EGL.eglGetDisplay(EGL.EGL_DEFAULT_DISPLAY)
+
+    def make_current(self):
+        from OpenGL import EGL
+        EGL.eglMakeCurrent(self.display, EGL.EGL_NO_SURFACE, EGL.EGL_NO_SURFACE, self.context)
+
+    def _create_framebuffer(self):
+        from OpenGL.GL import glGenFramebuffers, glBindFramebuffer, glGenRenderbuffers, glBindRenderbuffer, \
+            glRenderbufferStorage, glFramebufferRenderbuffer, glCheckFramebufferStatus, glViewport, \
+            GL_FRAMEBUFFER, GL_RENDERBUFFER, GL_RGBA8, GL_DEPTH_COMPONENT24, GL_COLOR_ATTACHMENT0, \
+            GL_DEPTH_ATTACHMENT, GL_FRAMEBUFFER_COMPLETE
+
+        self.framebuffer = glGenFramebuffers(1)
+        glBindFramebuffer(GL_FRAMEBUFFER, self.framebuffer)
+
+        self.color = glGenRenderbuffers(1)
+        glBindRenderbuffer(GL_RENDERBUFFER, self.color)
+        glRenderbufferStorage(GL_RENDERBUFFER, GL_RGBA8, self.width, self.height)
+        glFramebufferRenderbuffer(GL_FRAMEBUFFER, GL_COLOR_ATTACHMENT0, GL_RENDERBUFFER, self.color)
+
+        self.depth = glGenRenderbuffers(1)
+        glBindRenderbuffer(GL_RENDERBUFFER, self.depth)
+        glRenderbufferStorage(GL_RENDERBUFFER, GL_DEPTH_COMPONENT24, self.width, self.height)
+        glFramebufferRenderbuffer(GL_FRAMEBUFFER, GL_DEPTH_ATTACHMENT, GL_RENDERBUFFER, self.depth)
+
+        if glCheckFramebufferStatus(GL_FRAMEBUFFER) != GL_FRAMEBUFFER_COMPLETE:
+            raise Exception("Incomplete framebuffer")
+
+        glViewport(0, 0, self.width, self.height)
+
+    def read_pixels(self) -> np.ndarray:
+        """
+        :return: np.ndarray of shape (height, width, 4), uint8, bottom row first
+        """
+        from OpenGL.GL import glReadPixels, GL_RGBA, GL_UNSIGNED_BYTE
+
+        data = glReadPixels(0, 0, self.width, self.height, GL_RGBA, GL_UNSIGNED_BYTE)
+        return np.frombuffer(data, dtype=np.uint8).reshape(self.height, self.width, 4)
+
+    def renderer(self) -> str:
+        from OpenGL.GL import glGetString, GL_RENDERER, GL_VERSION
+        return "{} ({})".format(glGetString(GL_RENDERER).decode(), glGetString(GL_VERSION).decode())
+
+    def destroy(self):
+        from OpenGL import EGL
+        EGL.eglMakeCurrent(self.display, EGL.EGL_NO_SURFACE, EGL.EGL_NO_SURFACE, EGL.EGL_NO_CONTEXT)
+        EGL.eglDestroyContext(self.display, self.context)
+        EGL.eglTerminate(self.display)
@@ -0,0 +1,226 @@
+import numpy as np
+from OpenGL.GL import GL_LINES, GL_TRIANGLES, GL_TRIANGLE_STRIP, GL_UNSIGNED_SHORT, GL_UNSIGNED_INT
+
+
+def acmr(indices: np.ndarray, cache_size: int = 16) -> float:
+    """
+    average cache miss ratio of FIFO post-transform vertex cache
+    :param indices: triangles indexes, np.ndarray of shape (m, 3) or flat
+    :param cache_size: simulated cache size
+    :return: vertex cache misses per triangle
+    """
+    indices = np.asarray(indices).ravel()
+    if len(indices) == 0:
+        return 0.0
+
+    cache = []
+    cached = set()
+    misses = 0
+
+    for v in indices.tolist():
+        if v in cached:
+            continue
+        misses += 1
+        cache.append(v)
+        cached.add(v)
+        if len(cache) > cache_size:
+            cached.discard(cache.pop(0))
+
+    return misses / (len(indices) // 3)
+
+
+def tipsify(indices: np.ndarray, vertex_count: int, cache_size: int = 16) -> np.ndarray:
+    """
+    triangles reordering for post-transform vertex cache (Tipsify, Sander et al. 2007)
+    :param indices: triangles indexes, np.ndarray of shape (m, 3)
+    :param vertex_count: count of vertexes
+    :param cache_size: target cache size
+    :return: reordered triangles, np.ndarray of shape (m, 3)
+    """
+    triangles = np.asarray(indices, dtype=np.int64).reshape(-1, 3)
+    if len(triangles) == 0:
+        return triangles
+
+    # vertex -> triangles adjacency (CSR)
+    corners = triangles.ravel()
+    order = np.argsort(corners, kind="stable")
+    adjacency = (order // 3).tolist()
+    offsets = np.zeros(vertex_count + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum(np.bincount(corners, minlength=vertex_count))
+    offsets = offsets.tolist()
+
+    tris = triangles.tolist()
+    live = np.bincount(corners, minlength=vertex_count).tolist()
+    cache_time = [0] * vertex_count
+    emitted = [False] * len(tris)
+    dead_end = []
+    output = []
+
+    time = cache_size + 1
+    cursor = 1
+    fanning = 0
+
+    while fanning >= 0:
+        candidates = []
+
+        for t in adjacency[offsets[fanning]:offsets[fanning + 1]]:
+            if emitted[t]:
+                continue
+            output.append(t)
+            emitted[t] = True
+            for v in tris[t]:
+                dead_end.append(v)
+                candidates.append(v)
+                live[v] -= 1
+                if time - cache_time[v] > cache_size:
+                    cache_time[v] = time
+                    time += 1
+
+        # next fanning vertex: the one still in cache with fewest remaining uses
+        fanning = -1
+        best = -1
+        for v in candidates:
+            if live[v] > 0:
+                priority = 0
+                if time - cache_time[v] + 2 * live[v] <= cache_size:
+                    priority = time - cache_time[v]
+                if priority > best:
+                    best = priority
+                    fanning = v
+
+        if fanning == -1:
+            while dead_end:
+                v = dead_end.pop()
+                if live[v] > 0:
+                    fanning = v
+                    break
+
+        if fanning == -1:
+            while cursor < vertex_count:
+                cursor += 1
+                if live[cursor - 1] > 0:
+                    fanning = cursor - 1
+                    break
+
+    return triangles[output]
+
+
+def stripify(indices: np.ndarray, restart_index: int) -> np.ndarray:
+    """
+    greedy triangle strips joined by primitive restart, winding is preserved
+    :param indices: triangles indexes, np.ndarray of shape (m, 3)
+    :param restart_index: primitive restart index
+    :return: flat np.ndarray of strip indexes
+    """
+    tris = np.asarray(indices, dtype=np.int64).reshape(-1, 3).tolist()
+
+    # directed edge -> (triangle, opposite vertex)
+    edges = {}
+    for t, (a, b, c) in enumerate(tris):
+        edges[(a, b)] = (t, c)
+        edges[(b, c)] = (t, a)
+        edges[(c, a)] = (t, b)
+
+    used = [False] * len(tris)
+    output = []
+
+    for start, (a, b, c) in enumerate(tris):
+        if used[start]:
+            continue
+        used[start] = True
+
+        if output:
+            output.append(restart_index)
+        strip = [a, b, c]
+
+        while True:
+            p, q = strip[-2], strip[-1]
+            # odd triangles of strip are wound (q, p, x), even ones (p, q, x)
+            edge = (q, p) if (len(strip) - 2) % 2 == 1 else (p, q)
+            found = edges.get(edge)
+            if found is None or used[found[0]]:
+                break
+            used[found[0]] = True
+            strip.append(found[1])
+
+        output.extend(strip)
+
+    return np.array(output, dtype=np.int64)
+
+
+class IndexBuffer:
+    """
+    post-processed index data ready for glDrawElements
+    """
+
+    def __init__(self, indices, mode, gl_type, restart_index=None, acmr_before=0.0, acmr_after=0.0):
+        self.indices = indices
+        self.mode = mode
+        self.gl_type = gl_type
+        self.restart_index = restart_index
+        self.acmr_before = acmr_before
+        self.acmr_after = acmr_after
+
+    def __len__(self):
+        return len(self.indices)
+
+    def __str__(self):
+        return "IndexBuffer({mode}, {dtype}, {count} indexes, ACMR {before:.3f} -> {after:.3f})".format(
+            mode={GL_TRIANGLE_STRIP: "strip", GL_LINES: "lines"}.get(self.mode, "list"),
+            dtype=self.indices.dtype.name, count=len(self.indices),
+            before=self.acmr_before, after=self.acmr_after)
+
+    def __repr__(self):
+        return self.__str__()
+
+
+def build_index_buffer(surfaces, vertex_count: int, optimize: bool = True, strips: bool = False,
+                       cache_size: int = 16) -> IndexBuffer:
+    """
+    index post-processing stage
+    :param surfaces: triangles indexes
+    :param vertex_count: count of vertexes
+    :param optimize: reorder triangles for vertex cache
+    :param strips: emit triangle strips with primitive restart
+    :param cache_size: simulated / target cache size
+    :return: IndexBuffer with uint16 indexes if vertex count allows, else uint32
+    """
+    triangles = np.asarray(surfaces, dtype=np.int64).reshape(-1, 3)
+    before = acmr(triangles, cache_size)
+
+    if optimize:
+        triangles = tipsify(triangles, vertex_count, cache_size)
+    after = acmr(triangles, cache_size)
+
+    # max index value is reserved for primitive restart
+    if vertex_count < np.iinfo(np.uint16).max:
+        dtype, gl_type = np.uint16, GL_UNSIGNED_SHORT
+    else:
+        dtype, gl_type = np.uint32, GL_UNSIGNED_INT
+    restart_index = int(np.iinfo(dtype).max)
+
+    if strips:
+        indices = stripify(triangles, restart_index).astype(dtype)
+        return IndexBuffer(indices, GL_TRIANGLE_STRIP, gl_type, restart_index, before, after)
+
+    return IndexBuffer(triangles.ravel().astype(dtype), GL_TRIANGLES, gl_type, None, before, after)
+
+
+def build_line_index_buffer(edges, vertex_count: int) -> IndexBuffer:
+    """
+    GL_LINES index data of edges, duplicates (in any direction) and degenerate edges removed
+    :param edges: edges indexes, pairs of vertex indexes
+    :param vertex_count: count of vertexes
+    :return: IndexBuffer with uint16 indexes if vertex count allows, else uint32
+    """
+    lines = np.asarray(list(edges), dtype=np.int64).reshape(-1, 2)
+    lines = lines[lines[:, 0] != lines[:, 1]]
+    if len(lines):
+        lines = np.unique(np.sort(lines, axis=1), axis=0)
+
+    if vertex_count < np.iinfo(np.uint16).max:
+        dtype, gl_type = np.uint16, GL_UNSIGNED_SHORT
+    else:
+        dtype, gl_type = np.uint32, GL_UNSIGNED_INT
+
+    return IndexBuffer(lines.ravel().astype(dtype), GL_LINES, gl_type)
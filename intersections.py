@@ -0,0 +1,595 @@
+"""
+Intersections of Bézier curves and surfaces \n
+curve - curve, curve - plane and ray - patch queries by recursive de Casteljau subdivision: sub-curves
+(sub-patches) whose control point hulls can't intersect are pruned, the rest is split until smaller than
+tolerance (ray - patch: LEAF_SIZE of patch) and refined by Newton iterations. All queries of one call are
+subdivided together, level by level, as numpy arrays; control points of a batch are degree elevated to
+common degree. \n
+Polygonal objects (Cube3D, WeldedMesh, ...) are intersected with rays triangle by triangle, see ray_mesh. \n
+Results are parameters of curves / patches and points in global space (transform, parent_transform and
+model_transform applied). Coincident geometry (overlapping curves, curve lying in plane) raises Exception
+"""
+
+import numpy as np
+
+from curves import BezierCurve, BezierSurface, bernstein_basis, bernstein_derivative, points_array
+from geometrix import Object3D
+
+# limit of sub-curves / sub-patches alive at once
+MAX_FRONTIER = 1 << 18
+
+NEWTON_ITERATIONS = 8
+
+# ray - patch subdivision stops at sub-patches of this fraction of patch size, Newton refines the rest
+LEAF_SIZE = 1e-3
+
+
+def homogeneous(points: np.ndarray, weights: np.ndarray = None) -> np.ndarray:
+    """
+    control points with weights as (w * x, w * y, w * z, w)
+    :param points: np.ndarray of shape (..., 3)
+    :param weights: np.ndarray of shape (...), None -> ones
+    :return: np.ndarray of shape (..., 4)
+    """
+    points = np.asarray(points, dtype=np.float64)
+    w = np.ones(points.shape[:-1]) if weights is None else np.asarray(weights, dtype=np.float64)
+    return np.concatenate([points * w[..., None], w[..., None]], axis=-1)
+
+
+def model_matrix(obj) -> np.ndarray:
+    """
+    object to global space, as drawn: model_transform @ parent_transform @ transform
+    """
+    m = obj.transform.matrix()
+    if obj.parent_transform:
+        m = obj.parent_transform.matrix() @ m
+    if obj.model_transform is not None:
+        m = obj.model_transform.matrix() @ m
+    return m
+
+
+def curve_control(curve) -> np.ndarray:
+    """
+    homogeneous control points of curve in global space
+    :param curve: BezierCurve, or control points np.ndarray of shape (n, 3), homogeneous (n, 4)
+    :return: np.ndarray of shape (n, 4)
+    """
+    if isinstance(curve, BezierCurve):
+        h = homogeneous(points_array(curve.control_points).reshape(-1, 3), curve.weights)
+        # affine, weights stay
+        return h @ model_matrix(curve).T
+
+    points = np.asarray(curve, dtype=np.float64)
+    return points if points.shape[-1] == 4 else homogeneous(points)
+
+
+def surface_control(surface) -> np.ndarray:
+    """
+    homogeneous control net of BezierSurface in global space, row j - generating curve j (param t),
+    column i - its control point i (param u). Generating curves are elevated to common degree
+    :param surface: BezierSurface, or control net np.ndarray of shape (r, c, 3), homogeneous (r, c, 4)
+    :return: np.ndarray of shape (r, c, 4)
+    """
+    if not isinstance(surface, BezierSurface):
+        net = np.asarray(surface, dtype=np.float64)
+        return net if net.shape[-1] == 4 else homogeneous(net)
+
+    rows = [homogeneous(points_array(c.control_points).reshape(-1, 3), c.weights) for c in surface.curves]
+    count = max(len(r) for r in rows)
+    net = np.stack([elevate(r, count, 0) for r in rows])
+
+    # sum_j B_j(t) * C_j(u) is one rational patch only with common weight function
+    if not np.allclose(net[..., 3], net[:1, :, 3]):
+        raise Exception("Generating curves of BezierSurface have different weights, not a tensor product patch")
+
+    return net @ model_matrix(surface).T
+
+
+def elevate(h: np.ndarray, count: int, axis: int = 1) -> np.ndarray:
+    """
+    degree elevation of control points along axis to count points, exact
+    """
+    if h.shape[axis] >= count:
+        return h
+
+    p = np.moveaxis(h, axis, 0)
+    while len(p) < count:
+        n = len(p)
+        a = (np.arange(1, n) / n).reshape((-1,) + (1,) * (p.ndim - 1))
+        p = np.concatenate([p[:1], a * p[:-1] + (1 - a) * p[1:], p[-1:]])
+    return np.moveaxis(p, 0, axis)
+
+
+def split(h: np.ndarray, axis: int = 1):
+    """
+    de Casteljau subdivision at 0.5 of homogeneous control points along axis
+    :param h: np.ndarray of shape (k, ..., 4)
+    :return: (left, right) halves of same shape
+    """
+    p = np.moveaxis(h, axis, 0)
+    left, right = [p[0]], [p[-1]]
+    while len(p) > 1:
+        p = 0.5 * (p[:-1] + p[1:])
+        left.append(p[0])
+        right.append(p[-1])
+    return np.moveaxis(np.stack(left), 0, axis), np.moveaxis(np.stack(right[::-1]), 0, axis)
+
+
+def _project(h: np.ndarray) -> np.ndarray:
+    return h[..., :3] / h[..., 3:]
+
+
+def _batch(objects: list, convert, axes: tuple[int, ...]) -> np.ndarray:
+    """
+    stacks control points (nets) elevated to common degree, each object converted once
+    :param convert: curve_control or surface_control
+    """
+    converted = {}
+    controls = []
+    for obj in objects:
+        c = converted.get(id(obj))
+        if c is None:
+            c = converted[id(obj)] = convert(obj)
+        controls.append(c)
+
+    shape = [max(c.shape[axis] for c in controls) for axis in axes]
+    for axis, count in zip(axes, shape):
+        elevated = {}
+        controls = [elevated.setdefault(id(c), elevate(c, count, axis)) if c.shape[axis] < count else c
+                    for c in controls]
+    return np.stack(controls)
+
+
+def _halves(lo: np.ndarray, hi: np.ndarray, column: np.ndarray | int):
+    """
+    parameter intervals of split halves
+    :param column: split parameter of each interval
+    :return: (left_lo, left_hi, right_lo, right_hi)
+    """
+    rows = np.arange(len(lo))
+    mid = 0.5 * (lo[rows, column] + hi[rows, column])
+    left_hi, right_lo = hi.copy(), lo.copy()
+    left_hi[rows, column] = mid
+    right_lo[rows, column] = mid
+    return lo, left_hi, right_lo, hi
+
+
+def _check_frontier(count: int):
+    if count > MAX_FRONTIER:
+        raise Exception("Intersection frontier exceeds {} items, coincident geometry?".format(MAX_FRONTIER))
+
+
+def _size(points: np.ndarray, axes: tuple[int, ...]) -> np.ndarray:
+    """
+    diagonal of bounding box
+    """
+    return np.linalg.norm(points.max(axis=axes) - points.min(axis=axes), axis=1)
+
+
+def curve_points(h: np.ndarray, t: np.ndarray):
+    """
+    points and first derivatives of rational curves, one param per curve
+    :param h: homogeneous control points, np.ndarray of shape (k, n, 4)
+    :param t: np.ndarray of shape (k,)
+    :return: (points, derivatives), each np.ndarray of shape (k, 3)
+    """
+    degree = h.shape[1] - 1
+    p = np.einsum("kn,knd->kd", bernstein_basis(degree, t), h)
+    dp = np.einsum("kn,knd->kd", bernstein_derivative(degree, t), h)
+    points = p[:, :3] / p[:, 3:]
+    return points, (dp[:, :3] - points * dp[:, 3:]) / p[:, 3:]
+
+
+def patch_points(h: np.ndarray, t: np.ndarray, u: np.ndarray):
+    """
+    points and partial derivatives of rational patches, one (t, u) pair per patch
+    :param h: homogeneous control nets, np.ndarray of shape (k, r, c, 4)
+    :return: (points, dS/dt, dS/du), each np.ndarray of shape (k, 3)
+    """
+    rows, columns = h.shape[1] - 1, h.shape[2] - 1
+    bt, dbt = bernstein_basis(rows, t), bernstein_derivative(rows, t)
+    bu, dbu = bernstein_basis(columns, u), bernstein_derivative(columns, u)
+
+    p = np.einsum("kr,kc,krcd->kd", bt, bu, h)
+    dt = np.einsum("kr,kc,krcd->kd", dbt, bu, h)
+    du = np.einsum("kr,kc,krcd->kd", bt, dbu, h)
+
+    points = p[:, :3] / p[:, 3:]
+    return (points, (dt[:, :3] - points * dt[:, 3:]) / p[:, 3:],
+            (du[:, :3] - points * du[:, 3:]) / p[:, 3:])
+
+
+def _newton(system, params: np.ndarray, low: np.ndarray, high: np.ndarray):
+    """
+    Gauss-Newton refinement of candidates, keeps best params of each one
+    :param system: params -> (residuals (k, m), jacobians (k, m, p))
+    :return: (params, residual norms)
+    """
+    f, j = system(params)
+    best, error = params, np.linalg.norm(f, axis=1)
+
+    for _ in range(NEWTON_ITERATIONS):
+        # damped normal equations, tangent contacts have singular jacobian
+        jt = np.swapaxes(j, 1, 2)
+        jtj = jt @ j
+        damping = 1e-12 * np.trace(jtj, axis1=1, axis2=2) + 1e-300
+        jtj += damping[:, None, None] * np.identity(jtj.shape[1])
+        step = np.linalg.solve(jtj, (jt @ f[..., None]))[..., 0]
+        params = np.clip(params - step, low, high)
+        f, j = system(params)
+
+        e = np.linalg.norm(f, axis=1)
+        better = e < error
+        best = np.where(better[:, None], params, best)
+        error = np.where(better, e, error)
+
+    return best, error
+
+
+def _unique(query: np.ndarray, params: np.ndarray, error: np.ndarray, tolerance: float,
+            columns: int = None) -> np.ndarray:
+    """
+    one hit per intersection: neighbouring leaves of one intersection are merged into the one with smallest
+    residual. Newton stops within sqrt(tolerance) of tangent contacts, their hits are merged by params
+    :param columns: params compared, None -> all
+    :return: indexes of kept hits, sorted by query and params
+    """
+    if not len(query):
+        return np.zeros(0, dtype=np.int64)
+
+    compared = params[:, :columns]
+    order = np.lexsort(tuple(compared.T[::-1]) + (query,))
+    param_tolerance = max(np.sqrt(tolerance), 1e-9)
+
+    query, compared, error = query[order], compared[order], error[order]
+    # consecutive hits of one cluster
+    same = (query[1:] == query[:-1]) & \
+        (np.abs(compared[1:] - compared[:-1]).max(axis=1, initial=0) <= param_tolerance)
+    cluster = np.concatenate([[0], np.cumsum(~same)])
+
+    # smallest error of each cluster
+    by_error = np.lexsort((error, cluster))
+    first = np.concatenate([[True], cluster[by_error][1:] != cluster[by_error][:-1]])
+    return order[np.sort(by_error[first])]
+
+
+def curve_curve(pairs: list[tuple], tolerance: float = 1e-6, max_depth: int = 48):
+    """
+    intersections of curve pairs
+    :param pairs: (first, second) curves, BezierCurve or control points, see curve_control
+    :param tolerance: distance of points taken as intersection
+    :param max_depth: max subdivision levels
+    :return: (query, params, points) - pair index np.ndarray of shape (k,), (t, s) params of first and second
+        curve np.ndarray of shape (k, 2), points np.ndarray of shape (k, 3)
+    """
+    if not len(pairs):
+        return np.zeros(0, dtype=np.int64), np.zeros((0, 2)), np.zeros((0, 3))
+
+    a = _batch([p[0] for p in pairs], curve_control, (0,))
+    b = _batch([p[1] for p in pairs], curve_control, (0,))
+
+    query = np.arange(len(pairs))
+    lo, hi = np.zeros((len(pairs), 2)), np.ones((len(pairs), 2))
+    sub_a, sub_b = a, b
+    found_query, found_params = [], []
+
+    for depth in range(max_depth + 1):
+        pa, pb = _project(sub_a), _project(sub_b)
+        min_a, max_a, min_b, max_b = pa.min(axis=1), pa.max(axis=1), pb.min(axis=1), pb.max(axis=1)
+        overlap = np.all((min_a <= max_b + tolerance) & (min_b <= max_a + tolerance), axis=1)
+
+        size_a = np.linalg.norm(max_a - min_a, axis=1)
+        size_b = np.linalg.norm(max_b - min_b, axis=1)
+        done = overlap & ((np.maximum(size_a, size_b) < tolerance) | (depth == max_depth))
+        found_query.append(query[done])
+        found_params.append(0.5 * (lo[done] + hi[done]))
+
+        active = overlap & ~done
+        _check_frontier(2 * np.count_nonzero(active))
+        if not np.any(active):
+            break
+
+        # larger one of pair is split
+        on_a = active & (size_a >= size_b)
+        on_b = active & (size_a < size_b)
+
+        left_a, right_a = split(sub_a[on_a])
+        left_b, right_b = split(sub_b[on_b])
+        halves_a = _halves(lo[on_a], hi[on_a], 0)
+        halves_b = _halves(lo[on_b], hi[on_b], 1)
+
+        sub_a = np.concatenate([left_a, right_a, sub_a[on_b], sub_a[on_b]])
+        sub_b = np.concatenate([sub_b[on_a], sub_b[on_a], left_b, right_b])
+        lo = np.concatenate([halves_a[0], halves_a[2], halves_b[0], halves_b[2]])
+        hi = np.concatenate([halves_a[1], halves_a[3], halves_b[1], halves_b[3]])
+        query = np.concatenate([query[on_a], query[on_a], query[on_b], query[on_b]])
+
+    query = np.concatenate(found_query)
+    ca, cb = a[query], b[query]
+
+    def system(params):
+        pa, da = curve_points(ca, params[:, 0])
+        pb, db = curve_points(cb, params[:, 1])
+        return pa - pb, np.stack([da, -db], axis=2)
+
+    params, error = _newton(system, np.concatenate(found_params), 0, 1)
+    points = curve_points(ca, params[:, 0])[0]
+
+    hit = error <= 2 * tolerance
+    query, params, points = query[hit], params[hit], points[hit]
+    kept = _unique(query, params, error[hit], tolerance)
+    return query[kept], params[kept], points[kept]
+
+
+def curve_plane(curves: list, planes: np.ndarray, tolerance: float = 1e-6, max_depth: int = 48):
+    """
+    intersections of curves with planes
+    :param curves: BezierCurve or control points, see curve_control
+    :param planes: plane of each curve, np.ndarray of shape (k, 4), on plane when dot(plane, (x, y, z, 1)) == 0
+    :return: (query, params, points) - curve index np.ndarray of shape (k,), t params np.ndarray of shape (k,),
+        points np.ndarray of shape (k, 3)
+    """
+    if not len(curves):
+        return np.zeros(0, dtype=np.int64), np.zeros(0), np.zeros((0, 3))
+
+    planes = np.asarray(planes, dtype=np.float64).reshape(-1, 4)
+    # distances in global units
+    planes = planes / np.linalg.norm(planes[:, :3], axis=1, keepdims=True)
+    c = _batch(curves, curve_control, (0,))
+
+    query = np.arange(len(curves))
+    lo, hi = np.zeros((len(curves), 1)), np.ones((len(curves), 1))
+    sub = c
+    found_query, found_params = [], []
+
+    for depth in range(max_depth + 1):
+        p = _project(sub)
+        distance = np.einsum("knc,kc->kn", p, planes[query, :3]) + planes[query, 3:]
+        crossing = (distance.min(axis=1) <= tolerance) & (distance.max(axis=1) >= -tolerance)
+
+        done = crossing & ((_size(p, (1,)) < tolerance) | (depth == max_depth))
+        found_query.append(query[done])
+        found_params.append(0.5 * (lo[done] + hi[done]))
+
+        active = crossing & ~done
+        _check_frontier(2 * np.count_nonzero(active))
+        if not np.any(active):
+            break
+
+        left, right = split(sub[active])
+        halves = _halves(lo[active], hi[active], 0)
+        sub = np.concatenate([left, right])
+        lo = np.concatenate([halves[0], halves[2]])
+        hi = np.concatenate([halves[1], halves[3]])
+        query = np.concatenate([query[active], query[active]])
+
+    query = np.concatenate(found_query)
+    cc, plane = c[query], planes[query]
+
+    def system(params):
+        points, derivatives = curve_points(cc, params[:, 0])
+        f = (points * plane[:, :3]).sum(axis=1) + plane[:, 3]
+        return f[:, None], (derivatives * plane[:, :3]).sum(axis=1)[:, None, None]
+
+    params, error = _newton(system, np.concatenate(found_params), 0, 1)
+    points = curve_points(cc, params[:, 0])[0]
+
+    hit = error <= 2 * tolerance
+    query, params, points = query[hit], params[hit], points[hit]
+    kept = _unique(query, params, error[hit], tolerance)
+    return query[kept], params[kept, 0], points[kept]
+
+
+def ray_patch(patches: list, origins: np.ndarray, directions: np.ndarray, tolerance: float = 1e-6,
+              max_depth: int = 48):
+    """
+    intersections of rays with Bézier patches. Sub-patches are pruned by two planes through the ray and
+    by the ray origin
+    :param patches: patch of each ray, BezierSurface or control net, see surface_control
+    :param origins: np.ndarray of shape (k, 3)
+    :param directions: np.ndarray of shape (k, 3), not normalized
+    :return: (query, params, points) - ray index np.ndarray of shape (k,), (t, u, distance) np.ndarray of
+        shape (k, 3) - params of BezierSurface.evaluate and distance along normalized direction,
+        points np.ndarray of shape (k, 3). Hits of one ray are sorted by distance
+    """
+    if not len(patches):
+        return np.zeros(0, dtype=np.int64), np.zeros((0, 3)), np.zeros((0, 3))
+
+    origins = np.asarray(origins, dtype=np.float64).reshape(-1, 3)
+    directions = np.asarray(directions, dtype=np.float64).reshape(-1, 3)
+    directions = directions / np.linalg.norm(directions, axis=1, keepdims=True)
+
+    # ray frame: plane normals e1, e2 perpendicular to direction
+    helper = np.where(np.abs(directions[:, :1]) < 0.9, [[1.0, 0, 0]], [[0, 1.0, 0]])
+    e1 = np.cross(directions, helper)
+    e1 /= np.linalg.norm(e1, axis=1, keepdims=True)
+    e2 = np.cross(directions, e1)
+    frame = np.stack([e1, e2, directions], axis=1)
+
+    nets = _batch(patches, surface_control, (0, 1))
+    # Newton converges from sub-patches much larger than tolerance
+    leaf = np.maximum(LEAF_SIZE * _size(_project(nets), (1, 2)), tolerance)
+
+    query = np.arange(len(patches))
+    lo, hi = np.zeros((len(patches), 2)), np.ones((len(patches), 2))
+    sub = nets
+    found_query, found_params = [], []
+
+    for depth in range(max_depth + 1):
+        p = _project(sub)
+        # control points in ray frame
+        local = np.einsum("krcx,kyx->krcy", p - origins[query, None, None], frame[query])
+        low, high = local.min(axis=(1, 2)), local.max(axis=(1, 2))
+        crossing = np.all(low[:, :2] <= tolerance, axis=1) & np.all(high[:, :2] >= -tolerance, axis=1) & \
+            (high[:, 2] >= -tolerance)
+
+        done = crossing & ((_size(p, (1, 2)) < leaf[query]) | (depth == max_depth))
+        found_query.append(query[done])
+        found_params.append(0.5 * (lo[done] + hi[done]))
+
+        active = crossing & ~done
+        _check_frontier(2 * np.count_nonzero(active))
+        if not np.any(active):
+            break
+
+        # split along param with longer control polygon legs
+        span_t = np.linalg.norm(np.diff(p, axis=1), axis=3).max(axis=(1, 2))
+        span_u = np.linalg.norm(np.diff(p, axis=2), axis=3).max(axis=(1, 2))
+        on_t = active & (span_t >= span_u)
+        on_u = active & (span_t < span_u)
+
+        left_t, right_t = split(sub[on_t], 1)
+        left_u, right_u = split(sub[on_u], 2)
+        halves_t = _halves(lo[on_t], hi[on_t], 0)
+        halves_u = _halves(lo[on_u], hi[on_u], 1)
+
+        sub = np.concatenate([left_t, right_t, left_u, right_u])
+        lo = np.concatenate([halves_t[0], halves_t[2], halves_u[0], halves_u[2]])
+        hi = np.concatenate([halves_t[1], halves_t[3], halves_u[1], halves_u[3]])
+        query = np.concatenate([query[on_t], query[on_t], query[on_u], query[on_u]])
+
+    query = np.concatenate(found_query)
+    net, origin, direction = nets[query], origins[query], directions[query]
+
+    def system(params):
+        points, dt, du = patch_points(net, params[:, 0], params[:, 1])
+        f = points - origin - params[:, 2:] * direction
+        return f, np.stack([dt, du, -direction], axis=2)
+
+    params = np.concatenate(found_params)
+    start = patch_points(net, params[:, 0], params[:, 1])[0]
+    params = np.hstack([params, ((start - origin) * direction).sum(axis=1, keepdims=True)])
+    params, error = _newton(system, params, [0, 0, -np.inf], [1, 1, np.inf])
+    points = patch_points(net, params[:, 0], params[:, 1])[0]
+
+    hit = (error <= 2 * tolerance) & (params[:, 2] >= -tolerance)
+    query, params, points = query[hit], params[hit], points[hit]
+    kept = _unique(query, params, error[hit], tolerance, 2)
+    query, params, points = query[kept], params[kept], points[kept]
+
+    order = np.lexsort((params[:, 2], query))
+    return query[order], params[order], points[order]
+
+
+def mesh_triangles(obj) -> np.ndarray:
+    """
+    triangles of Object3D in global space
+    :return: np.ndarray of shape (m, 3, 3)
+    """
+    vertexes = np.array([p.to_list() for p in obj.vertexes], dtype=np.float64).reshape(-1, 3)
+    surfaces = np.asarray(obj.surfaces, dtype=np.int64).reshape(-1, 3)
+    m = model_matrix(obj)
+    return (vertexes @ m[:3, :3].T + m[:3, 3])[surfaces]
+
+
+def ray_mesh(meshes: list, origins: np.ndarray, directions: np.ndarray, tolerance: float = 1e-6):
+    """
+    intersections of rays with triangle meshes, Möller - Trumbore test of each ray against all triangles
+    of its mesh. Hits on shared edges are reported once
+    :param meshes: Object3D of each ray
+    :param origins: np.ndarray of shape (k, 3)
+    :param directions: np.ndarray of shape (k, 3), not normalized
+    :return: (query, triangles, params, points) - ray index np.ndarray of shape (k,), triangle index
+        np.ndarray of shape (k,), (u, v, distance) np.ndarray of shape (k, 3) - barycentric coords of hit
+        and distance along normalized direction, points np.ndarray of shape (k, 3). Hits of one ray are
+        sorted by distance
+    """
+    origins = np.asarray(origins, dtype=np.float64).reshape(-1, 3)
+    directions = np.asarray(directions, dtype=np.float64).reshape(-1, 3)
+    directions = directions / np.linalg.norm(directions, axis=1, keepdims=True)
+
+    groups = {}
+    for i, mesh in enumerate(meshes):
+        groups.setdefault(id(mesh), (mesh, []))[1].append(i)
+
+    found_query, found_triangles, found_params = [], [], []
+    for mesh, rays in groups.values():
+        triangles = mesh_triangles(mesh)
+        if not len(triangles):
+            continue
+        v0 = triangles[:, 0]
+        e1, e2 = triangles[:, 1] - v0, triangles[:, 2] - v0
+        # parallel rays, relative to triangle size
+        epsilon = 1e-12 * np.linalg.norm(e1, axis=1) * np.linalg.norm(e2, axis=1)
+
+        rays = np.asarray(rays)
+        # rays x triangles arrays, chunked
+        chunk = max(1, MAX_FRONTIER // len(triangles))
+        for start in range(0, len(rays), chunk):
+            query = rays[start:start + chunk]
+            o, d = origins[query, None], directions[query, None]
+
+            p = np.cross(d, e2)
+            det = (e1 * p).sum(axis=2)
+            parallel = np.abs(det) <= epsilon
+            inverse = 1 / np.where(parallel, 1, det)
+
+            s = o - v0
+            u = (s * p).sum(axis=2) * inverse
+            q = np.cross(s, e1)
+            v = (d * q).sum(axis=2) * inverse
+            distance = (e2 * q).sum(axis=2) * inverse
+
+            hit = ~parallel & (u >= 0) & (v >= 0) & (u + v <= 1) & (distance >= -tolerance)
+            r, t = np.nonzero(hit)
+            found_query.append(query[r])
+            found_triangles.append(t)
+            found_params.append(np.stack([u[r, t], v[r, t], distance[r, t]], axis=1))
+
+    if not found_query:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), np.zeros((0, 3)), np.zeros((0, 3))
+
+    query, triangles, params = np.concatenate(found_query), np.concatenate(found_triangles), \
+        np.concatenate(found_params)
+    order = np.lexsort((params[:, 2], query))
+    query, triangles, params = query[order], triangles[order], params[order]
+
+    # shared edges and vertexes: same ray, same distance
+    first = np.ones(len(query), dtype=bool)
+    first[1:] = (query[1:] != query[:-1]) | (np.diff(params[:, 2]) > tolerance)
+    query, triangles, params = query[first], triangles[first], params[first]
+
+    points = origins[query] + params[:, 2:] * directions[query]
+    return query, triangles, params, points
+
+
+def intersect_curves(first, second, tolerance: float = 1e-6):
+    """
+    intersections of two curves, see curve_curve
+    :return: ((t, s) params np.ndarray of shape (k, 2), points np.ndarray of shape (k, 3))
+    """
+    _, params, points = curve_curve([(first, second)], tolerance)
+    return params, points
+
+
+def intersect_plane(curve, plane: np.ndarray | list[float], tolerance: float = 1e-6):
+    """
+    intersections of curve with plane (a, b, c, d): a * x + b * y + c * z + d == 0, see curve_plane
+    :return: (t params np.ndarray of shape (k,), points np.ndarray of shape (k, 3))
+    """
+    _, params, points = curve_plane([curve], np.asarray(plane, dtype=np.float64)[None], tolerance)
+    return params, points
+
+
+def intersect_ray(objects: list, origin: np.ndarray | list[float], direction: np.ndarray | list[float],
+                  tolerance: float = 1e-6):
+    """
+    hits of one ray with objects (e.g. objects of Composed), nearest first. BezierSurfaces and control nets
+    are intersected as patches, see ray_patch, other Object3D as triangle meshes, see ray_mesh
+    :return: (object index np.ndarray of shape (k,), params np.ndarray of shape (k, 3) - (t, u, distance)
+        of patches, (u, v, distance) of meshes with barycentric u, v, points np.ndarray of shape (k, 3))
+    """
+    is_patch = np.array([isinstance(o, BezierSurface) or not isinstance(o, Object3D) for o in objects], dtype=bool)
+    patches, meshes = np.flatnonzero(is_patch), np.flatnonzero(~is_patch)
+
+    query, params, points = ray_patch([objects[i] for i in patches], np.tile(origin, (len(patches), 1)),
+                                      np.tile(direction, (len(patches), 1)), tolerance)
+    mesh_query, _, mesh_params, mesh_points = ray_mesh([objects[i] for i in meshes],
+                                                       np.tile(origin, (len(meshes), 1)),
+                                                       np.tile(direction, (len(meshes), 1)), tolerance)
+
+    query = np.concatenate([patches[query], meshes[mesh_query]])
+    params = np.concatenate([params, mesh_params])
+    points = np.concatenate([points, mesh_points])
+    order = np.argsort(params[:, 2], kind="stable")
+    return query[order], params[order], points[order]
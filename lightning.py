@@ -1,17 +1,16 @@
 from abc import ABC, abstractmethod
 
 import numpy as np
-import pygame as pg
-import pyrr as pyrr
-from OpenGL.GL import shaders
 from OpenGL.GL import *
-from PIL import Image
 
+from camera import CAMERA_BINDING
+from memory import TRACKER
 from misc import load_file
+from texture_cache import CACHE_DIR, load_mips
 
-# default shaders
-VERTEX_SHADER = load_file("vertex_shader.vsh")
-FRAGMENT_SHADER = load_file("fragment_shader.fsh")
+# default shader files, read when DefaultMaterial is created
+VERTEX_SHADER = "vertex_shader.vsh"
+FRAGMENT_SHADER = "fragment_shader.fsh"
 
 
 # colors enum
@@ -30,37 +29,106 @@ class Color:
 
 
 class MaterialBase(ABC):
+    # Tex bound to unit 0 while drawing
+    texture = None
+    # drawn after opaque materials, back to front
+    blended = False
+    # optional geometry shader source
+    geometry_shader = None
 
     def __init__(self, vertex_shader, fragment_shader):
         self.vertex_shader = vertex_shader
         self.fragment_shader = fragment_shader
 
         self.shader = self.compile_shader()
+        # looked up once, apply_vertex_format runs per draw
+        self.Normal_encoding_loc = glGetUniformLocation(self.shader, "Normal_encoding")
+        self.Model_loc = glGetUniformLocation(self.shader, "Model")
         self.define_attrs()
 
     def compile_shader(self):
-        compiled_vertex_shader = shaders.compileShader(self.vertex_shader, GL_VERTEX_SHADER)
-        compiled_fragment_shader = shaders.compileShader(self.fragment_shader, GL_FRAGMENT_SHADER)
+        # shader objects wrappers are slow to import, first material pays for them
+        from OpenGL.GL import shaders
 
-        compiled_shader = shaders.compileProgram(compiled_vertex_shader, compiled_fragment_shader)
+        compiled = [shaders.compileShader(self.vertex_shader, GL_VERTEX_SHADER)]
+        if self.geometry_shader is not None:
+            compiled.append(shaders.compileShader(self.geometry_shader, GL_GEOMETRY_SHADER))
+        compiled.append(shaders.compileShader(self.fragment_shader, GL_FRAGMENT_SHADER))
+
+        compiled_shader = shaders.compileProgram(*compiled)
+
+        # shared camera matrices, see camera.Camera.publish
+        block = glGetUniformBlockIndex(compiled_shader, "Camera")
+        if block != GL_INVALID_INDEX:
+            glUniformBlockBinding(compiled_shader, block, CAMERA_BINDING)
+        TRACKER.register("program", compiled_shader, self.program_size(compiled_shader), self)
 
         return compiled_shader
 
+    @staticmethod
+    def program_size(program) -> int:
+        """
+        driver binary size of linked program, estimate of its GPU memory. 0 if not supported
+        """
+        try:
+            return int(glGetProgramiv(program, GL_PROGRAM_BINARY_LENGTH))
+        except GLError:
+            return 0
+
+    def destroy(self):
+        glDeleteProgram(self.shader)
+        TRACKER.unregister("program", self.shader)
+
     @abstractmethod
     def apply_uniform(self):
         pass
 
     @abstractmethod
-    def apply_attrs(self):
+    def apply_attrs(self, vertex_format):
         pass
 
     @abstractmethod
     def define_attrs(self):
         pass
 
+    def use_texture(self):
+        if self.texture is not None:
+            self.texture.use()
+
+    def apply_vertex_format(self, vertex_format):
+        """
+        decoding uniforms for vertex_format, shader must be in use
+        """
+        if self.Normal_encoding_loc not in (None, -1):
+            glUniform1i(self.Normal_encoding_loc, vertex_format.normal_encoding)
+
+    def apply_model(self, model):
+        """
+        Model uniform of drawn object, shader must be in use
+        :param model: 4x4 model matrix, None -> identity
+        """
+        if self.Model_loc not in (None, -1):
+            glUniformMatrix4fv(self.Model_loc, 1, GL_TRUE,
+                               np.asarray(np.identity(4) if model is None else model, dtype=np.float32))
+
+    @staticmethod
+    def bind_vertex_format(vertex_format, locations: dict):
+        """
+        attribute pointers into interleaved vertex data
+        :param vertex_format: VertexFormat of bound GL_ARRAY_BUFFER
+        :param locations: attribute name ("position", "normal", "tex_coord") -> shader location
+        """
+        for name, location in locations.items():
+            if location in (None, -1):
+                continue
+            attr = vertex_format.attributes[name]
+            glEnableVertexAttribArray(location)
+            glVertexAttribPointer(location, attr.size, attr.gl_type, attr.normalized,
+                                  vertex_format.stride, ctypes.c_void_p(attr.offset))
+
 
 class DefaultMaterial(MaterialBase):
-    def apply_attrs(self):
+    def apply_attrs(self, vertex_format):
         pass
 
     def apply_uniform(self):
@@ -71,6 +139,8 @@ class DefaultMaterial(MaterialBase):
         self.Color_Main_loc = glGetUniformLocation(self.shader, "Color_Main")
 
     def apply_transform(self, trans):
+        import pyrr
+
         self.model_transform = pyrr.matrix44.create_identity(dtype=np.float32)
         """
             pitch: rotation around x axis
@@ -93,8 +163,8 @@ class DefaultMaterial(MaterialBase):
         glUniformMatrix4fv(self.modelMatrixLocation, 1, GL_FALSE, self.model_transform)
 
     def __init__(self, color_main):
-        vertex_sh = VERTEX_SHADER
-        fragment_sh = FRAGMENT_SHADER
+        vertex_sh = load_file(VERTEX_SHADER)
+        fragment_sh = load_file(FRAGMENT_SHADER)
 
         self.color_main = color_main
 
@@ -102,61 +172,48 @@ class DefaultMaterial(MaterialBase):
 
 
 class Glass(MaterialBase):
+    blended = True
 
-    def __init__(self):
+    def __init__(self, opacity: float = 1.0):
+        """
+        :param opacity: alpha multiplier of texture color
+        """
         vertex_sh = load_file("texsh.vsh")
         fragment_sh = load_file("texsh.fsh")
 
+        self.opacity = opacity
+
         self.wood_texture = Tex("tex.jpg")
-        self.wood_texture.use()
+        self.texture = self.wood_texture
 
         super(Glass, self).__init__(vertex_sh, fragment_sh)
 
     def apply_uniform(self):
-        glUniform1i(glGetUniformLocation(self.shader, "imageTexture"), 0)
-        pass
-
-    def apply_attrs(self):
-
-        # get the position from  shader
-        glBindAttribLocation(self.shader, 0, 'position')
-        #position = glGetAttribLocation(self.shader, 'position')
-        glVertexAttribPointer(0, 3, GL_FLOAT, GL_FALSE, 0, ctypes.c_void_p(0))
-        glEnableVertexAttribArray(0)
-
-        # get the color from  shader
-        glBindAttribLocation(self.shader, 1, 'color')
-        #color = glGetAttribLocation(self.shader, 'color')
-        glVertexAttribPointer(1, 3, GL_FLOAT, GL_FALSE, 0, ctypes.c_void_p(12))
-        glEnableVertexAttribArray(1)
-
-        glBindAttribLocation(self.shader, 2, 'InTexCoords')
-        #texCoords = glGetAttribLocation(self.shader, "InTexCoords")
-        glVertexAttribPointer(2, 2, GL_FLOAT, GL_FALSE, 0, ctypes.c_void_p(24))
-        glEnableVertexAttribArray(2)
-
+        glUniform1i(self.imageTexture_loc, 0)
+        glUniform1f(self.Opacity_loc, self.opacity)
 
+    def apply_attrs(self, vertex_format):
+        self.bind_vertex_format(vertex_format, {
+            "position": self.vertexPos_loc,
+            # normals are used as vertex color
+            "normal": self.vertexColor_loc,
+            "tex_coord": self.vertexTexCoord_loc,
+        })
 
     def define_attrs(self):
-        pass
+        self.imageTexture_loc = glGetUniformLocation(self.shader, "imageTexture")
+        self.Opacity_loc = glGetUniformLocation(self.shader, "Opacity")
+        for attribute in ("vertexPos", "vertexColor", "vertexTexCoord"):
+            setattr(self, attribute + '_loc', glGetAttribLocation(self.shader, attribute))
 
 
 class BRDF(MaterialBase):
-    def apply_attrs(self):
-
-        # tex
-
-        self.wood_texture.use()
-
-        glEnableVertexAttribArray(self.Vertex_position_loc)
-        glEnableVertexAttribArray(self.Vertex_normal_loc)
-
-        glVertexAttribPointer(self.Vertex_position_loc,
-                              3, GL_FLOAT, GL_FALSE, 0, None)
-        glVertexAttribPointer(self.Vertex_normal_loc,
-                              3, GL_FLOAT, GL_FALSE, 0, None)
-        glVertexAttribPointer(4,
-                              2, GL_FLOAT, GL_FALSE, 0, None)
+    def apply_attrs(self, vertex_format):
+        self.bind_vertex_format(vertex_format, {
+            "position": self.Vertex_position_loc,
+            "normal": self.Vertex_normal_loc,
+            "tex_coord": self.Tex_coord_loc,
+        })
 
     def __init__(self, light_pos, color_main):
         vertex_sh = load_file("brdf.vsh")
@@ -166,6 +223,7 @@ class BRDF(MaterialBase):
         self.color = color_main
 
         self.wood_texture = Tex("tex.jpg")
+        self.texture = self.wood_texture
 
         super(BRDF, self).__init__(vertex_sh, fragment_sh)
 
@@ -210,27 +268,199 @@ class BRDF(MaterialBase):
                 set_attrib = attribute + '_loc'
                 setattr(self, set_attrib, location)
 
-        self.vertexTexCoord_loc = 4
+        # unused tex coords are optimized out of the shader
+        self.Tex_coord_loc = glGetAttribLocation(self.shader, "Tex_coord")
+
+
+class ClusteredBRDF(MaterialBase):
+    """
+    BRDF lit by many point lights, per fragment loop over lights of fragment cluster \n
+    lighting.update() must run once per frame before drawing, see lights.ClusteredLighting
+    """
+
+    def apply_attrs(self, vertex_format):
+        self.bind_vertex_format(vertex_format, {
+            "position": self.Vertex_position_loc,
+            "normal": self.Vertex_normal_loc,
+            "tex_coord": self.Tex_coord_loc,
+        })
+
+    def __init__(self, lighting, color_main):
+        """
+        :param lighting: lights.ClusteredLighting
+        :param color_main: material diffuse color
+        """
+        self.lighting = lighting
+        self.color = color_main
+
+        super(ClusteredBRDF, self).__init__(load_file("clustered.vsh"), load_file("clustered.fsh"))
+
+    def apply_uniform(self):
+        lighting = self.lighting
+        grid = lighting.grid
+
+        glUniform4f(self.Global_ambient_loc, .0, .6, .6, .1)
+        glUniform4f(self.Material_ambient_loc, .2, .2, .2, 1.0)
+        glUniform4f(self.Material_diffuse_loc, self.color[0], self.color[1], self.color[2], self.color[3])
+        glUniform3f(self.Eye_position_loc, *lighting.eye)
+
+        glUniform4f(self.Viewport_loc, *lighting.viewport)
+        glUniform3i(self.Cluster_size_loc, grid.tiles_x, grid.tiles_y, grid.slices)
+        glUniform2f(self.Cluster_depth_loc, grid.near, grid.far)
+
+        glUniform1i(self.Light_data_loc, lighting.LIGHT_DATA_UNIT)
+        glUniform1i(self.Clusters_loc, lighting.CLUSTERS_UNIT)
+        glUniform1i(self.Light_indices_loc, lighting.INDICES_UNIT)
+        lighting.bind()
+
+    def define_attrs(self):
+        uniform_values = (
+            "Global_ambient",
+            "Material_ambient",
+            "Material_diffuse",
+            "Eye_position",
+            "Viewport",
+            "Cluster_size",
+            "Cluster_depth",
+            "Light_data",
+            "Clusters",
+            "Light_indices",
+        )
+        for uniform in uniform_values:
+            location = glGetUniformLocation(self.shader, uniform)
+            if location in (None, -1):
+                print('Warning, no uniform {}'.format(uniform))
+            setattr(self, uniform + '_loc', location)
+
+        for attribute in ("Vertex_position", "Vertex_normal", "Tex_coord"):
+            setattr(self, attribute + '_loc', glGetAttribLocation(self.shader, attribute))
+
+
+class Wireframe(MaterialBase):
+    """
+    edges overlay, lines of Object3D.edge_index_buffer over mesh vertex buffer
+    """
+
+    def __init__(self, color_main=(1, 1, 1, 1), depth_bias: float = 1e-4):
+        self.color = color_main
+        self.depth_bias = depth_bias
+
+        super(Wireframe, self).__init__(load_file("wire.vsh"), load_file("color.fsh"))
+
+    def apply_uniform(self):
+        glUniform4f(self.Color_Main_loc, self.color[0], self.color[1], self.color[2], self.color[3])
+        glUniform1f(self.Depth_bias_loc, self.depth_bias)
+
+    def apply_attrs(self, vertex_format):
+        self.bind_vertex_format(vertex_format, {"position": self.Vertex_position_loc})
+
+    def define_attrs(self):
+        self.Color_Main_loc = glGetUniformLocation(self.shader, "Color_Main")
+        self.Depth_bias_loc = glGetUniformLocation(self.shader, "Depth_bias")
+        self.Vertex_position_loc = glGetAttribLocation(self.shader, "Vertex_position")
+
+
+class FaceNormals(MaterialBase):
+    """
+    face normal lines generated by geometry shader from mesh triangles, reads Camera block
+    """
+
+    def __init__(self, color_main=(1, 1, 0, 1), length: float = 0.5):
+        self.color = color_main
+        self.length = length
+        self.geometry_shader = load_file("facenormals.gsh")
+
+        super(FaceNormals, self).__init__(load_file("facenormals.vsh"), load_file("color.fsh"))
+
+    def apply_uniform(self):
+        glUniform4f(self.Color_Main_loc, self.color[0], self.color[1], self.color[2], self.color[3])
+        glUniform1f(self.Normal_length_loc, self.length)
+
+    def apply_attrs(self, vertex_format):
+        self.bind_vertex_format(vertex_format, {"position": self.Vertex_position_loc})
+
+    def define_attrs(self):
+        self.Color_Main_loc = glGetUniformLocation(self.shader, "Color_Main")
+        self.Normal_length_loc = glGetUniformLocation(self.shader, "Normal_length")
+        self.Vertex_position_loc = glGetAttribLocation(self.shader, "Vertex_position")
+
+
+class Polyline(MaterialBase):
+    """
+    lines of polylines.CurveBatch widened to width in pixels by geometry shader, reads Camera block
+    """
+
+    def __init__(self, color_main=(1, 1, 1, 1), width: float = 2.0):
+        self.color = color_main
+        self.width = width
+        self.geometry_shader = load_file("polyline.gsh")
+
+        super(Polyline, self).__init__(load_file("polyline.vsh"), load_file("color.fsh"))
+
+    def apply_uniform(self):
+        glUniform4f(self.Color_Main_loc, self.color[0], self.color[1], self.color[2], self.color[3])
+        glUniform1f(self.Line_width_loc, self.width)
+
+    def apply_attrs(self, vertex_format):
+        self.bind_vertex_format(vertex_format, {"position": self.Vertex_position_loc})
+
+    def define_attrs(self):
+        self.Color_Main_loc = glGetUniformLocation(self.shader, "Color_Main")
+        self.Line_width_loc = glGetUniformLocation(self.shader, "Line_width")
+        self.Vertex_position_loc = glGetAttribLocation(self.shader, "Vertex_position")
+
+
+class PointMaterial(MaterialBase):
+    """
+    vertex colored points of pointcloud.PointCloud
+    """
+
+    def __init__(self, point_size: float = 2.0):
+        self.point_size = point_size
+
+        super(PointMaterial, self).__init__(load_file("points.vsh"), load_file("color.fsh"))
+
+    def apply_uniform(self):
+        glPointSize(self.point_size)
+
+    def apply_attrs(self, vertex_format):
+        self.bind_vertex_format(vertex_format, {
+            "position": self.Vertex_position_loc,
+            "color": self.Vertex_color_loc,
+        })
+
+    def define_attrs(self):
+        self.Vertex_position_loc = glGetAttribLocation(self.shader, "Vertex_position")
+        self.Vertex_color_loc = glGetAttribLocation(self.shader, "Vertex_color")
 
-        glBindAttribLocation(self.shader, self.vertexTexCoord_loc, "vertexTexCoord")
 
 class Tex:
-    def __init__(self, filepath):
+    def __init__(self, filepath, cache_dir=CACHE_DIR):
+        """
+        :param filepath: image file
+        :param cache_dir: decoded mip chain cache, None -> decode every time
+        """
+        levels = load_mips(filepath, cache_dir)
+
         self.texture = glGenTextures(1)
         glBindTexture(GL_TEXTURE_2D, self.texture)
         glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, GL_REPEAT)
         glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, GL_REPEAT)
         glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_NEAREST)
         glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
-        image = pg.image.load(filepath).convert_alpha()
-        image_width,image_height = image.get_rect().size
-        img_data = pg.image.tostring(image,'RGBA')
-        glTexImage2D(GL_TEXTURE_2D,0,GL_RGBA,image_width,image_height,0,GL_RGBA,GL_UNSIGNED_BYTE,img_data)
-        glGenerateMipmap(GL_TEXTURE_2D)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAX_LEVEL, len(levels) - 1)
+        glPixelStorei(GL_UNPACK_ALIGNMENT, 1)
+        # uploaded straight from memory mapped cache
+        for i, level in enumerate(levels):
+            image_height, image_width = level.shape[:2]
+            glTexImage2D(GL_TEXTURE_2D, i, GL_RGBA, image_width, image_height, 0, GL_RGBA, GL_UNSIGNED_BYTE, level)
+        glPixelStorei(GL_UNPACK_ALIGNMENT, 4)
+        TRACKER.register("texture", self.texture, sum(level.nbytes for level in levels), self, filepath)
 
     def use(self):
         glActiveTexture(GL_TEXTURE0)
         glBindTexture(GL_TEXTURE_2D,self.texture)
 
     def destroy(self):
-        glDeleteTextures(1, (self.texture,))
\ No newline at end of file
+        glDeleteTextures(1, (self.texture,))
+        TRACKER.unregister("texture", self.texture)
\ No newline at end of file
@@ -0,0 +1,267 @@
+import numpy as np
+from OpenGL.GL import *
+
+from memory import TRACKER
+
+# texels per light in Light_data buffer: (position, radius), (color, intensity)
+LIGHT_TEXELS = 2
+
+
+class LightSet:
+    """
+    point lights as arrays
+    """
+
+    def __init__(self, positions=None, colors=None, radii=None, intensities=None):
+        """
+        :param positions: np.ndarray of shape (n, 3), world space
+        :param colors: np.ndarray of shape (n, 3), None -> white
+        :param radii: np.ndarray of shape (n,), light has no effect further than radius
+        :param intensities: np.ndarray of shape (n,), None -> 1
+        """
+        self.positions = np.asarray(positions if positions is not None else np.zeros((0, 3)),
+                                    dtype=np.float64).reshape(-1, 3)
+        n = len(self.positions)
+        self.colors = np.asarray(colors if colors is not None else np.ones((n, 3)), dtype=np.float64).reshape(n, 3)
+        self.radii = np.asarray(radii if radii is not None else np.full(n, 5.0), dtype=np.float64).reshape(n)
+        self.intensities = np.asarray(intensities if intensities is not None else np.ones(n),
+                                      dtype=np.float64).reshape(n)
+
+    def __len__(self):
+        return len(self.positions)
+
+    @staticmethod
+    def random(count: int, bounds, radius=(1.0, 4.0), seed: int = 0):
+        """
+        lights uniformly distributed in box
+        :param bounds: [[min x, min y, min z], [max x, max y, max z]]
+        :param radius: (min, max) radius
+        """
+        rng = np.random.default_rng(seed)
+        low, high = np.asarray(bounds, dtype=np.float64)
+        positions = low + rng.random((count, 3)) * (high - low)
+        colors = 0.3 + 0.7 * rng.random((count, 3))
+        radii = radius[0] + rng.random(count) * (radius[1] - radius[0])
+        return LightSet(positions, colors, radii)
+
+
+class ClusterGrid:
+    """
+    view frustum divided into tiles_x * tiles_y screen tiles and depth slices,
+    slices are exponential in view depth between near and far
+    """
+
+    def __init__(self, tiles_x: int = 16, tiles_y: int = 9, slices: int = 24, near: float = 1.0, far: float = 100.0):
+        self.tiles_x = tiles_x
+        self.tiles_y = tiles_y
+        self.slices = slices
+        self.near = near
+        self.far = far
+
+    def __len__(self):
+        return self.tiles_x * self.tiles_y * self.slices
+
+    def slice_of(self, depth: np.ndarray) -> np.ndarray:
+        """
+        depth slice of view depth, depths out of [near, far] are clamped to first / last slice
+        """
+        depth = np.maximum(depth, self.near)
+        s = np.floor(np.log(depth / self.near) / np.log(self.far / self.near) * self.slices)
+        return np.clip(s, 0, self.slices - 1).astype(np.int64)
+
+
+def light_bounds(positions: np.ndarray, radii: np.ndarray, view_projection: np.ndarray):
+    """
+    conservative NDC xy rectangle and view depth range of light spheres
+    :param view_projection: perspective matrix, clip w is view depth
+    :return: (ndc_min (n, 2), ndc_max (n, 2), depth_min (n,), depth_max (n,))
+    """
+    n = len(positions)
+    w_row = view_projection[3, :3]
+    center_w = positions @ w_row + view_projection[3, 3]
+    # sphere extent along w
+    extent = radii * np.linalg.norm(w_row)
+    depth_min = center_w - extent
+    depth_max = center_w + extent
+
+    # corners of bounding boxes
+    signs = np.array([[x, y, z] for x in (-1, 1) for y in (-1, 1) for z in (-1, 1)], dtype=np.float64)
+    corners = positions[:, None, :] + signs[None, :, :] * radii[:, None, None]
+    clip = corners @ view_projection[:, :3].T + view_projection[:, 3]
+
+    w = clip[..., 3]
+    crosses_eye = (w <= 1e-6).any(axis=1)
+    ndc = clip[..., :2] / np.where(w > 1e-6, w, 1.0)[..., None]
+
+    ndc_min = ndc.min(axis=1)
+    ndc_max = ndc.max(axis=1)
+    # box reaches behind eye: whole screen
+    ndc_min[crosses_eye] = -1
+    ndc_max[crosses_eye] = 1
+
+    return ndc_min.reshape(n, 2), ndc_max.reshape(n, 2), depth_min, depth_max
+
+
+def assign_lights(positions: np.ndarray, radii: np.ndarray, view_projection: np.ndarray, grid: ClusterGrid):
+    """
+    light to cluster assignment, vectorized \n
+    cluster index = (slice * tiles_y + tile_y) * tiles_x + tile_x
+    :return: (clusters: uint32 array of shape (len(grid), 2) of (offset, count),
+     indices: uint32 array of light indexes, lights of cluster are indices[offset:offset + count])
+    """
+    ndc_min, ndc_max, depth_min, depth_max = light_bounds(positions, radii, view_projection)
+
+    visible = (depth_max > 0) & (depth_min < grid.far) & \
+              (ndc_max[:, 0] >= -1) & (ndc_min[:, 0] <= 1) & (ndc_max[:, 1] >= -1) & (ndc_min[:, 1] <= 1)
+    lights = np.flatnonzero(visible)
+
+    tiles = np.array([grid.tiles_x, grid.tiles_y])
+    tile_min = np.clip(np.floor((ndc_min[lights] + 1) / 2 * tiles), 0, tiles - 1).astype(np.int64)
+    tile_max = np.clip(np.floor((ndc_max[lights] + 1) / 2 * tiles), 0, tiles - 1).astype(np.int64)
+    slice_min = grid.slice_of(depth_min[lights])
+    slice_max = grid.slice_of(depth_max[lights])
+
+    # cluster boxes of lights expanded into (cluster, light) pairs
+    size_x = tile_max[:, 0] - tile_min[:, 0] + 1
+    size_y = tile_max[:, 1] - tile_min[:, 1] + 1
+    size_z = slice_max - slice_min + 1
+    per_light = size_x * size_y * size_z
+
+    light = np.repeat(np.arange(len(lights)), per_light)
+    local = np.arange(per_light.sum()) - np.repeat(np.cumsum(per_light) - per_light, per_light)
+    ix = local % size_x[light]
+    iy = local // size_x[light] % size_y[light]
+    iz = local // (size_x[light] * size_y[light])
+
+    cluster = ((slice_min[light] + iz) * grid.tiles_y + tile_min[light, 1] + iy) * grid.tiles_x \
+        + tile_min[light, 0] + ix
+
+    order = np.argsort(cluster, kind="stable")
+    indices = lights[light[order]].astype(np.uint32)
+
+    counts = np.bincount(cluster, minlength=len(grid))
+    clusters = np.empty((len(grid), 2), dtype=np.uint32)
+    clusters[:, 0] = np.cumsum(counts) - counts
+    clusters[:, 1] = counts
+
+    return clusters, indices
+
+
+class TextureBuffer:
+    """
+    buffer texture (samplerBuffer in shader), storage reallocated when data grows
+    """
+
+    def __init__(self, internal_format, owner=None):
+        self.internal_format = internal_format
+        self.buffer = glGenBuffers(1)
+        self.texture = glGenTextures(1)
+        self.capacity = 0
+        self.owner = owner
+        TRACKER.register("texture", self.texture, 0, owner, "TextureBuffer")
+
+    def upload(self, data: np.ndarray):
+        data = np.ascontiguousarray(data)
+        glBindBuffer(GL_TEXTURE_BUFFER, self.buffer)
+        if data.nbytes > self.capacity:
+            # empty buffers can't back buffer texture
+            self.capacity = max(data.nbytes, 16)
+            glBufferData(GL_TEXTURE_BUFFER, self.capacity, None, GL_STREAM_DRAW)
+            TRACKER.register("buffer", self.buffer, self.capacity, self.owner, "TextureBuffer")
+            glBindTexture(GL_TEXTURE_BUFFER, self.texture)
+            glTexBuffer(GL_TEXTURE_BUFFER, self.internal_format, self.buffer)
+            glBindTexture(GL_TEXTURE_BUFFER, 0)
+        else:
+            # orphan, previous frame may still read it
+            glBufferData(GL_TEXTURE_BUFFER, self.capacity, None, GL_STREAM_DRAW)
+        if data.nbytes:
+            glBufferSubData(GL_TEXTURE_BUFFER, 0, data.nbytes, data)
+        glBindBuffer(GL_TEXTURE_BUFFER, 0)
+
+    def bind(self, unit: int):
+        glActiveTexture(GL_TEXTURE0 + unit)
+        glBindTexture(GL_TEXTURE_BUFFER, self.texture)
+
+    def destroy(self):
+        glDeleteTextures(1, (self.texture,))
+        glDeleteBuffers(1, (self.buffer,))
+        TRACKER.unregister("texture", self.texture)
+        TRACKER.unregister("buffer", self.buffer)
+
+
+class ClusteredLighting:
+    """
+    clustered forward lighting state: lights and cluster lists in buffer textures,
+    rebuilt once per frame by update(), read by lightning.ClusteredBRDF
+    """
+
+    # texture units of buffer textures, unit 0 is material texture
+    LIGHT_DATA_UNIT = 1
+    CLUSTERS_UNIT = 2
+    INDICES_UNIT = 3
+
+    def __init__(self, lights: LightSet, grid: ClusterGrid = None):
+        self.lights = lights
+        self.grid = grid or ClusterGrid()
+
+        self.light_data = TextureBuffer(GL_RGBA32F, self)
+        self.clusters = TextureBuffer(GL_RG32UI, self)
+        self.indices = TextureBuffer(GL_R32UI, self)
+
+        self.viewport = (0, 0, 1, 1)
+        self.eye = np.zeros(3)
+
+        # stats of last update
+        self.assigned = 0
+        self.max_per_cluster = 0
+
+    def update(self, view_projection: np.ndarray = None, modelview: np.ndarray = None, viewport=None):
+        """
+        assigns lights to clusters and uploads buffers, once per frame
+        :param view_projection: projection @ modelview, None -> current GL matrices
+        :param modelview: matrix of lighting space (shader applies gl_ModelViewMatrix), None -> current GL matrix
+        :param viewport: (x, y, width, height), None -> current GL viewport
+        """
+        if view_projection is None or modelview is None:
+            projection = np.array(glGetFloatv(GL_PROJECTION_MATRIX), dtype=np.float64).reshape(4, 4).T
+            modelview = np.array(glGetFloatv(GL_MODELVIEW_MATRIX), dtype=np.float64).reshape(4, 4).T
+            view_projection = projection @ modelview
+        if viewport is None:
+            viewport = tuple(int(v) for v in glGetIntegerv(GL_VIEWPORT))
+        self.viewport = viewport
+
+        lights = self.lights
+        clusters, indices = assign_lights(lights.positions, lights.radii, view_projection, self.grid)
+        self.assigned = len(indices)
+        self.max_per_cluster = int(clusters[:, 1].max()) if len(clusters) else 0
+
+        # shading happens in space of gl_ModelViewMatrix * vertex
+        positions = lights.positions @ modelview[:3, :3].T + modelview[:3, 3]
+        data = np.empty((len(lights), LIGHT_TEXELS, 4), dtype=np.float32)
+        data[:, 0, :3] = positions
+        data[:, 0, 3] = lights.radii
+        data[:, 1, :3] = lights.colors
+        data[:, 1, 3] = lights.intensities
+
+        # eye: point projected to infinity, inverse(view_projection) @ (0, 0, -1, 0) ~ modelview space
+        eye = np.linalg.solve(view_projection, np.array([0.0, 0.0, -1.0, 0.0]))
+        eye = eye[:3] / eye[3] if abs(eye[3]) > 1e-12 else np.zeros(3)
+        self.eye = modelview[:3, :3] @ eye + modelview[:3, 3]
+
+        self.light_data.upload(data)
+        self.clusters.upload(clusters)
+        self.indices.upload(indices)
+
+    def bind(self):
+        self.light_data.bind(self.LIGHT_DATA_UNIT)
+        self.clusters.bind(self.CLUSTERS_UNIT)
+        self.indices.bind(self.INDICES_UNIT)
+        glActiveTexture(GL_TEXTURE0)
+
+    def report(self):
+        return "lights {}, assigned {}, max/cluster {}".format(len(self.lights), self.assigned, self.max_per_cluster)
+
+    def destroy(self):
+        self.light_data.destroy()
+        self.clusters.destroy()
+        self.indices.destroy()
@@ -1,55 +1,20 @@
-import math
-
+import numpy as np
 import pygame
 from pygame.locals import *
 
 from OpenGL.GL import *
-from OpenGL.GLU import *
-
-from OpenGL.GL import shaders
-from OpenGL.arrays import vbo
-
-from curves import *
-from geometrix import Cube3D, Composed
-from lightning import BRDF, DefaultMaterial, Glass
-from misc import load_file
-
-# surface quality
-qul = 10
-
-# view 1 (Y = 8)
-bz = BezierCurve([Point(0, 0, "xz", depth=8), Point(2, 0, "xz", depth=8), Point(3, 2, "xz", depth=8)], quality=qul)
-bz2 = BezierCurve([Point(3, 2, "xz", depth=8), Point(4, 5, "xz", depth=8), Point(4, 8, "xz", depth=8)], quality=qul)
-
-# view 2 (Y = 0)
-bz3 = BezierCurve([Point(0, 1, "xz", depth=0), Point(6, 1, "xz", depth=0), Point(8, 0, "xz", depth=0)], quality=qul)
-bz4 = BezierCurve([Point(8, 0, "xz", depth=0), Point(5, 2, "xz", depth=0), Point(5, 8, "xz", depth=0)], quality=qul)
-
-# middle (Y = 4)
-bz_mid = BezierCurve([Point(0, 1, "xz", depth=4), Point(2, 1, "xz", depth=4), Point(3, 3, "xz", depth=4)], quality=qul)
-bz_mid2 = BezierCurve([Point(2, 2, "xz", depth=4), Point(3, 5, "xz", depth=4), Point(6, 8, "xz", depth=4)], quality=qul)
-
-# surfaces
-bs1 = BezierSurface([bz, bz_mid, bz3], last=True, quality=qul)
-bs2 = BezierSurface([bz2, bz_mid2, bz4], last=True, quality=qul)
-
-# mirrored
-bs3 = BezierSurface([bz, bz_mid, bz3], last=True, quality=qul)
-bs3.transform.size = [-1, 1, 1]
-bs4 = BezierSurface([bz2, bz_mid2, bz4], last=True, quality=qul)
-bs4.transform.size = [-1, 1, 1]
-
-# composed objects
-bsCurves = Composed([bz, bz2, bz3, bz4])
-bsSurface = Composed([bs1, bs2, bs3, bs4])
-
-# misc
 
-light_cube = Cube3D()
+from capture import FrameCapture
+from demo import anim_position, curve_batch, setup_view
+from geometrix import Transform
+from gltrace import GLTracer
+from memory import TRACKER
+from pipeline import FramePipeline
+from render_queue import RenderQueue
+from scene import load as load_scene
 
-anim_curve = BezierCurve([Point(0, -4, 0), Point(2, 0, 2), Point(3, 2, 4)], quality=qul)
+SCENE_FILE = "demo_scene.json"
 
-time = 0
 
 def main():
     pygame.init()
@@ -57,27 +22,13 @@ def main():
 
     pygame.display.set_mode(display, DOUBLEBUF | OPENGL)
 
-    glMatrixMode(GL_PROJECTION)
+    # on start, importing main loads nothing
+    scene = load_scene(SCENE_FILE)
+    bsSurface = scene["bsSurface"]
+    light_cube = scene["light_cube"]
+    anim_curve = scene["anim_curve"]
 
-    glEnable(GL_LIGHTING)
-    glEnable(GL_COLOR_MATERIAL)
-    glEnable(GL_BLEND)
-    glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
-
-    glEnable(GL_LIGHT0)
-    glLightfv(GL_LIGHT0, GL_POSITION, [10, 10, 10])
-
-    # perspective
-    glEnable(GL_DEPTH_TEST)
-    glDepthFunc(GL_LESS)
-    gluPerspective(90, (display[0] / display[1]), 0.001, 100.0)
-    glTranslatef(0.0, -6, -20)
-
-    # orth
-    # gluOrtho2D(-1, 1, -1, 1)
-    # glScalef(0.1, 0.1, 0.1)
-
-    glRotatef(-90, 1, 0, 0)
+    camera = setup_view(display[0], display[1])
     # bsSurface.transform.rotation[2] = -90
 
     # bsSurface.set_material_all()
@@ -86,25 +37,70 @@ def main():
     y_axis = 0
     speed = 1
 
-    anim_speed = 0.001
+    # materials, assigned as in scene file
+
+    scene.create_materials()
+    # anim_curve and bsCurves, control polygons toggled with P
+    curves = curve_batch(scene)
 
-    light_cube.transform.position[1] = 1
+    queue = RenderQueue()
+    stats_time = 0
 
-    # materials
+    # shared seams between patches and mirrored copies, welded by scene loader.
+    # anim_curve only moves it: static vertex buffer, offset is Model uniform
+    surface = bsSurface.welded
 
-    #surface_mat = BRDF(light_cube.transform.position, [0.8, 0.9, 0.8, 1])
-    surface_mat = Glass()# BRDF(light_cube.transform.position, [0.8, 0.9, 0.8, 1])
+    def update_frame(frame, slot):
+        # worker thread: animation of next frame
+        slot.data["a_pos"] = anim_position(anim_curve, pygame.time.get_ticks())
 
-    light_cube_mat = BRDF(light_cube.transform.position, [1.0, 0.8, 0.9, 1])
+    pipeline = FramePipeline(update_frame)
+    pipeline.start()
 
-    bsSurface.set_material_all(surface_mat)
-    light_cube.material = light_cube_mat
+    # GL call tracing, toggled with T
+    tracer = None
+    # frame recording into captures/, toggled with C
+    recorder = None
+    frame = 0
+    # debug overlays, edges toggled with F, face normals with N
+    wireframe = False
+    face_normals = False
 
     while True:
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
+                pipeline.stop()
+                if recorder is not None:
+                    recorder.destroy()
                 pygame.quit()
                 quit()
+            if event.type == pygame.KEYDOWN and event.key == pygame.K_m:
+                # memory table into console
+                print(TRACKER.full_report(scene.named_objects()))
+            if event.type == pygame.KEYDOWN and event.key == pygame.K_t:
+                if tracer is None:
+                    tracer = GLTracer().install()
+                else:
+                    # last frame call log for diffing between versions
+                    tracer.uninstall()
+                    tracer.write_capture("gltrace.log")
+                    print(tracer.table())
+                    tracer = None
+            if event.type == pygame.KEYDOWN and event.key == pygame.K_f:
+                wireframe = not wireframe
+            if event.type == pygame.KEYDOWN and event.key == pygame.K_n:
+                face_normals = not face_normals
+            if event.type == pygame.KEYDOWN and event.key == pygame.K_p:
+                curves.show_control = not curves.show_control
+            if event.type == pygame.KEYDOWN and event.key == pygame.K_c:
+                if recorder is None:
+                    recorder = FrameCapture(display[0], display[1])
+                else:
+                    recorder.destroy()
+                    recorder = None
+
+        if tracer is not None:
+            tracer.begin_frame(capture=True)
 
         keys = pygame.key.get_pressed()
 
@@ -116,8 +112,11 @@ def main():
 
         # print(x_axis, y_axis)
 
-        glRotatef(x_axis, 0, 0, 1)
-        glRotatef(y_axis, 1, 0, 0)
+        camera.rotate(x_axis, 0, 0, 1)
+        camera.rotate(y_axis, 1, 0, 0)
+        # matrices for legacy shaders and Camera block, both only after change
+        camera.load_gl()
+        camera.publish()
 
         # bsSurface.transform.rotation[2] += x_axis
         # bsSurface.transform.position[0] += y_axis * 0.1
@@ -128,19 +127,49 @@ def main():
         light_cube.transform.position[2] += sw_axis * 0.2
         glLightfv(GL_LIGHT0, GL_POSITION, light_cube.transform.position)
 
+        # anim
+        slot = pipeline.acquire()
+        surface.model_transform = Transform(position=slot.data["a_pos"])
+
         # draw
         glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
         glClearColor(0.1, 0.1, 0.1, 1)
 
-        bsSurface.draw_all()
-        # bsCurves.draw_all()
-        light_cube.draw()
-
-        # anim
-        anim_curve.draw()
-        a_pos = anim_curve.B(math.sin(pygame.time.get_ticks() * anim_speed) * 0.5 + 0.5).to_list()
-
-        bsSurface.transform.position = a_pos
+        queue.begin_frame(camera.view_projection)
+        for lighting in scene.lightings.values():
+            lighting.update(camera.view_projection, np.identity(4), camera.viewport)
+
+        bsSurface.draw_all(queue, wireframe, face_normals)
+        light_cube.draw(queue=queue)
+
+        curves.submit(queue)
+
+        queue.flush()
+        pipeline.release(slot)
+
+        if tracer is not None:
+            tracer.end_frame()
+
+        # back buffer, before flip
+        if recorder is not None:
+            recorder.capture(frame)
+        frame += 1
+
+        if pygame.time.get_ticks() - stats_time > 1000:
+            stats_time = pygame.time.get_ticks()
+            # CPU geometry walk only once per second
+            TRACKER.sample(scene.named_objects())
+            caption = [queue.report(), pipeline.report(), TRACKER.report()]
+            if tracer is not None:
+                caption.append(tracer.report())
+                tracer.reset_stats()
+            if recorder is not None:
+                caption.append(recorder.report())
+                recorder.reset_stats()
+            pygame.display.set_caption(" | ".join(caption))
+            pipeline.reset_stats()
+        else:
+            TRACKER.sample()
 
         pygame.display.flip()
         pygame.time.wait(10)
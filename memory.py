@@ -0,0 +1,252 @@
+import sys
+import weakref
+from collections import deque
+
+import numpy as np
+
+# CPU side geometry of Object3D
+GEOMETRY_FIELDS = ("vertexes", "normals", "colors", "tex_coords", "edges", "surfaces")
+
+
+def sizeof(value) -> int:
+    """
+    deep size of geometry containers in bytes: np arrays, lists / tuples, objects with __dict__ (Point)
+    """
+    if isinstance(value, np.ndarray):
+        if value.dtype == object:
+            return value.nbytes + sum(sizeof(v) for v in value.flat)
+        return value.nbytes
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(sizeof(v) for v in value)
+    if hasattr(value, "__dict__"):
+        return sys.getsizeof(value) + sys.getsizeof(value.__dict__) + \
+            sum(sys.getsizeof(v) for v in value.__dict__.values())
+    if value is None:
+        return 0
+    return sys.getsizeof(value)
+
+
+def cpu_bytes(obj) -> dict:
+    """
+    CPU memory of Object3D: geometry lists, packed vertex data, index data and streaming shadow copies
+    :return: dict field -> bytes
+    """
+    result = {field: sizeof(getattr(obj, field, None)) for field in GEOMETRY_FIELDS}
+
+    result["vertex_data"] = sizeof(getattr(obj, "_vert_data", None))
+
+    index_buffer = getattr(obj, "_index_buffer", None)
+    result["index_data"] = sizeof(index_buffer.indices) if index_buffer is not None else 0
+    edge_index_buffer = getattr(obj, "_edge_index_buffer", None)
+    if edge_index_buffer is not None:
+        result["index_data"] += sizeof(edge_index_buffer.indices)
+
+    # static buffers keep no copy
+    shadows = 0
+    buffers = getattr(obj, "_buffers", None)
+    if buffers is not None and buffers.stream is not None:
+        shadows = sum(sizeof(s) for s in buffers.stream.shadows)
+    result["upload_shadows"] = shadows
+
+    return result
+
+
+class GLResource:
+    """
+    live GL object
+    """
+
+    def __init__(self, kind: str, handle: int, size: int, owner, label: str, frame: int):
+        self.kind = kind
+        self.handle = handle
+        self.size = size
+        self.owner = weakref.ref(owner) if owner is not None else None
+        self.owner_id = id(owner) if owner is not None else None
+        self.label = label or (type(owner).__name__ if owner is not None else kind)
+        self.frame = frame
+
+    def owner_alive(self):
+        return self.owner is None or self.owner() is not None
+
+
+class MemoryTracker:
+    """
+    accounting of GL buffers, textures and programs, per owner \n
+    GL code registers resources on creation and unregisters them on deletion,
+    sample() once per frame tracks totals, high-water marks and leaks
+    """
+
+    KINDS = ("buffer", "vertex_array", "texture", "program")
+
+    def __init__(self, history: int = 600, growth_frames: int = 3):
+        """
+        :param history: count of samples kept
+        :param growth_frames: owner is flagged when its resources grew in that many samples in a row
+        """
+        self.resources = {}
+        self.frame = 0
+
+        self.totals = {kind: 0 for kind in self.KINDS}
+        self.counts = {kind: 0 for kind in self.KINDS}
+        self.cpu_total = 0
+
+        # high-water marks
+        self.peaks = {kind: 0 for kind in self.KINDS}
+        self.peak_gl = 0
+        self.peak_cpu = 0
+
+        # (frame, gl bytes, cpu bytes)
+        self.history = deque(maxlen=history)
+
+        self.growth_frames = growth_frames
+        self._owner_counts = {}
+        self._owner_growth = {}
+
+    def register(self, kind: str, handle: int, size: int = 0, owner=None, label: str = None):
+        """
+        :param kind: one of KINDS
+        :param handle: GL name
+        :param size: bytes of GPU storage
+        :param owner: object responsible for deleting resource, held by weak reference
+        :param label: name in reports, default owner type name
+        """
+        key = (kind, int(handle))
+        if key in self.resources:
+            self.unregister(kind, handle)
+
+        self.resources[key] = GLResource(kind, int(handle), size, owner, label, self.frame)
+        self.totals[kind] += size
+        self.counts[kind] += 1
+        self.peaks[kind] = max(self.peaks[kind], self.totals[kind])
+
+    def unregister(self, kind: str, handle: int):
+        resource = self.resources.pop((kind, int(handle)), None)
+        if resource is not None:
+            self.totals[kind] -= resource.size
+            self.counts[kind] -= 1
+
+    def gl_total(self) -> int:
+        return sum(self.totals.values())
+
+    def sample(self, objects: dict = None):
+        """
+        records frame totals, call once per frame
+        :param objects: name -> Object3D, recomputes CPU totals (deep size walk, not needed every frame)
+        """
+        self.frame += 1
+
+        if objects is not None:
+            self.cpu_total = sum(sum(cpu_bytes(o).values()) for o in objects.values())
+            self.peak_cpu = max(self.peak_cpu, self.cpu_total)
+
+        gl_total = self.gl_total()
+        self.peak_gl = max(self.peak_gl, gl_total)
+        self.history.append((self.frame, gl_total, self.cpu_total))
+
+        counts = {}
+        for resource in self.resources.values():
+            if resource.owner_id is not None:
+                counts[resource.owner_id] = counts.get(resource.owner_id, 0) + 1
+
+        # samples in a row with more resources, any sample without growth ends the run
+        growth = {}
+        for owner_id, count in counts.items():
+            if count > self._owner_counts.get(owner_id, count):
+                growth[owner_id] = self._owner_growth.get(owner_id, 0) + 1
+        self._owner_counts = counts
+        self._owner_growth = growth
+
+    def leaks(self) -> list[dict]:
+        """
+        resources of garbage collected owners and owners whose resource count keeps growing
+        :return: list of dicts: label, reason, count, bytes
+        """
+        result = {}
+        for resource in self.resources.values():
+            if not resource.owner_alive():
+                reason = "owner deleted"
+            elif self._owner_growth.get(resource.owner_id, 0) >= self.growth_frames:
+                reason = "growing"
+            else:
+                continue
+
+            key = (resource.owner_id, reason)
+            entry = result.setdefault(key, {"label": resource.label, "reason": reason, "count": 0, "bytes": 0})
+            entry["count"] += 1
+            entry["bytes"] += resource.size
+
+        return list(result.values())
+
+    def owner_bytes(self, owner) -> dict:
+        """
+        GL bytes and counts of resources owned by object
+        :return: dict kind -> (count, bytes)
+        """
+        result = {}
+        for resource in self.resources.values():
+            if resource.owner_id == id(owner) and resource.owner_alive():
+                count, size = result.get(resource.kind, (0, 0))
+                result[resource.kind] = (count + 1, size + resource.size)
+        return result
+
+    def object_report(self, objects: dict) -> list[dict]:
+        """
+        per object CPU and GL memory
+        :param objects: name -> Object3D
+        :return: list of dicts: name, cpu (dict field -> bytes), cpu_total, gl (dict kind -> (count, bytes)), gl_total
+        """
+        rows = []
+        for name, obj in objects.items():
+            cpu = cpu_bytes(obj)
+            gl = self.owner_bytes(obj)
+            # materials and their textures are shared, not counted per object
+            rows.append({"name": name, "cpu": cpu, "cpu_total": sum(cpu.values()),
+                         "gl": gl, "gl_total": sum(size for _, size in gl.values())})
+        return rows
+
+    def report(self):
+        """
+        short summary for window caption
+        """
+        leaks = self.leaks()
+        text = "cpu {} (peak {}), gl {} (peak {}), {} buffers, {} textures, {} programs".format(
+            format_bytes(self.cpu_total), format_bytes(self.peak_cpu),
+            format_bytes(self.gl_total()), format_bytes(self.peak_gl),
+            self.counts["buffer"], self.counts["texture"], self.counts["program"])
+        if leaks:
+            text += ", {} leaking".format(sum(leak["count"] for leak in leaks))
+        return text
+
+    def full_report(self, objects: dict) -> str:
+        """
+        multi line table of objects, totals, high-water marks and leaks
+        """
+        lines = ["{:<24} {:>10} {:>10}   {}".format("object", "cpu", "gl", "largest cpu fields")]
+        for row in sorted(self.object_report(objects), key=lambda r: -(r["cpu_total"] + r["gl_total"])):
+            largest = sorted(row["cpu"].items(), key=lambda kv: -kv[1])[:3]
+            lines.append("{:<24} {:>10} {:>10}   {}".format(
+                row["name"], format_bytes(row["cpu_total"]), format_bytes(row["gl_total"]),
+                ", ".join("{} {}".format(k, format_bytes(v)) for k, v in largest if v)))
+
+        lines.append("")
+        for kind in self.KINDS:
+            lines.append("{:<24} {:>5} live {:>10} (peak {})".format(
+                kind, self.counts[kind], format_bytes(self.totals[kind]), format_bytes(self.peaks[kind])))
+
+        for leak in self.leaks():
+            lines.append("LEAK {:<19} {}: {} resources, {}".format(
+                leak["label"], leak["reason"], leak["count"], format_bytes(leak["bytes"])))
+
+        return "\n".join(lines)
+
+
+def format_bytes(size: int) -> str:
+    for unit in ("B", "KB", "MB"):
+        if abs(size) < 1024:
+            return "{:.0f} {}".format(size, unit) if unit == "B" else "{:.1f} {}".format(size, unit)
+        size /= 1024
+    return "{:.1f} GB".format(size)
+
+
+# global tracker used by buffers, textures and materials
+TRACKER = MemoryTracker()
@@ -0,0 +1,618 @@
+"""
+Performance regression tracking \n
+    python perf.py run [--gl] [--repeat 15] [--label text] \n
+runs scenarios, appends samples with environment metadata to history file \n
+    python perf.py compare [base] [new] [--threshold 0.05] [--alpha 0.01] \n
+compares two runs (ids, negative values count from the end), exit code 1 on regressions \n
+    python perf.py list \n
+    python perf.py startup [--module main] [--gl] [--top 25] \n
+import time of module per imported module, creation time of each scene object (and material with --gl)
+"""
+
+import argparse
+import gc
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+HISTORY_FILE = "perf_history.jsonl"
+SCENE_FILE = "demo_scene.json"
+
+QUALITIES = (10, 20, 40)
+PATCH_COUNT = 2000
+# deforming patch of frame_pipeline scenarios, (quality + 1)^2 vertexes
+PIPELINE_QUALITY = 100
+LIGHT_COUNTS = (16, 128, 512, 2048)
+# box around demo scene
+LIGHT_BOUNDS = [[-10, -2, -2], [10, 10, 10]]
+
+
+class Scenario:
+    """
+    named workload, setup() builds state outside of timing and returns step function
+    """
+
+    def __init__(self, name: str, setup, gl: bool = False):
+        self.name = name
+        self.setup = setup
+        self.gl = gl
+
+
+def _import(module: str):
+    # fresh interpreter, imported modules are cached
+    command = [sys.executable, "-c", "import " + module]
+    return lambda: subprocess.run(command, capture_output=True, check=True)
+
+
+def _scene_load(quality):
+    from scene import load as load_scene
+
+    return lambda: load_scene(SCENE_FILE, quality)
+
+
+def _surface_normals(quality):
+    from scene import load as load_scene
+
+    scene = load_scene(SCENE_FILE, quality)
+    surfaces = [scene[name] for name in ("bs1", "bs2", "bs3", "bs4")]
+
+    def step():
+        for s in surfaces:
+            s.calc_normals()
+
+    return step
+
+
+def _vertex_pack(quality):
+    from geometrix import Transform
+    from scene import load as load_scene
+
+    welded = load_scene(SCENE_FILE, quality)["bsSurface"].welded
+    out = np.empty(len(welded.vertexes) * welded.vertex_format.stride, dtype=np.uint8)
+    frame = [0]
+
+    def step():
+        frame[0] += 1
+        welded.pack_vertex_data(Transform(position=[frame[0] * 0.01, 0, 0]), out)
+
+    return step
+
+
+def _patches(processes):
+    from tessellation import Patch, tessellate_all
+
+    rng = np.random.default_rng(0)
+    points = rng.random((PATCH_COUNT, 3, 3, 3)) * 10
+    patches = [Patch(p, quality=10) for p in points]
+
+    return lambda: tessellate_all(patches, processes=processes)
+
+
+def _frame_submit(quality, finish=True):
+    from OpenGL.GL import glClear, glClearColor, glFinish, GL_COLOR_BUFFER_BIT, GL_DEPTH_BUFFER_BIT
+
+    from demo import setup_view
+    from geometrix import Transform
+    from render_queue import RenderQueue
+    from scene import load as load_scene
+
+    camera = setup_view(800, 600)
+
+    scene = load_scene(SCENE_FILE, quality)
+    scene.create_materials()
+    surface = scene["bsSurface"]
+    light_cube = scene["light_cube"]
+    anim_curve = scene["anim_curve"]
+    queue = RenderQueue()
+    frame = [0]
+
+    def step():
+        # moving surface, static vertex buffer and Model uniform as in main.py
+        frame[0] += 1
+        surface.welded.model_transform = Transform(position=anim_curve.B((frame[0] % 100) / 100).to_list())
+
+        glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
+        glClearColor(0.1, 0.1, 0.1, 1)
+        queue.begin_frame(camera.view_projection)
+        surface.draw_all(queue)
+        light_cube.draw(queue=queue)
+        anim_curve.draw(queue=queue)
+        queue.flush()
+        if finish:
+            glFinish()
+
+    return step
+
+
+def _deforming_patch(quality, rows=None):
+    """
+    demo patch as dynamic WeldedMesh of rows x (quality + 1) vertexes, rows None -> as BezierSurface
+    :return: (scene, mesh, deform(frame) -> (points, normals) with control points of middle curve moved)
+    """
+    from curves import grid_indices, points_array, surface_normals
+    from geometrix import WeldedMesh
+    from scene import load as load_scene
+
+    scene = load_scene(SCENE_FILE, quality)
+    scene.create_materials()
+    patch = scene["bs1"]
+    control = [points_array(curve.control_points) for curve in patch.curves]
+    weights = [curve.weights for curve in patch.curves]
+
+    rows = rows or len(patch.secondary_curves)
+    u = np.repeat(np.arange(rows) / (rows - 1), quality + 1)
+    t = np.tile(np.arange(quality + 1) / quality, rows)
+
+    def deform(frame):
+        moved = [points.copy() for points in control]
+        moved[len(moved) // 2][:, 2] += np.sin(frame * 0.1)
+        return surface_normals(moved, weights, t, u)
+
+    points, normals = deform(0)
+    mesh = WeldedMesh(points, normals, grid_indices(rows, quality).astype(np.int64), np.column_stack([t, u]))
+    mesh.material = scene.materials["surface_mat"]
+    mesh.dynamic = True
+
+    return scene, mesh, deform
+
+
+def _surface_deform(quality):
+    """
+    demo patch deformed by moving control points of its middle curve, evaluated, packed and streamed
+    through ring buffer every frame
+    """
+    from OpenGL.GL import glClear, glClearColor, glFinish, GL_COLOR_BUFFER_BIT, GL_DEPTH_BUFFER_BIT
+
+    from demo import setup_view
+    from render_queue import RenderQueue
+
+    camera = setup_view(800, 600)
+    _, mesh, deform = _deforming_patch(quality)
+    queue = RenderQueue()
+    frame = [0]
+
+    def step():
+        frame[0] += 1
+        mesh.set_vertexes(*deform(frame[0]))
+
+        glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
+        glClearColor(0.1, 0.1, 0.1, 1)
+        queue.begin_frame(camera.view_projection)
+        mesh.draw(queue=queue)
+        queue.flush()
+        glFinish()
+
+    return step
+
+
+def _frame_pipeline(pipelined: bool):
+    """
+    deforming patch of PIPELINE_QUALITY^2 vertexes: evaluation and packing (update callback) with GL
+    submit on one thread, or update on FramePipeline worker while GL thread draws previous frame
+    """
+    from OpenGL.GL import glClear, glClearColor, glFinish, GL_COLOR_BUFFER_BIT, GL_DEPTH_BUFFER_BIT
+
+    from demo import setup_view
+    from pipeline import FramePipeline, FrameSlot
+    from render_queue import RenderQueue
+
+    camera = setup_view(800, 600)
+    _, mesh, deform = _deforming_patch(PIPELINE_QUALITY, PIPELINE_QUALITY + 1)
+    queue = RenderQueue()
+
+    def update(frame, slot):
+        out = slot.array("surface", len(mesh.vertexes) * mesh.vertex_format.stride, np.uint8)
+        slot.data["surface"] = mesh.pack_deformed(*deform(frame), out)
+
+    def draw(slot):
+        mesh.use_vertex_data(slot.data["surface"])
+
+        glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
+        glClearColor(0.1, 0.1, 0.1, 1)
+        queue.begin_frame(camera.view_projection)
+        mesh.draw(queue=queue)
+        queue.flush()
+        glFinish()
+
+    if not pipelined:
+        slot = FrameSlot(0)
+        frame = [0]
+
+        def step():
+            frame[0] += 1
+            update(frame[0], slot)
+            draw(slot)
+
+        return step
+
+    pipeline = FramePipeline(update)
+    pipeline.start()
+    # worker is left blocked on free slot, daemon thread
+
+    def step():
+        slot = pipeline.acquire()
+        draw(slot)
+        pipeline.release(slot)
+
+    return step
+
+
+def _frame_capture(quality, mode):
+    """
+    frame_submit with readback: "sync" glReadPixels or FrameCapture PBO ring \n
+    raw output, frames here come faster than png encoders keep up with and encoder backpressure
+    would be measured instead of readback
+    """
+    import atexit
+    import shutil
+    import tempfile
+
+    from OpenGL.GL import glReadPixels, GL_RGBA, GL_UNSIGNED_BYTE
+
+    from capture import FrameCapture
+
+    # no glFinish, readback decides whether GL thread waits for GPU
+    submit = _frame_submit(quality, finish=False)
+
+    if mode == "sync":
+        def step():
+            submit()
+            glReadPixels(0, 0, 800, 600, GL_RGBA, GL_UNSIGNED_BYTE)
+
+        return step
+
+    out_dir = tempfile.mkdtemp(prefix="perf_capture")
+    atexit.register(shutil.rmtree, out_dir, True)
+    capture = FrameCapture(800, 600, out_dir, "raw")
+    frame = [0]
+
+    def step():
+        submit()
+        capture.capture(frame[0])
+        frame[0] += 1
+
+    return step
+
+
+def _light_assign(count):
+    from demo import demo_camera
+    from lights import ClusterGrid, LightSet, assign_lights
+
+    lights = LightSet.random(count, LIGHT_BOUNDS)
+    # view of main.py
+    view_projection = demo_camera(800, 600).view_projection
+    grid = ClusterGrid()
+
+    return lambda: assign_lights(lights.positions, lights.radii, view_projection, grid)
+
+
+def _clustered_frame(count):
+    from OpenGL.GL import glClear, glClearColor, glFinish, GL_COLOR_BUFFER_BIT, GL_DEPTH_BUFFER_BIT
+
+    from demo import setup_view
+    from lightning import ClusteredBRDF
+    from lights import ClusteredLighting, LightSet
+    from render_queue import RenderQueue
+    from scene import load as load_scene
+
+    camera = setup_view(800, 600)
+
+    scene = load_scene(SCENE_FILE, 20)
+    lighting = ClusteredLighting(LightSet.random(count, LIGHT_BOUNDS))
+    surface = scene["bsSurface"]
+    surface.set_material_all(ClusteredBRDF(lighting, [0.8, 0.9, 0.8, 1]))
+    queue = RenderQueue()
+
+    def step():
+        glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
+        glClearColor(0.1, 0.1, 0.1, 1)
+        queue.begin_frame(camera.view_projection)
+        lighting.update(camera.view_projection, np.identity(4), camera.viewport)
+        surface.draw_all(queue)
+        queue.flush()
+        glFinish()
+
+    return step
+
+
+def scenarios() -> list[Scenario]:
+    result = [Scenario("import_main", lambda: _import("main"))]
+    for q in QUALITIES:
+        result.append(Scenario("scene_load_q{}".format(q), lambda q=q: _scene_load(q)))
+        result.append(Scenario("surface_normals_q{}".format(q), lambda q=q: _surface_normals(q)))
+        result.append(Scenario("vertex_pack_q{}".format(q), lambda q=q: _vertex_pack(q)))
+    result.append(Scenario("patches_{}".format(PATCH_COUNT), lambda: _patches(1)))
+    result.append(Scenario("patches_{}_parallel".format(PATCH_COUNT), lambda: _patches(None)))
+    for n in LIGHT_COUNTS:
+        result.append(Scenario("light_assign_l{}".format(n), lambda n=n: _light_assign(n)))
+    for q in QUALITIES:
+        result.append(Scenario("frame_submit_q{}".format(q), lambda q=q: _frame_submit(q), gl=True))
+    # moving control points, streamed vertex data
+    for q in QUALITIES:
+        result.append(Scenario("surface_deform_q{}".format(q), lambda q=q: _surface_deform(q), gl=True))
+    # frame time of heavy update callback, serial and overlapped with GL thread
+    for mode in ("serial", "pipelined"):
+        result.append(Scenario("frame_pipeline_{}_q{}".format(mode, PIPELINE_QUALITY),
+                               lambda mode=mode: _frame_pipeline(mode == "pipelined"), gl=True))
+    for mode in ("sync", "pbo"):
+        result.append(Scenario("frame_capture_{}_q20".format(mode), lambda mode=mode: _frame_capture(20, mode), gl=True))
+    # frame time against light count
+    for n in LIGHT_COUNTS:
+        result.append(Scenario("clustered_frame_l{}".format(n), lambda n=n: _clustered_frame(n), gl=True))
+    return result
+
+
+def measure(step, repeat: int, warmup: int = 3) -> list[float]:
+    """
+    wall time of step calls, gc disabled while timing as in timeit
+    :return: seconds of each call
+    """
+    for _ in range(warmup):
+        step()
+
+    samples = []
+    gc.collect()
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            step()
+            samples.append(time.perf_counter() - start)
+    finally:
+        if enabled:
+            gc.enable()
+    return samples
+
+
+def _git(*args):
+    try:
+        return subprocess.run(["git", *args], capture_output=True, text=True, timeout=10).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return ""
+
+
+def environment(gl_renderer: str = None) -> dict:
+    import OpenGL
+
+    return {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "node": platform.node(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "pyopengl": OpenGL.__version__,
+        "gl_renderer": gl_renderer,
+        "commit": _git("rev-parse", "HEAD"),
+        "dirty": bool(_git("status", "--porcelain", "--untracked-files=no")),
+    }
+
+
+def load_history(path: str) -> list[dict]:
+    if not os.path.exists(path):
+        return []
+    with open(path, "r") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def append_history(path: str, record: dict):
+    with open(path, "a") as f:
+        f.write(json.dumps(record) + "\n")
+
+
+def find_run(history: list[dict], run_id: int) -> dict:
+    """
+    :param run_id: run id, negative -> index from end of history
+    """
+    if run_id < 0:
+        if -run_id > len(history):
+            raise Exception("History has only {} runs".format(len(history)))
+        return history[run_id]
+    for record in history:
+        if record["id"] == run_id:
+            return record
+    raise Exception("No run with id {}".format(run_id))
+
+
+def run(args) -> int:
+    context = None
+    if args.gl:
+        # before any OpenGL import
+        from headless import HeadlessContext
+        context = HeadlessContext(800, 600)
+
+    history = load_history(args.history)
+    record = {
+        "id": history[-1]["id"] + 1 if history else 1,
+        "time": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "label": args.label,
+        "repeat": args.repeat,
+        "env": environment(context.renderer() if context else None),
+        "results": {},
+    }
+
+    for scenario in scenarios():
+        if scenario.gl and context is None:
+            continue
+        if args.only and not any(pattern in scenario.name for pattern in args.only):
+            continue
+
+        samples = measure(scenario.setup(), args.repeat)
+        record["results"][scenario.name] = samples
+        print("{:<28} median {:9.3f} ms  min {:9.3f} ms".format(
+            scenario.name, np.median(samples) * 1000, np.min(samples) * 1000))
+
+    if context is not None:
+        context.destroy()
+
+    append_history(args.history, record)
+    print("run {} saved to {}".format(record["id"], args.history))
+    return 0
+
+
+def import_times(module: str) -> list[tuple[str, float, float]]:
+    """
+    import of module in fresh interpreter, python -X importtime
+    :return: (module, self seconds, cumulative seconds) of each imported module, in import order
+    """
+    process = subprocess.run([sys.executable, "-X", "importtime", "-c", "import " + module],
+                             capture_output=True, text=True)
+    if process.returncode != 0:
+        raise Exception("Import of {} failed:\n{}".format(module, process.stderr))
+
+    rows = []
+    for line in process.stderr.splitlines():
+        fields = line.partition("import time:")[2].split("|")
+        # header line has no numbers
+        if len(fields) == 3 and fields[0].strip().isdigit():
+            rows.append((fields[2].strip(), int(fields[0]) / 1e6, int(fields[1]) / 1e6))
+    return rows
+
+
+def startup(args) -> int:
+    rows = import_times(args.module)
+    total = next((cumulative for name, _, cumulative in rows if name == args.module), 0)
+    print("import {}: {:.1f} ms, {} modules, * - modules of this repo".format(args.module, total * 1000, len(rows)))
+    print("{:>9} {:>9}  module".format("self ms", "total ms"))
+    for name, own, cumulative in sorted(rows, key=lambda row: -row[1])[:args.top]:
+        local = os.path.exists(name.split(".")[0] + ".py")
+        print("{:9.2f} {:9.2f}  {}{}".format(own * 1000, cumulative * 1000, name, " *" if local else ""))
+
+    context = None
+    if args.gl:
+        # before any OpenGL import
+        from headless import HeadlessContext
+        context = HeadlessContext(800, 600)
+
+    from scene import load as load_scene
+
+    timings = []
+    start = time.perf_counter()
+    scene = load_scene(args.scene, args.quality, timings)
+    if context is not None:
+        scene.create_materials(timings)
+    total = time.perf_counter() - start
+
+    print()
+    print("scene {}: {:.1f} ms".format(args.scene, total * 1000))
+    print("{:>9}  object".format("ms"))
+    for group, name, seconds in sorted(timings, key=lambda row: -row[2]):
+        print("{:9.2f}  {}.{}".format(seconds * 1000, group, name))
+
+    if context is not None:
+        context.destroy()
+    return 0
+
+
+def compare_runs(base: dict, new: dict, threshold: float, alpha: float) -> list[dict]:
+    """
+    per scenario comparison of medians, one-sided Mann-Whitney U tests
+    :param threshold: relative median change treated as relevant
+    :param alpha: significance level
+    :return: list of dicts: name, base / new medians, change, p-values, status
+    """
+    from scipy.stats import mannwhitneyu
+
+    rows = []
+    for name, new_samples in new["results"].items():
+        if name not in base["results"]:
+            continue
+        base_samples = base["results"][name]
+
+        base_median = float(np.median(base_samples))
+        new_median = float(np.median(new_samples))
+        change = new_median / base_median - 1
+
+        p_slower = float(mannwhitneyu(new_samples, base_samples, alternative="greater").pvalue)
+        p_faster = float(mannwhitneyu(new_samples, base_samples, alternative="less").pvalue)
+
+        status = "same"
+        if change > threshold and p_slower < alpha:
+            status = "REGRESSION"
+        elif change < -threshold and p_faster < alpha:
+            status = "improvement"
+
+        rows.append({"name": name, "base": base_median, "new": new_median, "change": change,
+                     "p_slower": p_slower, "p_faster": p_faster, "status": status})
+    return rows
+
+
+def compare(args) -> int:
+    history = load_history(args.history)
+    base = find_run(history, args.base)
+    new = find_run(history, args.new)
+
+    print("base: run {} {} {}".format(base["id"], base["time"], base["env"]["commit"][:10]))
+    print("new:  run {} {} {}".format(new["id"], new["time"], new["env"]["commit"][:10]))
+    for key in ("node", "platform", "python", "numpy", "cpu_count", "gl_renderer"):
+        if base["env"].get(key) != new["env"].get(key):
+            print("warning: {} differs: {} / {}".format(key, base["env"].get(key), new["env"].get(key)))
+
+    rows = compare_runs(base, new, args.threshold, args.alpha)
+    print("{:<28} {:>11} {:>11} {:>8} {:>9}  {}".format("scenario", "base ms", "new ms", "change", "p", "status"))
+    for row in rows:
+        p = row["p_slower"] if row["change"] >= 0 else row["p_faster"]
+        print("{:<28} {:11.3f} {:11.3f} {:+7.1f}% {:9.2g}  {}".format(
+            row["name"], row["base"] * 1000, row["new"] * 1000, row["change"] * 100, p, row["status"]))
+
+    regressions = [row for row in rows if row["status"] == "REGRESSION"]
+    if regressions:
+        print("{} regression(s) above {:.0%}".format(len(regressions), args.threshold))
+        return 1
+    return 0
+
+
+def list_runs(args) -> int:
+    for record in load_history(args.history):
+        env = record["env"]
+        print("{:>4}  {}  {}{}  {}  {} scenarios  {}".format(
+            record["id"], record["time"], env["commit"][:10], "+" if env["dirty"] else " ",
+            env["node"], len(record["results"]), record.get("label") or ""))
+    return 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="performance regression tracking")
+    parser.add_argument("--history", default=HISTORY_FILE, help="history file, one JSON run per line")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="run scenarios and save results")
+    run_parser.add_argument("--repeat", type=int, default=15, help="samples per scenario")
+    run_parser.add_argument("--gl", action="store_true", help="frame submission scenarios in headless EGL context")
+    run_parser.add_argument("--only", nargs="*", help="scenarios with names containing any of given strings")
+    run_parser.add_argument("--label", default=None, help="note saved with run")
+    run_parser.set_defaults(func=run)
+
+    compare_parser = commands.add_parser("compare", help="compare two runs")
+    compare_parser.add_argument("base", type=int, nargs="?", default=-2, help="base run id, default previous run")
+    compare_parser.add_argument("new", type=int, nargs="?", default=-1, help="new run id, default last run")
+    compare_parser.add_argument("--threshold", type=float, default=0.05, help="relative slowdown treated as regression")
+    compare_parser.add_argument("--alpha", type=float, default=0.01, help="significance level")
+    compare_parser.set_defaults(func=compare)
+
+    list_parser = commands.add_parser("list", help="list saved runs")
+    list_parser.set_defaults(func=list_runs)
+
+    startup_parser = commands.add_parser("startup", help="import and scene creation time, not saved")
+    startup_parser.add_argument("--module", default="main", help="imported module")
+    startup_parser.add_argument("--scene", default=SCENE_FILE, help="scene file")
+    startup_parser.add_argument("--quality", type=int, default=None, help="overrides scene quality")
+    startup_parser.add_argument("--gl", action="store_true", help="materials compiled in headless EGL context")
+    startup_parser.add_argument("--top", type=int, default=25, help="imported modules listed, slowest first")
+    startup_parser.set_defaults(func=startup)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,125 @@
+import queue
+import threading
+import time
+
+import numpy as np
+
+
+class FrameSlot:
+    """
+    buffers of one frame, filled by worker thread and read by GL thread
+    """
+
+    def __init__(self, index: int):
+        self.index = index
+        self.frame = -1
+        # persistent arrays, reused every time slot is filled
+        self.arrays = {}
+        # small per-frame values
+        self.data = {}
+        self.compute_time = 0.0
+
+    def array(self, name: str, shape, dtype=np.float32) -> np.ndarray:
+        """
+        persistent array of slot, reallocated only when shape or dtype changes
+        """
+        a = self.arrays.get(name)
+        if a is None or a.shape != tuple(np.atleast_1d(shape)) or a.dtype != dtype:
+            a = np.empty(shape, dtype=dtype)
+            self.arrays[name] = a
+        return a
+
+
+class FramePipeline:
+    """
+    worker thread computes frame N + 1 (animation, geometry) while GL thread submits frame N \n
+    handoff: slot = acquire() -> submit GL calls reading slot -> release(slot)
+    """
+
+    def __init__(self, update, slots: int = 2):
+        """
+        :param update: update(frame: int, slot: FrameSlot), called on worker thread,
+         must not call GL
+        :param slots: buffered frames count, 2 - double buffering
+        """
+        self.update = update
+        self.slots = [FrameSlot(i) for i in range(slots)]
+
+        self._free = queue.Queue()
+        self._ready = queue.Queue()
+        self._thread = None
+        self._running = False
+        self._error = None
+        self._next_frame = 0
+
+        # stats, averaged over frames since reset_stats
+        self.frames = 0
+        self.compute_time = 0.0
+        self.wait_time = 0.0
+
+    def start(self):
+        self._running = True
+        for slot in self.slots:
+            self._free.put(slot)
+        self._thread = threading.Thread(target=self._run, name="FramePipeline", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+        self._free.put(None)
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while self._running:
+            slot = self._free.get()
+            if slot is None:
+                break
+
+            start = time.perf_counter()
+            try:
+                self.update(self._next_frame, slot)
+            except Exception as e:
+                self._error = e
+                self._ready.put(None)
+                break
+
+            slot.frame = self._next_frame
+            slot.compute_time = time.perf_counter() - start
+            self._next_frame += 1
+            self._ready.put(slot)
+
+    def acquire(self, timeout: float = None) -> FrameSlot:
+        """
+        next computed frame, blocks while worker is still computing it
+        """
+        start = time.perf_counter()
+        slot = self._ready.get(timeout=timeout)
+        self.wait_time += time.perf_counter() - start
+
+        if slot is None:
+            raise self._error
+
+        self.frames += 1
+        self.compute_time += slot.compute_time
+        return slot
+
+    def release(self, slot: FrameSlot):
+        """
+        GL thread finished reading slot, worker may fill it again
+        """
+        self._free.put(slot)
+
+    def reset_stats(self):
+        self.frames = 0
+        self.compute_time = 0.0
+        self.wait_time = 0.0
+
+    def report(self):
+        """
+        compute - CPU work moved off GL thread, wait - GL thread stall on handoff
+        """
+        frames = max(self.frames, 1)
+        return "compute {:.2f} ms, wait {:.2f} ms".format(self.compute_time / frames * 1000,
+                                                         self.wait_time / frames * 1000)
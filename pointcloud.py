@@ -0,0 +1,483 @@
+"""
+Point clouds larger than memory \n
+point file: header, chunk table, point records sorted by chunk. Chunks are cells of uniform grid
+split to at most chunk_points points, the file is memory mapped and only chunks in view are read. \n
+    python pointcloud.py points.npy cloud.pcl [--colors colors.npy] [--chunk-points 65536] \n
+input is .npy of shape (n, 3) or raw float32 xyz file, both memory mapped
+"""
+
+import argparse
+import mmap
+import os
+import sys
+
+import numpy as np
+from OpenGL.GL import *
+
+from geometrix import Object3D
+from indexing import IndexBuffer
+from memory import TRACKER
+from render_queue import DrawItem
+from vertex_format import VertexAttribute, NORMAL_FLOAT32
+
+_MAGIC = b"PCLOUD01"
+_HEADER = np.dtype([("magic", "S8"), ("chunks", "<u4"), ("chunk_points", "<u4"), ("points", "<u8")])
+_CHUNK = np.dtype([("offset", "<u8"), ("count", "<u4"), ("reserved", "<u4"),
+                   ("min", "<f4", (3,)), ("max", "<f4", (3,))])
+
+# point record of file and GPU buffer
+POINT_DTYPE = np.dtype([("position", "<f4", (3,)), ("color", "u1", (4,))])
+
+
+class PointFormat:
+    """
+    interleaved point layout: float32 position, normalized uint8 RGBA color \n
+    attributes for MaterialBase.bind_vertex_format
+    """
+
+    def __init__(self):
+        position = VertexAttribute(3, GL_FLOAT, False, np.float32, 3)
+        color = VertexAttribute(4, GL_UNSIGNED_BYTE, True, np.uint8, 4)
+        color.offset = POINT_DTYPE.fields["color"][1]
+
+        self.attributes = {"position": position, "color": color}
+        self.stride = POINT_DTYPE.itemsize
+        self.dtype = POINT_DTYPE
+        # no normals, see MaterialBase.apply_vertex_format
+        self.normal_encoding = NORMAL_FLOAT32
+
+
+POINTS = PointFormat()
+
+# points are drawn without indexes, only mode is used
+POINTS_INDEX = IndexBuffer(np.zeros(0, dtype=np.uint32), GL_POINTS, GL_UNSIGNED_INT)
+
+
+def _grid(low: np.ndarray, high: np.ndarray, cells: float) -> np.ndarray:
+    """
+    cells count per axis of about cells cubic cells, flat axes get one cell
+    """
+    extent = high - low
+    flat = extent <= extent.max() * 1e-6
+    dims = np.ones(3, dtype=np.int64)
+    if flat.all():
+        return dims
+
+    cell = (np.prod(extent[~flat]) / max(cells, 1.0)) ** (1 / np.count_nonzero(~flat))
+    dims[~flat] = np.clip(np.ceil(extent[~flat] / cell), 1, 1024)
+    return dims
+
+
+def _cell_ids(positions: np.ndarray, low: np.ndarray, high: np.ndarray, dims: np.ndarray) -> np.ndarray:
+    extent = np.where(high > low, high - low, 1.0)
+    cell = np.clip(np.floor((positions - low) / extent * dims), 0, dims - 1).astype(np.int64)
+    return (cell[:, 2] * dims[1] + cell[:, 1]) * dims[0] + cell[:, 0]
+
+
+def _records(positions: np.ndarray, colors: np.ndarray | None) -> np.ndarray:
+    records = np.empty(len(positions), dtype=POINT_DTYPE)
+    records["position"] = positions
+    records["color"] = 255
+    if colors is not None:
+        colors = np.asarray(colors, dtype=np.uint8)
+        records["color"][:, :colors.shape[1]] = colors
+    return records
+
+
+def build_point_file(positions: np.ndarray, path: str, colors: np.ndarray = None,
+                     chunk_points: int = 65536, batch: int = 1 << 22):
+    """
+    writes point file, input is read in batches so it may be memory mapped and larger than memory
+    :param positions: np.ndarray of shape (n, 3)
+    :param colors: uint8 np.ndarray of shape (n, 3) or (n, 4), None -> white
+    :param chunk_points: max points of chunk, average cell has about this many points
+    :param batch: points processed at once
+    """
+    n = len(positions)
+
+    low = np.full(3, np.inf)
+    high = np.full(3, -np.inf)
+    for start in range(0, n, batch):
+        p = np.asarray(positions[start:start + batch], dtype=np.float64)
+        low = np.minimum(low, p.min(axis=0))
+        high = np.maximum(high, p.max(axis=0))
+    if n == 0:
+        low = high = np.zeros(3)
+
+    dims = _grid(low, high, n / chunk_points)
+    counts = np.zeros(int(np.prod(dims)), dtype=np.int64)
+    for start in range(0, n, batch):
+        p = np.asarray(positions[start:start + batch], dtype=np.float64)
+        counts += np.bincount(_cell_ids(p, low, high, dims), minlength=len(counts))
+
+    cells = np.flatnonzero(counts)
+    cell_offsets = np.cumsum(counts) - counts
+
+    # full cells split into chunks of chunk_points
+    splits = (counts[cells] + chunk_points - 1) // chunk_points
+    chunks = np.zeros(int(splits.sum()), dtype=_CHUNK)
+    chunk_cell = np.repeat(cells, splits)
+    part = np.arange(len(chunks)) - np.repeat(np.cumsum(splits) - splits, splits)
+    chunks["offset"] = cell_offsets[chunk_cell] + part * chunk_points
+    chunks["count"] = np.minimum(counts[chunk_cell] - part * chunk_points, chunk_points)
+
+    header = np.array([(_MAGIC, len(chunks), chunk_points, n)], dtype=_HEADER)
+    data_offset = _HEADER.itemsize + _CHUNK.itemsize * len(chunks)
+
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.truncate(data_offset + POINT_DTYPE.itemsize * n)
+
+    if n:
+        out = np.memmap(tmp, dtype=POINT_DTYPE, mode="r+", offset=data_offset, shape=(n,))
+
+        # points scattered into their cells
+        cursor = cell_offsets.copy()
+        for start in range(0, n, batch):
+            p = np.asarray(positions[start:start + batch], dtype=np.float64)
+            c = None if colors is None else colors[start:start + batch]
+            ids = _cell_ids(p, low, high, dims)
+
+            order = np.argsort(ids, kind="stable")
+            batch_counts = np.bincount(ids, minlength=len(counts))
+            sorted_ids = ids[order]
+            group_start = np.cumsum(batch_counts) - batch_counts
+            dest = cursor[sorted_ids] + np.arange(len(ids)) - group_start[sorted_ids]
+
+            out[dest] = _records(p, c)[order]
+            cursor += batch_counts
+
+        # split cells sorted along longest axis first, their chunks are slabs instead of same box
+        for cell, count in zip(cells.tolist(), counts[cells].tolist()):
+            if chunk_points < count <= batch:
+                records = np.array(out[cell_offsets[cell]:cell_offsets[cell] + count])
+                axis = np.argmax(np.ptp(records["position"], axis=0))
+                out[cell_offsets[cell]:cell_offsets[cell] + count] = \
+                    records[np.argsort(records["position"][:, axis], kind="stable")]
+
+        for i, (offset, count) in enumerate(zip(chunks["offset"].tolist(), chunks["count"].tolist())):
+            p = out[offset:offset + count]["position"]
+            chunks["min"][i] = p.min(axis=0)
+            chunks["max"][i] = p.max(axis=0)
+
+        out.flush()
+        del out
+
+    with open(tmp, "r+b") as f:
+        f.write(header.tobytes())
+        f.write(chunks.tobytes())
+    os.replace(tmp, path)
+
+
+class PointFile:
+    """
+    memory mapped point file
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        header = np.frombuffer(self._mmap, dtype=_HEADER, count=1)[0]
+        if header["magic"] != _MAGIC:
+            raise Exception("Invalid point file {}".format(path))
+
+        self.chunk_points = int(header["chunk_points"])
+        self.points = int(header["points"])
+        # copy, table is small and read every frame
+        self.chunks = np.frombuffer(self._mmap, dtype=_CHUNK, count=int(header["chunks"]),
+                                    offset=_HEADER.itemsize).copy()
+        self.data_offset = _HEADER.itemsize + _CHUNK.itemsize * len(self.chunks)
+        self.records = np.frombuffer(self._mmap, dtype=POINT_DTYPE, count=self.points, offset=self.data_offset)
+
+    def __len__(self):
+        return len(self.chunks)
+
+    def chunk(self, i: int) -> np.ndarray:
+        """
+        point records of chunk, view into mapping
+        """
+        offset, count = int(self.chunks["offset"][i]), int(self.chunks["count"][i])
+        return self.records[offset:offset + count]
+
+    def release(self, i: int):
+        """
+        drops pages of chunk from process memory, they are read from file again when needed
+        """
+        if not hasattr(mmap, "MADV_DONTNEED"):
+            return
+        start = self.data_offset + int(self.chunks["offset"][i]) * POINT_DTYPE.itemsize
+        end = start + int(self.chunks["count"][i]) * POINT_DTYPE.itemsize
+        start -= start % mmap.PAGESIZE
+        self._mmap.madvise(mmap.MADV_DONTNEED, start, end - start)
+
+
+def frustum_planes(matrix: np.ndarray) -> np.ndarray:
+    """
+    clip planes of view_projection (Gribb / Hartmann), inside when dot(plane, (x, y, z, 1)) >= 0
+    :return: np.ndarray of shape (6, 4)
+    """
+    return np.array([matrix[3] + matrix[0], matrix[3] - matrix[0],
+                     matrix[3] + matrix[1], matrix[3] - matrix[1],
+                     matrix[3] + matrix[2], matrix[3] - matrix[2]])
+
+
+def boxes_in_frustum(box_min: np.ndarray, box_max: np.ndarray, matrix: np.ndarray) -> np.ndarray:
+    """
+    conservative frustum test of axis aligned boxes
+    :param box_min: np.ndarray of shape (n, 3)
+    :param box_max: np.ndarray of shape (n, 3)
+    :param matrix: view_projection of box space
+    :return: bool np.ndarray of shape (n,)
+    """
+    planes = frustum_planes(matrix)
+    # box corner furthest along plane normal
+    corner = np.where(planes[:, None, :3] > 0, box_max[None], box_min[None])
+    distance = (corner * planes[:, None, :3]).sum(axis=2) + planes[:, 3:4]
+    return (distance >= 0).all(axis=0)
+
+
+class ChunkPool:
+    """
+    one GPU buffer of equal slots, slot holds one chunk \n
+    set_ranges() selects slots drawn by next draw() as one glMultiDrawArrays
+    """
+
+    def __init__(self, slots: int, slot_points: int, setup_attrs, owner=None):
+        """
+        :param slots: count of slots
+        :param slot_points: points of slot
+        :param setup_attrs: callback setting attribute pointers, called with VAO and VBO bound
+        :param owner: object reported as buffers owner, see memory.MemoryTracker
+        """
+        self.slots = slots
+        self.slot_points = slot_points
+        self.slot_bytes = slot_points * POINT_DTYPE.itemsize
+
+        self.vao = glGenVertexArrays(1)
+        glBindVertexArray(self.vao)
+        TRACKER.register("vertex_array", self.vao, 0, owner)
+
+        self.vbo = glGenBuffers(1)
+        glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
+        glBufferData(GL_ARRAY_BUFFER, slots * self.slot_bytes, None, GL_DYNAMIC_DRAW)
+        TRACKER.register("buffer", self.vbo, slots * self.slot_bytes, owner)
+        setup_attrs()
+
+        glBindVertexArray(0)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+
+        self.firsts = np.zeros(0, dtype=np.int32)
+        self.counts = np.zeros(0, dtype=np.int32)
+
+    def upload(self, slot: int, records: np.ndarray):
+        glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
+        glBufferSubData(GL_ARRAY_BUFFER, slot * self.slot_bytes, records.nbytes, records)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+
+    def set_ranges(self, slots: np.ndarray, counts: np.ndarray):
+        self.firsts = np.ascontiguousarray(slots * self.slot_points, dtype=np.int32)
+        self.counts = np.ascontiguousarray(counts, dtype=np.int32)
+
+    def draw(self, mode, count, gl_type, vertex_count):
+        """
+        draws ranges of set_ranges, VAO must be bound. Index arguments are unused
+        """
+        if len(self.firsts):
+            glMultiDrawArrays(mode, self.firsts, self.counts, len(self.firsts))
+
+    def destroy(self):
+        glDeleteVertexArrays(1, (self.vao,))
+        glDeleteBuffers(1, (self.vbo,))
+        TRACKER.unregister("vertex_array", self.vao)
+        TRACKER.unregister("buffer", self.vbo)
+
+
+class PointCloud(Object3D):
+    """
+    point file drawn as GL_POINTS \n
+    each frame chunks are culled against view frustum, chunks in view are uploaded nearest first
+    into fixed GPU pool, least recently used ones are replaced. GPU memory is gpu_budget, CPU memory
+    is one frame of uploads, pages of uploaded chunks are released
+    """
+
+    def __init__(self, path: str, gpu_budget: int = 64 << 20, upload_budget: int = 8 << 20):
+        """
+        :param path: point file, see build_point_file
+        :param gpu_budget: bytes of GPU chunk pool
+        :param upload_budget: max bytes uploaded per frame, missing chunks appear over next frames
+        """
+        self.file = PointFile(path)
+        self.gpu_budget = gpu_budget
+        self.upload_budget = upload_budget
+
+        chunks = self.file.chunks
+        self.chunk_min = chunks["min"].astype(np.float64)
+        self.chunk_max = chunks["max"].astype(np.float64)
+        self.chunk_center = (self.chunk_min + self.chunk_max) / 2
+        self.bounds_center = (self.chunk_min.min(axis=0) + self.chunk_max.max(axis=0)) / 2 if len(chunks) \
+            else np.zeros(3)
+
+        # chunk -> slot, -1 not resident
+        self.chunk_slot = np.full(len(chunks), -1, dtype=np.int64)
+        self.pool = None
+        self.frame = 0
+
+        super(PointCloud, self).__init__()
+
+        self.vertex_format = POINTS
+
+        # stats of last frame
+        self.visible = 0
+        self.drawn_chunks = 0
+        self.drawn_points = 0
+        self.uploaded_bytes = 0
+
+    def set_verts(self):
+        return []
+
+    def set_edges(self):
+        return []
+
+    def set_surfs(self):
+        return []
+
+    def set_tex_coords(self):
+        return []
+
+    def calc_normals(self):
+        return np.zeros((0, 3))
+
+    def model_matrix(self) -> np.ndarray:
+        m = self.transform.matrix()
+        if self.parent_transform:
+            m = self.parent_transform.matrix() @ m
+        return m
+
+    def _create_pool(self):
+        slot_bytes = self.file.chunk_points * POINT_DTYPE.itemsize
+        slots = int(min(max(self.gpu_budget // slot_bytes, 1), max(len(self.file), 1)))
+        self.pool = ChunkPool(slots, self.file.chunk_points, lambda: self.material.apply_attrs(self.vertex_format),
+                              owner=self)
+        self._pool_material = self.material
+        # frame of last use per slot, -1 free
+        self.slot_used = np.full(slots, -1, dtype=np.int64)
+        self.slot_chunk = np.full(slots, -1, dtype=np.int64)
+
+    def release_buffers(self):
+        if self.pool is not None:
+            self.pool.destroy()
+            self.pool = None
+            self.chunk_slot[:] = -1
+
+    def stream(self, view_projection: np.ndarray):
+        """
+        culls chunks, uploads missing ones within budgets and selects drawn slots
+        :param view_projection: projection @ view matrix
+        """
+        if self.pool is None or self._pool_material is not self.material:
+            self.release_buffers()
+            self._create_pool()
+
+        self.frame += 1
+        model = self.model_matrix()
+        matrix = view_projection @ model
+
+        visible = np.flatnonzero(boxes_in_frustum(self.chunk_min, self.chunk_max, matrix))
+        depth = self.chunk_center[visible] @ matrix[3, :3] + matrix[3, 3]
+        self.visible = len(visible)
+        # nearest first, no more than pool holds
+        visible = visible[np.argsort(depth, kind="stable")][:self.pool.slots]
+
+        resident = self.chunk_slot[visible]
+        self.slot_used[resident[resident >= 0]] = self.frame
+
+        uploaded = 0
+        for chunk in visible[resident < 0].tolist():
+            if uploaded >= self.upload_budget:
+                break
+            slot = int(np.argmin(self.slot_used))
+            if self.slot_used[slot] == self.frame:
+                break
+
+            if self.slot_chunk[slot] >= 0:
+                self.chunk_slot[self.slot_chunk[slot]] = -1
+            records = self.file.chunk(chunk)
+            self.pool.upload(slot, records)
+            self.file.release(chunk)
+
+            self.chunk_slot[chunk] = slot
+            self.slot_chunk[slot] = chunk
+            self.slot_used[slot] = self.frame
+            uploaded += records.nbytes
+
+        drawn = visible[self.chunk_slot[visible] >= 0]
+        counts = self.file.chunks["count"][drawn]
+        self.pool.set_ranges(self.chunk_slot[drawn], counts)
+
+        self.uploaded_bytes = uploaded
+        self.drawn_chunks = len(drawn)
+        self.drawn_points = int(counts.sum())
+        # for queue depth sorting
+        self._center = model[:3, :3] @ self.bounds_center + model[:3, 3]
+
+    def submit(self, queue):
+        if self.material is None or len(self.file) == 0:
+            return False
+
+        model = self.model_matrix()
+        self.stream(queue.view_projection)
+        queue.submit(DrawItem(self.material, self.vertex_format, self.pool, POINTS_INDEX, self.drawn_points,
+                              queue.depth(self._center), model))
+        return True
+
+    def apply_material(self):
+        if self.material is None or len(self.file) == 0:
+            return False
+
+        projection = np.array(glGetFloatv(GL_PROJECTION_MATRIX), dtype=np.float64).reshape(4, 4).T
+        modelview = np.array(glGetFloatv(GL_MODELVIEW_MATRIX), dtype=np.float64).reshape(4, 4).T
+        model = self.model_matrix()
+        self.stream(projection @ modelview)
+
+        glUseProgram(self.material.shader)
+        try:
+            self.material.apply_uniform()
+            self.material.apply_model(model)
+            glBindVertexArray(self.pool.vao)
+            self.pool.draw(GL_POINTS, 0, None, self.drawn_points)
+        finally:
+            glBindVertexArray(0)
+            glUseProgram(0)
+        return True
+
+    def report(self):
+        return "chunks {}/{} visible {}, points {}, uploaded {:.1f} MB".format(
+            self.drawn_chunks, len(self.file), self.visible, self.drawn_points, self.uploaded_bytes / (1 << 20))
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="builds point file for PointCloud")
+    parser.add_argument("input", help=".npy of shape (n, 3) or raw float32 xyz file")
+    parser.add_argument("output", help="point file")
+    parser.add_argument("--colors", default=None, help=".npy of uint8 shape (n, 3) or (n, 4)")
+    parser.add_argument("--chunk-points", type=int, default=65536, help="max points of chunk")
+    args = parser.parse_args(argv)
+
+    if args.input.endswith(".npy"):
+        positions = np.load(args.input, mmap_mode="r")
+    else:
+        positions = np.memmap(args.input, dtype=np.float32, mode="r").reshape(-1, 3)
+    colors = np.load(args.colors, mmap_mode="r") if args.colors else None
+
+    build_point_file(positions, args.output, colors, args.chunk_points)
+
+    info = PointFile(args.output)
+    print("{} points in {} chunks".format(info.points, len(info)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,268 @@
+"""
+Batched curve rendering \n
+tessellated curves (vertexes of BezierCurve, NurbsCurve) and their control polygons packed into one
+vertex buffer, each curve is a range drawn as GL_LINE_STRIP. All curves are one glMultiDrawArrays,
+control polygons another one. Lines are widened to screen space width by geometry shader,
+see lightning.Polyline
+"""
+
+import numpy as np
+from OpenGL.GL import *
+
+from curves import points_array
+from indexing import IndexBuffer
+from memory import TRACKER
+from render_queue import DrawItem, RenderQueue
+from vertex_format import VertexAttribute, NORMAL_FLOAT32
+
+
+class LineFormat:
+    """
+    float32 positions only, attributes for MaterialBase.bind_vertex_format
+    """
+
+    def __init__(self):
+        self.attributes = {"position": VertexAttribute(3, GL_FLOAT, False, np.float32, 3)}
+        self.stride = 12
+        self.dtype = np.dtype([("position", np.float32, (3,))])
+        # no normals, see MaterialBase.apply_vertex_format
+        self.normal_encoding = NORMAL_FLOAT32
+
+
+POSITIONS = LineFormat()
+
+# strips are drawn without indexes, only mode is used
+LINE_STRIPS = IndexBuffer(np.zeros(0, dtype=np.uint32), GL_LINE_STRIP, GL_UNSIGNED_INT)
+
+
+def _global(curve, points: np.ndarray) -> np.ndarray:
+    points = curve.transform.apply(points)
+    if curve.parent_transform:
+        points = curve.parent_transform.apply(points)
+    return points
+
+
+def curve_polyline(curve) -> np.ndarray:
+    """
+    tessellated curve in global space
+    :return: np.ndarray of shape (n, 3)
+    """
+    return _global(curve, points_array(curve.vertexes).reshape(-1, 3))
+
+
+def control_polygon(curve) -> np.ndarray:
+    """
+    control points in global space
+    :return: np.ndarray of shape (n, 3)
+    """
+    return _global(curve, points_array(curve.control_points).reshape(-1, 3))
+
+
+def merge_ranges(ranges: list[tuple[int, int]], merge_gap: int = 256, max_ranges: int = 64):
+    """
+    sorted union of byte ranges, ranges closer than merge_gap are merged
+    :param max_ranges: more ranges -> one covering range
+    """
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start - merged[-1][1] <= merge_gap:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+
+    if len(merged) > max_ranges:
+        return [(merged[0][0], merged[-1][1])]
+    return merged
+
+
+class LineRanges:
+    """
+    VAO over vertex buffer of CurveBatch for one program, draws set ranges with glMultiDrawArrays
+    """
+
+    def __init__(self, vbo, setup_attrs, owner=None):
+        """
+        :param vbo: shared vertex buffer
+        :param setup_attrs: callback setting attribute pointers, called with VAO and VBO bound
+        :param owner: object reported as VAO owner, see memory.MemoryTracker
+        """
+        self.vao = glGenVertexArrays(1)
+        glBindVertexArray(self.vao)
+        TRACKER.register("vertex_array", self.vao, 0, owner)
+
+        glBindBuffer(GL_ARRAY_BUFFER, vbo)
+        setup_attrs()
+
+        glBindVertexArray(0)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+
+        self.firsts = np.zeros(0, dtype=np.int32)
+        self.counts = np.zeros(0, dtype=np.int32)
+
+    def set_ranges(self, firsts: np.ndarray, counts: np.ndarray):
+        self.firsts = np.ascontiguousarray(firsts, dtype=np.int32)
+        self.counts = np.ascontiguousarray(counts, dtype=np.int32)
+
+    def draw(self, mode, count, gl_type, vertex_count):
+        """
+        draws ranges of set_ranges, VAO must be bound. Index arguments are unused
+        """
+        if len(self.firsts):
+            glMultiDrawArrays(mode, self.firsts, self.counts, len(self.firsts))
+
+    def destroy(self):
+        glDeleteVertexArrays(1, (self.vao,))
+        TRACKER.unregister("vertex_array", self.vao)
+
+
+class CurveBatch:
+    """
+    curves drawn together: polylines of all curves first, control polygons after them in one vertex buffer \n
+    curves whose vertexes, control points or transforms changed are passed to update(),
+    only their ranges are uploaded on next draw
+    """
+
+    def __init__(self, curves: list, material=None, control_material=None, show_control: bool = False):
+        """
+        :param curves: objects with vertexes (polyline) and control_points, BezierCurve / NurbsCurve
+        :param material: lightning.Polyline of curves
+        :param control_material: lightning.Polyline of control polygons
+        :param show_control: draw control polygons
+        """
+        self.curves = list(curves)
+        self.material = material
+        self.control_material = control_material
+        self.show_control = show_control
+
+        self._slot = {id(curve): i for i, curve in enumerate(self.curves)}
+        self._pack()
+
+        self.vbo = None
+        self._capacity = 0
+        # "curves" | "control" -> (LineRanges, material)
+        self._views = {}
+
+        # stats of last prepare
+        self.uploaded_bytes = 0
+        self.upload_calls = 0
+
+    def _pack(self):
+        lines = [curve_polyline(c) for c in self.curves]
+        control = [control_polygon(c) for c in self.curves]
+
+        counts = np.array([len(p) for p in lines + control], dtype=np.int64)
+        firsts = np.cumsum(counts) - counts
+        n = len(self.curves)
+
+        self.line_firsts, self.line_counts = firsts[:n], counts[:n]
+        self.control_firsts, self.control_counts = firsts[n:], counts[n:]
+        self.data = np.concatenate(lines + control).astype(np.float32) if n else np.zeros((0, 3), np.float32)
+
+        self._full_upload = True
+        self._dirty = []
+
+    def __len__(self):
+        return len(self.curves)
+
+    def update(self, curve):
+        """
+        re-reads curve polyline and control polygon, range is uploaded on next draw.
+        Changed vertex count repacks whole batch
+        """
+        i = self._slot[id(curve)]
+        line = curve_polyline(curve)
+        control = control_polygon(curve)
+
+        if len(line) != self.line_counts[i] or len(control) != self.control_counts[i]:
+            self._pack()
+            return
+
+        for first, points in ((self.line_firsts[i], line), (self.control_firsts[i], control)):
+            self.data[first:first + len(points)] = points
+            self._dirty.append((first * POSITIONS.stride, (first + len(points)) * POSITIONS.stride))
+
+    def prepare(self):
+        """
+        uploads packed data or dirty ranges, creates vertex buffer on first use
+        """
+        self.uploaded_bytes = 0
+        self.upload_calls = 0
+
+        if self.vbo is None:
+            self.vbo = glGenBuffers(1)
+
+        glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
+        if self._full_upload:
+            # same buffer name, VAOs stay valid
+            glBufferData(GL_ARRAY_BUFFER, max(self.data.nbytes, 12), None, GL_DYNAMIC_DRAW)
+            if self.data.nbytes:
+                glBufferSubData(GL_ARRAY_BUFFER, 0, self.data.nbytes, self.data)
+            TRACKER.register("buffer", self.vbo, self.data.nbytes, self, "CurveBatch")
+            self.uploaded_bytes += self.data.nbytes
+            self.upload_calls += 1
+        else:
+            raw = self.data.reshape(-1).view(np.uint8)
+            for start, end in merge_ranges(self._dirty):
+                glBufferSubData(GL_ARRAY_BUFFER, start, end - start, raw[start:end])
+                self.uploaded_bytes += end - start
+                self.upload_calls += 1
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+
+        self._full_upload = False
+        self._dirty = []
+
+    def _view(self, kind: str, material) -> LineRanges:
+        view = self._views.get(kind)
+        if view is None or view[1] is not material:
+            if view is not None:
+                view[0].destroy()
+            view = (LineRanges(self.vbo, lambda: material.apply_attrs(POSITIONS), owner=self), material)
+            self._views[kind] = view
+        return view[0]
+
+    def submit(self, queue):
+        """
+        adds draw items of curves (and control polygons) into render queue
+        :param queue: render_queue.RenderQueue
+        """
+        if self.material is None or not self.curves:
+            return False
+
+        self.prepare()
+
+        curves = self._view("curves", self.material)
+        curves.set_ranges(self.line_firsts, self.line_counts)
+        queue.submit(DrawItem(self.material, POSITIONS, curves, LINE_STRIPS, 0))
+
+        if self.show_control and self.control_material is not None:
+            control = self._view("control", self.control_material)
+            control.set_ranges(self.control_firsts, self.control_counts)
+            queue.submit(DrawItem(self.control_material, POSITIONS, control, LINE_STRIPS, 0))
+
+        return True
+
+    def draw(self, queue=None):
+        """
+        :param queue: RenderQueue, None -> draw immediately
+        """
+        if queue is not None:
+            self.submit(queue)
+            return
+
+        queue = RenderQueue()
+        queue.begin_frame()
+        self.submit(queue)
+        queue.flush()
+
+    def destroy(self):
+        for view, _ in self._views.values():
+            view.destroy()
+        self._views = {}
+        if self.vbo is not None:
+            glDeleteBuffers(1, (self.vbo,))
+            TRACKER.unregister("buffer", self.vbo)
+            self.vbo = None
+
+    def report(self):
+        return "curves {}, vertexes {}, uploaded {} bytes in {} calls".format(
+            len(self.curves), len(self.data), self.uploaded_bytes, self.upload_calls)
@@ -0,0 +1,171 @@
+"""
+Offline batch rendering of demo scene animation \n
+    python render_batch.py --end 10000 [--start 0] [--fps 60] [--processes N] [--out renders] \n
+frame range is split into chunks rendered by process pool, each worker has own headless GL context.
+Existing frames are skipped, interrupted runs continue where they stopped
+"""
+
+import argparse
+import multiprocessing
+import os
+import sys
+import time
+
+SCENE_FILE = "demo_scene.json"
+
+# worker process state: context, scene, settings
+_worker = {}
+
+
+def frame_path(out_dir: str, frame: int, fmt: str) -> str:
+    return os.path.join(out_dir, "frame_{:06d}.{}".format(frame, fmt))
+
+
+def pending_frames(out_dir: str, start: int, end: int, fmt: str) -> list[int]:
+    """
+    frames of range without output file, files are renamed into place only when complete
+    """
+    done = set(os.listdir(out_dir)) if os.path.isdir(out_dir) else set()
+    return [f for f in range(start, end) if os.path.basename(frame_path(out_dir, f, fmt)) not in done]
+
+
+def chunks(frames: list[int], size: int) -> list[list[int]]:
+    return [frames[i:i + size] for i in range(0, len(frames), size)]
+
+
+def _init_worker(settings: dict):
+    if settings["single_threaded"]:
+        # one process per core, rasterizer and BLAS threads would oversubscribe it
+        os.environ.setdefault("LP_NUM_THREADS", "1")
+        os.environ.setdefault("OMP_NUM_THREADS", "1")
+        os.environ.setdefault("OPENBLAS_NUM_THREADS", "1")
+
+    # before any OpenGL import
+    from headless import HeadlessContext
+
+    context = HeadlessContext(settings["width"], settings["height"])
+
+    from demo import curve_batch, setup_view
+    from render_queue import RenderQueue
+    from scene import load as load_scene
+
+    camera = setup_view(settings["width"], settings["height"])
+
+    scene = load_scene(settings["scene"], settings["quality"])
+    scene.create_materials()
+    if settings["light"] is not None:
+        # BRDF keeps reference to position list
+        scene["light_cube"].transform.position[:] = settings["light"]
+    _worker.update(context=context, scene=scene, camera=camera, curves=curve_batch(scene), queue=RenderQueue(),
+                   settings=settings)
+
+
+def render_frame(frame: int):
+    """
+    renders one frame of animation in worker context
+    :return: np.ndarray of shape (height, width, 4), bottom row first
+    """
+    import numpy as np
+    from OpenGL.GL import glClear, glClearColor, glLightfv, glFinish, GL_COLOR_BUFFER_BIT, GL_DEPTH_BUFFER_BIT, \
+        GL_LIGHT0, GL_POSITION
+
+    from demo import anim_position
+    from geometrix import Transform
+
+    scene, queue, camera, settings = _worker["scene"], _worker["queue"], _worker["camera"], _worker["settings"]
+    surface = scene["bsSurface"]
+    light_cube = scene["light_cube"]
+
+    # same clock as main.py: milliseconds since start, offset drawn as Model uniform
+    surface.welded.model_transform = Transform(position=anim_position(scene["anim_curve"],
+                                                                      frame * 1000 / settings["fps"]))
+    glLightfv(GL_LIGHT0, GL_POSITION, light_cube.transform.position)
+
+    glClearColor(0.1, 0.1, 0.1, 1)
+    glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
+
+    queue.begin_frame(camera.view_projection)
+    for lighting in scene.lightings.values():
+        lighting.update(camera.view_projection, np.identity(4), camera.viewport)
+    surface.draw_all(queue)
+    light_cube.draw(queue=queue)
+    _worker["curves"].submit(queue)
+    queue.flush()
+    glFinish()
+
+    return _worker["context"].read_pixels()
+
+
+def _render_chunk(frames: list[int]) -> int:
+    from capture import encode_frame
+
+    settings = _worker["settings"]
+    for frame in frames:
+        path = frame_path(settings["out"], frame, settings["format"])
+        # same extension, encoders pick format by it
+        tmp = frame_path(settings["out"], frame, "tmp." + settings["format"])
+        encode_frame(render_frame(frame), tmp, settings["format"])
+        # complete files only, see pending_frames
+        os.replace(tmp, path)
+    return len(frames)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="offline batch rendering of demo scene animation")
+    parser.add_argument("--scene", default=SCENE_FILE, help="scene file")
+    parser.add_argument("--start", type=int, default=0, help="first frame")
+    parser.add_argument("--end", type=int, required=True, help="frame after last one")
+    parser.add_argument("--fps", type=float, default=60, help="frames per second of animation clock")
+    parser.add_argument("--out", default="renders", help="output directory")
+    parser.add_argument("--format", default="png", choices=("png", "raw"), help="frame file format")
+    parser.add_argument("--width", type=int, default=800)
+    parser.add_argument("--height", type=int, default=600)
+    parser.add_argument("--quality", type=int, default=None, help="overrides scene quality")
+    parser.add_argument("--light", type=float, nargs=3, default=None, help="light position, default from scene")
+    parser.add_argument("--processes", type=int, default=os.cpu_count(), help="worker processes, default all cores")
+    parser.add_argument("--chunk", type=int, default=25, help="frames per task")
+    args = parser.parse_args(argv)
+
+    os.makedirs(args.out, exist_ok=True)
+    # leftovers of interrupted writes
+    for name in os.listdir(args.out):
+        if ".tmp." in name:
+            os.remove(os.path.join(args.out, name))
+
+    frames = pending_frames(args.out, args.start, args.end, args.format)
+    total = args.end - args.start
+    print("{} of {} frames to render, {} processes".format(len(frames), total, args.processes))
+    if not frames:
+        return 0
+
+    settings = {
+        "scene": os.path.abspath(args.scene),
+        "out": os.path.abspath(args.out),
+        "format": args.format,
+        "width": args.width,
+        "height": args.height,
+        "quality": args.quality,
+        "fps": args.fps,
+        "light": args.light,
+        "single_threaded": args.processes > 1,
+    }
+
+    tasks = chunks(frames, args.chunk)
+    start = time.perf_counter()
+    rendered = 0
+
+    # spawn: workers start without parent GL / EGL state
+    with multiprocessing.get_context("spawn").Pool(args.processes, _init_worker, (settings,)) as pool:
+        for count in pool.imap_unordered(_render_chunk, tasks):
+            rendered += count
+            elapsed = time.perf_counter() - start
+            rate = rendered / elapsed
+            print("\r{}/{} frames, {:.1f} fps, eta {:.0f} s".format(
+                rendered, len(frames), rate, (len(frames) - rendered) / rate), end="", flush=True)
+    print()
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
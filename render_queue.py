@@ -0,0 +1,188 @@
+import numpy as np
+from OpenGL.GL import *
+
+
+class DrawItem:
+    """
+    one indexed draw call with state it needs
+    """
+
+    def __init__(self, material, vertex_format, buffers, index_buffer, vertex_count, depth=0.0, model=None):
+        """
+        :param material: MaterialBase, defines program, uniforms and texture
+        :param vertex_format: VertexFormat of vertex data
+        :param buffers: buffers.MeshBuffers
+        :param index_buffer: indexing.IndexBuffer
+        :param vertex_count: vertexes count (base vertex of streamed slots)
+        :param depth: view depth of object center
+        :param model: 4x4 matrix of Model uniform, None -> identity
+        """
+        self.material = material
+        self.vertex_format = vertex_format
+        self.buffers = buffers
+        self.index_buffer = index_buffer
+        self.vertex_count = vertex_count
+        self.depth = depth
+        self.model = model
+
+        self.program = material.shader
+        self.texture = material.texture.texture if material.texture is not None else 0
+        self.vao = buffers.vao
+        self.blended = material.blended
+
+    def sort_key(self):
+        if self.blended:
+            # back to front
+            return -self.depth, self.program, self.texture, self.vao
+        # state first, then front to back
+        return self.program, self.texture, self.vao, self.depth
+
+
+class RenderQueue:
+    """
+    collects draw items during frame, flush() sorts them and skips redundant binds \n
+    opaque items are drawn first, alpha blended items after them with depth writes disabled
+    """
+
+    def __init__(self):
+        self.items = []
+        self.view_projection = np.identity(4)
+        self.stats = self._empty_stats()
+        # GL_BLEND outside of flush, read on first flush, changes by other code are not seen
+        self.blend = None
+
+    @staticmethod
+    def _empty_stats():
+        return {
+            "items": 0,
+            "program_binds": 0,
+            "texture_binds": 0,
+            "vao_binds": 0,
+            "uniform_updates": 0,
+            "redundant_skipped": 0,
+        }
+
+    def begin_frame(self, view_projection: np.ndarray = None):
+        """
+        :param view_projection: matrix used for item depth, None -> current GL matrices
+        """
+        if view_projection is None:
+            projection = np.array(glGetFloatv(GL_PROJECTION_MATRIX), dtype=np.float64).reshape(4, 4).T
+            modelview = np.array(glGetFloatv(GL_MODELVIEW_MATRIX), dtype=np.float64).reshape(4, 4).T
+            view_projection = projection @ modelview
+        self.view_projection = view_projection
+        self.items = []
+
+    def depth(self, center) -> float:
+        """
+        clip space w of point, distance along view direction for perspective projection
+        """
+        return float(self.view_projection[3, :3] @ center + self.view_projection[3, 3])
+
+    def submit(self, item: DrawItem):
+        self.items.append(item)
+
+    def flush(self):
+        """
+        draws submitted items
+        :return: frame stats
+        """
+        stats = self._empty_stats()
+        stats["items"] = len(self.items)
+
+        opaque = sorted((i for i in self.items if not i.blended), key=DrawItem.sort_key)
+        blended = sorted((i for i in self.items if i.blended), key=DrawItem.sort_key)
+
+        if self.blend is None:
+            self.blend = bool(glIsEnabled(GL_BLEND))
+
+        state = {"program": None, "texture": None, "vao": None, "uniforms": None, "restart": None, "model": None,
+                 "blend": self.blend}
+
+        if opaque:
+            self._set_blend(state, False)
+            self._draw_pass(opaque, state, stats)
+
+        if blended:
+            self._set_blend(state, True)
+            glDepthMask(GL_FALSE)
+            self._draw_pass(blended, state, stats)
+            glDepthMask(GL_TRUE)
+
+        self._set_blend(state, self.blend)
+
+        if state["restart"]:
+            glDisable(GL_PRIMITIVE_RESTART)
+        glBindVertexArray(0)
+        glUseProgram(0)
+
+        self.items = []
+        self.stats = stats
+        return stats
+
+    @staticmethod
+    def _set_blend(state, enabled: bool):
+        if state["blend"] != enabled:
+            if enabled:
+                glEnable(GL_BLEND)
+            else:
+                glDisable(GL_BLEND)
+            state["blend"] = enabled
+
+    @staticmethod
+    def _draw_pass(items, state, stats):
+        for item in items:
+            if item.program != state["program"]:
+                glUseProgram(item.program)
+                state["program"] = item.program
+                state["uniforms"] = None
+                state["model"] = None
+                stats["program_binds"] += 1
+            else:
+                stats["redundant_skipped"] += 1
+
+            # uniforms stay in program, set once per material and vertex format
+            uniforms = (id(item.material), id(item.vertex_format))
+            if uniforms != state["uniforms"]:
+                item.material.apply_uniform()
+                item.material.apply_vertex_format(item.vertex_format)
+                state["uniforms"] = uniforms
+                stats["uniform_updates"] += 1
+
+            # per item, b"" is identity
+            model = item.model.tobytes() if item.model is not None else b""
+            if model != state["model"] and item.material.Model_loc not in (None, -1):
+                item.material.apply_model(item.model)
+                state["model"] = model
+                stats["uniform_updates"] += 1
+
+            if item.texture != state["texture"]:
+                glActiveTexture(GL_TEXTURE0)
+                glBindTexture(GL_TEXTURE_2D, item.texture)
+                state["texture"] = item.texture
+                stats["texture_binds"] += 1
+            else:
+                stats["redundant_skipped"] += 1
+
+            if item.vao != state["vao"]:
+                glBindVertexArray(item.vao)
+                state["vao"] = item.vao
+                stats["vao_binds"] += 1
+            else:
+                stats["redundant_skipped"] += 1
+
+            index_buffer = item.index_buffer
+            restart = index_buffer.restart_index
+            if restart != state["restart"]:
+                if restart is None:
+                    glDisable(GL_PRIMITIVE_RESTART)
+                else:
+                    glEnable(GL_PRIMITIVE_RESTART)
+                    glPrimitiveRestartIndex(restart)
+                state["restart"] = restart
+
+            item.buffers.draw(index_buffer.mode, len(index_buffer), index_buffer.gl_type, item.vertex_count)
+
+    def report(self):
+        return "items {items}, program {program_binds}, texture {texture_binds}, vao {vao_binds}, " \
+               "uniforms {uniform_updates}, skipped {redundant_skipped}".format(**self.stats)
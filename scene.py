@@ -0,0 +1,315 @@
+"""
+Scene file: JSON description + optional .npz companion with large arrays
+
+{
+  "quality": 10,                       default quality
+  "arrays": "scene.npz",               companion file, relative to JSON file
+  "curves": {
+    name: {"points": [[a, b], ...], "plane": "xz", "depth": 8}      2d points on plane
+    name: {"points": [[x, y, z], ...], "weights": [...]}            3d points
+    name: {"array": key}                                            points from companion
+    name: {"type": "nurbs", "points": ..., "knots": [...], "degree": 3}
+  },
+  "curve_sets": {                      many curves of same degree
+    name: {"array": key, "weights": key}                            array of shape (curves, points, 3)
+  },
+  "surfaces": {
+    name: {"curves": [curve names], "last": true, "count": 0, "quality": 10, "transform": {...}}
+  },
+  "patch_sets": {                      bulk BezierSurface definitions for tessellation.tessellate_all
+    name: {"array": key, "weights": key, "quality": 10, "last": true}    array of shape (patches, curves, points, 3)
+  },
+  "objects": {
+    name: {"type": "Cube3D", "transform": {...}, "material": material name}
+    name: {"type": "PointCloud", "path": "cloud.pcl", "gpu_budget": bytes, "upload_budget": bytes}
+                                                                    path relative to JSON file
+  },
+  "composed": {
+    name: {"objects": [names], "transform": {...}, "weld": false, "material": material name}
+  },
+  "materials": {
+    name: {"type": "Glass", "opacity": 1.0} | {"type": "BRDF", "light": object name, "color": [r, g, b, a]}
+        | {"type": "DefaultMaterial", "color": [r, g, b, a]} | {"type": "PointMaterial", "point_size": 2}
+        | {"type": "ClusteredBRDF", "color": [r, g, b, a], "grid": {"tiles_x": 16, ...},
+           "lights": {"count": 200, "bounds": [[x, y, z], [x, y, z]], "radius": [1, 4], "seed": 0}
+                   | {"positions": [[x, y, z], ...], "colors": [...], "radii": [...], "intensities": [...]}}
+    any material: "blended": true | false    drawn after opaque ones, default by type (Glass blended)
+  }
+}
+
+transform: {"position": [x, y, z], "rotation": [x, y, z], "size": [x, y, z]}
+"""
+
+import json
+import os
+import time
+
+import numpy as np
+
+from curves import BezierCurve, BezierSurface, NurbsCurve
+from geometrix import Point, Composed, Cube3D, Transform
+from tessellation import Patch
+
+
+PRIMITIVES = {
+    "Cube3D": Cube3D,
+}
+
+
+class Scene:
+    """
+    objects loaded from scene file, by kind and name
+    """
+
+    def __init__(self):
+        self.curves = {}
+        self.curve_sets = {}
+        self.surfaces = {}
+        self.patch_sets = {}
+        self.objects = {}
+        self.composed = {}
+        self.materials = {}
+
+        # material specs and their targets, created by create_materials once GL context exists
+        self.material_specs = {}
+        self.material_targets = {}
+
+        # lights.ClusteredLighting of clustered materials, update() once per frame
+        self.lightings = {}
+
+    def __getitem__(self, name):
+        for group in (self.composed, self.objects, self.surfaces, self.curves, self.curve_sets, self.patch_sets):
+            if name in group:
+                return group[name]
+        raise KeyError(name)
+
+    def __contains__(self, name):
+        try:
+            self[name]
+        except KeyError:
+            return False
+        return True
+
+    def named_objects(self) -> dict:
+        """
+        drawable objects by name, welded meshes as <composed name>.welded
+        """
+        result = {}
+        for group in (self.curves, self.surfaces, self.objects):
+            result.update(group)
+        for name, composed in self.composed.items():
+            if composed.welded is not None:
+                result[name + ".welded"] = composed.welded
+        return result
+
+    def create_materials(self, timings: list = None):
+        """
+        compiles materials and assigns them to objects, needs GL context
+        :param timings: list collecting ("materials", name, seconds) of each material
+        :return: dict of materials
+        """
+        import lightning
+
+        for name, spec in self.material_specs.items():
+            start = time.perf_counter()
+            kind = spec.get("type", "DefaultMaterial")
+
+            if kind == "Glass":
+                material = lightning.Glass(spec.get("opacity", 1.0))
+            elif kind == "BRDF":
+                light = self[spec["light"]].transform.position if "light" in spec else [10, 10, 10]
+                material = lightning.BRDF(light, spec.get("color", [1, 1, 1, 1]))
+            elif kind == "ClusteredBRDF":
+                from lights import ClusteredLighting, ClusterGrid
+
+                self.lightings[name] = ClusteredLighting(_light_set(spec.get("lights", {})),
+                                                         ClusterGrid(**spec.get("grid", {})))
+                material = lightning.ClusteredBRDF(self.lightings[name], spec.get("color", [1, 1, 1, 1]))
+            elif kind == "DefaultMaterial":
+                material = lightning.DefaultMaterial(spec.get("color", [1, 1, 1, 1]))
+            elif kind == "PointMaterial":
+                material = lightning.PointMaterial(spec.get("point_size", 2.0))
+            else:
+                raise Exception("Invalid material type {}".format(kind))
+
+            # drawn in blended pass of render queue, default by material type
+            if "blended" in spec:
+                material.blended = spec["blended"]
+
+            self.materials[name] = material
+            _timed(timings, "materials", name, start)
+
+        for target, name in self.material_targets.items():
+            obj = self[target]
+            if isinstance(obj, Composed):
+                obj.set_material_all(self.materials[name])
+            else:
+                obj.material = self.materials[name]
+
+        return self.materials
+
+
+def _timed(timings: list | None, group: str, name: str, start: float):
+    if timings is not None:
+        timings.append((group, name, time.perf_counter() - start))
+
+
+def _light_set(spec: dict):
+    from lights import LightSet
+
+    if "count" in spec:
+        return LightSet.random(spec["count"], spec.get("bounds", [[-10, -10, -10], [10, 10, 10]]),
+                               spec.get("radius", [1.0, 4.0]), spec.get("seed", 0))
+    return LightSet(spec.get("positions"), spec.get("colors"), spec.get("radii"), spec.get("intensities"))
+
+
+def _transform(spec: dict | None) -> Transform:
+    spec = spec or {}
+    return Transform(position=list(spec.get("position", [0, 0, 0])),
+                     rotation=list(spec.get("rotation", [0, 0, 0])),
+                     size=list(spec.get("size", [1, 1, 1])))
+
+
+def _set_transform(obj, spec: dict | None):
+    if spec:
+        t = _transform(spec)
+        obj.transform.position = t.position
+        obj.transform.rotation = t.rotation
+        obj.transform.size = t.size
+
+
+def _points(spec: dict, arrays) -> np.ndarray:
+    if "array" in spec:
+        points = np.asarray(arrays[spec["array"]], dtype=np.float64)
+    else:
+        points = np.asarray(spec["points"], dtype=np.float64)
+
+    if points.shape[-1] == 2:
+        plane = spec.get("plane", "xy")
+        a, b = points[..., 0], points[..., 1]
+        depth = np.full_like(a, spec.get("depth", 0))
+        # same axes as Point(a, b, plane, depth)
+        axes = {"xy": (a, b, depth), "xz": (a, depth, b), "yz": (depth, a, b)}
+        if plane not in axes:
+            raise Exception("Invalid surface type")
+        points = np.stack(axes[plane], axis=-1)
+
+    return points
+
+
+def _weights(spec: dict, arrays):
+    w = spec.get("weights")
+    if w is None:
+        return None
+    if isinstance(w, str):
+        return np.asarray(arrays[w], dtype=np.float64)
+    return np.asarray(w, dtype=np.float64)
+
+
+def _override_quality(doc: dict, quality: int):
+    doc["quality"] = quality
+    for group in ("curves", "curve_sets", "surfaces", "patch_sets"):
+        for spec in doc.get(group, {}).values():
+            spec.pop("quality", None)
+
+
+def load(path: str, quality: int = None, timings: list = None) -> Scene:
+    """
+    loads scene file
+    :param path: JSON scene file
+    :param quality: overrides all quality values of file
+    :param timings: list collecting (group, name, seconds) of each created object, see perf.py startup
+    :return: Scene
+    """
+    start = time.perf_counter()
+    with open(path, "r") as f:
+        doc = json.load(f)
+
+    arrays = {}
+    if "arrays" in doc:
+        arrays = np.load(os.path.join(os.path.dirname(path), doc["arrays"]))
+    _timed(timings, "file", os.path.basename(path), start)
+
+    if quality is not None:
+        _override_quality(doc, quality)
+    quality = doc.get("quality", 10)
+    scene = Scene()
+
+    for name, spec in doc.get("curves", {}).items():
+        start = time.perf_counter()
+        points = [Point.from_list(p) for p in _points(spec, arrays).tolist()]
+        weights = _weights(spec, arrays)
+        q = spec.get("quality", quality)
+
+        if spec.get("type", "bezier") == "nurbs":
+            curve = NurbsCurve(points, weights, spec.get("knots"), spec.get("degree", 3), quality=q)
+        else:
+            curve = BezierCurve(points, weights, quality=q)
+        _set_transform(curve, spec.get("transform"))
+        scene.curves[name] = curve
+        _timed(timings, "curves", name, start)
+
+    for name, spec in doc.get("curve_sets", {}).items():
+        start = time.perf_counter()
+        # control points stay array rows, no Point objects
+        points = _points(spec, arrays)
+        weights = _weights(spec, arrays)
+        q = spec.get("quality", quality)
+        scene.curve_sets[name] = [BezierCurve(points[i], None if weights is None else weights[i], quality=q)
+                                  for i in range(len(points))]
+        _timed(timings, "curve_sets", name, start)
+
+    for name, spec in doc.get("surfaces", {}).items():
+        start = time.perf_counter()
+        curves = [scene.curves[c] for c in spec["curves"]]
+        surface = BezierSurface(curves, quality=spec.get("quality", quality),
+                                count=spec.get("count", 0), last=spec.get("last", True))
+        _set_transform(surface, spec.get("transform"))
+        scene.surfaces[name] = surface
+        _timed(timings, "surfaces", name, start)
+
+    for name, spec in doc.get("patch_sets", {}).items():
+        start = time.perf_counter()
+        points = _points(spec, arrays)
+        weights = _weights(spec, arrays)
+        if weights is None:
+            weights = np.ones(points.shape[:-1])
+        q = spec.get("quality", quality)
+        count = spec.get("count", 0)
+        last = spec.get("last", True)
+        scene.patch_sets[name] = [Patch(points[i], q, count, last, weights[i]) for i in range(len(points))]
+        _timed(timings, "patch_sets", name, start)
+
+    for name, spec in doc.get("objects", {}).items():
+        start = time.perf_counter()
+        kind = spec.get("type")
+        if kind == "PointCloud":
+            from pointcloud import PointCloud
+
+            budgets = {key: spec[key] for key in ("gpu_budget", "upload_budget") if key in spec}
+            obj = PointCloud(os.path.join(os.path.dirname(path), spec["path"]), **budgets)
+        elif kind in PRIMITIVES:
+            obj = PRIMITIVES[kind]()
+        else:
+            raise Exception("Invalid object type {}".format(kind))
+        _set_transform(obj, spec.get("transform"))
+        scene.objects[name] = obj
+        _timed(timings, "objects", name, start)
+
+    for name, spec in doc.get("composed", {}).items():
+        start = time.perf_counter()
+        composed = Composed([scene[o] for o in spec["objects"]])
+        _set_transform(composed, spec.get("transform"))
+        if spec.get("weld", False):
+            composed.weld(spec.get("tolerance", 1e-6))
+        scene.composed[name] = composed
+        _timed(timings, "composed", name, start)
+
+    for group in ("objects", "composed"):
+        for name, spec in doc.get(group, {}).items():
+            if "material" in spec:
+                scene.material_targets[name] = spec["material"]
+
+    scene.material_specs = doc.get("materials", {})
+
+    return scene
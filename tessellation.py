@@ -0,0 +1,154 @@
+import os
+from multiprocessing import Pool, shared_memory
+
+import numpy as np
+
+from curves import BezierSurface, grid_indices, points_array, surface_grid
+
+
+class Patch:
+    """
+    Plain BezierSurface definition \n
+    control points of generating curves as np arrays, cheap to send to worker processes
+    """
+
+    def __init__(self, curves: list[np.ndarray], quality: int = 10, count: int = 0, last: bool = True,
+                 weights: list[np.ndarray] = None):
+        """
+        :param curves: control points of generating curves, each of shape (n, 3)
+        :param quality: generated curves quality
+        :param count: secondary curves count. non-positive value: count = len(curves)
+        :param last: create last curve
+        :param weights: control points weights of generating curves. None -> polynomial curves
+        """
+        self.curves = [np.asarray(c, dtype=np.float64).reshape(-1, 3) for c in curves]
+        if weights is None:
+            weights = [np.ones(len(c)) for c in self.curves]
+        self.weights = [np.asarray(w, dtype=np.float64) for w in weights]
+        self.quality = quality
+        self.count = count
+        self.last = last
+
+    @staticmethod
+    def from_surface(surface: BezierSurface):
+        curves = [points_array(curve.control_points) for curve in surface.curves]
+        weights = [curve.weights for curve in surface.curves]
+        return Patch(curves, surface.quality, surface.count, surface.last, weights)
+
+    def secondary_count(self):
+        if self.count > 0:
+            return self.count
+        return len(self.curves) + 1 if self.last else len(self.curves)
+
+    def vertex_count(self):
+        return self.secondary_count() * (self.quality + 1)
+
+    def triangle_count(self):
+        return 2 * max(self.secondary_count() - 1, 0) * self.quality
+
+
+def tessellate(patch: Patch):
+    """
+    serial tessellation of one patch, normals are analytic as in BezierSurface.calc_normals
+    :return: (vertexes, normals, indices)
+    """
+    secondary_count = patch.secondary_count()
+    vertexes, normals = surface_grid(patch.curves, patch.weights, secondary_count, patch.quality)
+    indices = grid_indices(secondary_count, patch.quality)
+
+    return vertexes, normals, indices
+
+
+class TessellationResult:
+    """
+    tessellated patches packed into contiguous arrays \n
+    indices are local to each patch
+    """
+
+    def __init__(self, vertexes, normals, indices, vertex_offsets, index_offsets):
+        self.vertexes = vertexes
+        self.normals = normals
+        self.indices = indices
+        self.vertex_offsets = vertex_offsets
+        self.index_offsets = index_offsets
+
+    def __len__(self):
+        return len(self.vertex_offsets) - 1
+
+    def __getitem__(self, i):
+        vs = slice(self.vertex_offsets[i], self.vertex_offsets[i + 1])
+        ts = slice(self.index_offsets[i], self.index_offsets[i + 1])
+        return self.vertexes[vs], self.normals[vs], self.indices[ts]
+
+
+# worker side shared buffers, set by _init_worker
+_shared = {}
+
+
+def _init_worker(names, vertex_total, triangle_total):
+    # pool workers share owner's resource tracker, owner unlinks blocks
+    blocks = [shared_memory.SharedMemory(name=name) for name in names]
+    _shared["blocks"] = blocks
+    _shared["vertexes"] = np.ndarray((vertex_total, 3), dtype=np.float64, buffer=blocks[0].buf)
+    _shared["normals"] = np.ndarray((vertex_total, 3), dtype=np.float64, buffer=blocks[1].buf)
+    _shared["indices"] = np.ndarray((triangle_total, 3), dtype=np.uint32, buffer=blocks[2].buf)
+
+
+def _tessellate_chunk(task):
+    patches, vertex_offsets, index_offsets = task
+    for patch, vo, io in zip(patches, vertex_offsets, index_offsets):
+        vertexes, normals, indices = tessellate(patch)
+        _shared["vertexes"][vo:vo + len(vertexes)] = vertexes
+        _shared["normals"][vo:vo + len(normals)] = normals
+        _shared["indices"][io:io + len(indices)] = indices
+    return len(patches)
+
+
+def tessellate_all(patches: list[Patch], processes: int = None, chunks_per_process: int = 4) -> TessellationResult:
+    """
+    tessellates patches across process pool \n
+    workers write into shared memory at fixed offsets, so result is identical to serial path
+    :param patches: patches definitions
+    :param processes: pool size, None -> os.cpu_count(), 1 -> serial in current process
+    :param chunks_per_process: patches are split into processes * chunks_per_process contiguous chunks
+    :return: TessellationResult
+    """
+    vertex_offsets = np.zeros(len(patches) + 1, dtype=np.int64)
+    index_offsets = np.zeros(len(patches) + 1, dtype=np.int64)
+    vertex_offsets[1:] = np.cumsum([p.vertex_count() for p in patches])
+    index_offsets[1:] = np.cumsum([p.triangle_count() for p in patches])
+    vertex_total = int(vertex_offsets[-1])
+    triangle_total = int(index_offsets[-1])
+
+    if processes is None:
+        processes = os.cpu_count() or 1
+
+    if processes <= 1 or len(patches) < 2:
+        parts = [tessellate(p) for p in patches]
+        vertexes = np.concatenate([p[0] for p in parts]) if parts else np.zeros((0, 3))
+        normals = np.concatenate([p[1] for p in parts]) if parts else np.zeros((0, 3))
+        indices = np.concatenate([p[2] for p in parts]) if parts else np.zeros((0, 3), dtype=np.uint32)
+        return TessellationResult(vertexes, normals, indices, vertex_offsets, index_offsets)
+
+    sizes = (vertex_total * 3 * 8, vertex_total * 3 * 8, triangle_total * 3 * 4)
+    blocks = [shared_memory.SharedMemory(create=True, size=max(size, 1)) for size in sizes]
+
+    try:
+        chunks_count = min(len(patches), processes * chunks_per_process)
+        bounds = np.linspace(0, len(patches), chunks_count + 1).astype(int)
+        tasks = [(patches[a:b], vertex_offsets[a:b], index_offsets[a:b]) for a, b in zip(bounds[:-1], bounds[1:])]
+
+        with Pool(processes, initializer=_init_worker,
+                  initargs=([b.name for b in blocks], vertex_total, triangle_total)) as pool:
+            for _ in pool.imap_unordered(_tessellate_chunk, tasks):
+                pass
+
+        vertexes = np.ndarray((vertex_total, 3), dtype=np.float64, buffer=blocks[0].buf).copy()
+        normals = np.ndarray((vertex_total, 3), dtype=np.float64, buffer=blocks[1].buf).copy()
+        indices = np.ndarray((triangle_total, 3), dtype=np.uint32, buffer=blocks[2].buf).copy()
+    finally:
+        for b in blocks:
+            b.close()
+            b.unlink()
+
+    return TessellationResult(vertexes, normals, indices, vertex_offsets, index_offsets)
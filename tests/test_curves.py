@@ -0,0 +1,103 @@
+import numpy as np
+import pytest
+
+from curves import BezierCurve, NurbsCurve, basis_functions, rational_bezier, rational_bezier_derivative, \
+    surface_derivatives
+from geometrix import Point
+
+
+def de_casteljau(points: np.ndarray, weights: np.ndarray, t: float) -> np.ndarray:
+    """
+    reference: repeated linear interpolation of homogeneous control points
+    """
+    h = np.hstack([points * weights[:, None], weights[:, None]])
+    while len(h) > 1:
+        h = (1 - t) * h[:-1] + t * h[1:]
+    return h[0, :3] / h[0, 3]
+
+
+def random_curve(rng, count):
+    return rng.normal(size=(count, 3)) * 5, rng.uniform(0.2, 4, count)
+
+
+@pytest.mark.parametrize("count", [2, 3, 4, 6])
+def test_rational_bezier_matches_de_casteljau(count):
+    rng = np.random.default_rng(count)
+    points, weights = random_curve(rng, count)
+    t = np.linspace(0, 1, 17)
+
+    expected = np.array([de_casteljau(points, weights, x) for x in t])
+
+    assert np.allclose(rational_bezier(points, weights, t), expected, atol=1e-12)
+    assert np.allclose(rational_bezier_derivative(points, weights, t)[0], expected, atol=1e-12)
+
+
+def test_rational_bezier_derivative_matches_finite_differences():
+    rng = np.random.default_rng(1)
+    points, weights = random_curve(rng, 4)
+    t = np.linspace(0.1, 0.9, 9)
+    h = 1e-6
+
+    _, derivatives = rational_bezier_derivative(points, weights, t)
+    expected = (rational_bezier(points, weights, t + h) - rational_bezier(points, weights, t - h)) / (2 * h)
+
+    assert np.allclose(derivatives, expected, atol=1e-6)
+
+
+def test_bezier_curve_uses_weights():
+    points = [Point(1, 0, 0), Point(1, 1, 0), Point(0, 1, 0)]
+    # quarter circle
+    curve = BezierCurve(points, weights=[1, np.sqrt(2) / 2, 1])
+
+    radius = np.linalg.norm(curve.evaluate(np.linspace(0, 1, 33)), axis=1)
+
+    assert np.allclose(radius, 1, atol=1e-12)
+
+
+def test_single_span_nurbs_is_rational_bezier():
+    rng = np.random.default_rng(2)
+    points, weights = random_curve(rng, 5)
+    # clamped knots without inner knots: one Bézier segment
+    curve = NurbsCurve([Point.from_list(p) for p in points], weights, knots=[0] * 5 + [1] * 5, degree=4)
+    t = np.linspace(0, 1, 21)
+
+    expected = np.array([de_casteljau(points, weights, x) for x in t])
+
+    assert np.allclose(curve.evaluate(t), expected, atol=1e-12)
+    assert np.allclose(curve.evaluate_table(20), expected, atol=1e-12)
+
+
+def test_nurbs_circle_is_exact():
+    circle = NurbsCurve.circle(radius=2.5, quality=64)
+
+    points = circle.evaluate(np.linspace(0, 1, 257))
+
+    assert np.allclose(np.linalg.norm(points[:, :2], axis=1), 2.5, atol=1e-12)
+    assert np.allclose(points[:, 2], 0)
+
+
+def test_basis_functions_partition_of_unity():
+    knots = np.array([0, 0, 0, 0.2, 0.5, 0.5, 0.8, 1, 1, 1])
+    t = np.linspace(0, 1, 101)
+
+    spans, basis = basis_functions(knots, 2, 7, t)
+
+    assert np.allclose(basis.sum(axis=1), 1)
+    assert np.all(basis >= -1e-15)
+    assert np.all((knots[spans] <= t) & ((t < knots[spans + 1]) | (t == 1)))
+
+
+def test_surface_matches_de_casteljau_of_curves():
+    rng = np.random.default_rng(3)
+    curves = [random_curve(rng, 3) for _ in range(4)]
+    t, u = rng.random(12), rng.random(12)
+
+    # rational generating curves at u, polynomial blend of them at t
+    expected = []
+    for a, b in zip(t, u):
+        row = np.array([de_casteljau(points, weights, b) for points, weights in curves])
+        expected.append(de_casteljau(row, np.ones(len(row)), a))
+
+    points, _, _ = surface_derivatives([c[0] for c in curves], [c[1] for c in curves], t, u)
+
+    assert np.allclose(points, expected, atol=1e-12)
@@ -0,0 +1,133 @@
+import numpy as np
+import pytest
+from OpenGL.GL import GL_TRIANGLE_STRIP, GL_TRIANGLES, GL_UNSIGNED_INT, GL_UNSIGNED_SHORT
+
+from indexing import acmr, build_index_buffer, stripify, tipsify
+
+
+def grid(rows, columns):
+    """
+    triangles of a rows x columns quad grid, rows are numbered first like in surface tables
+    """
+    index = np.arange((rows + 1) * (columns + 1)).reshape(columns + 1, rows + 1)
+    a, b = index[:-1, :-1].ravel(), index[:-1, 1:].ravel()
+    c, d = index[1:, :-1].ravel(), index[1:, 1:].ravel()
+    return np.vstack([np.stack([a, c, b], axis=1), np.stack([b, c, d], axis=1)])
+
+
+def canonical(triangles):
+    """
+    set of triangles, rotated to start at the smallest index, winding kept
+    """
+    result = set()
+    for t in np.asarray(triangles).reshape(-1, 3).tolist():
+        k = t.index(min(t))
+        result.add(tuple(t[k:] + t[:k]))
+    return result
+
+
+def unstrip(indices, restart_index):
+    """
+    reference decoding of GL_TRIANGLE_STRIP with primitive restart, degenerate triangles dropped
+    """
+    triangles = []
+    strip = []
+    for i in list(indices) + [restart_index]:
+        if i == restart_index:
+            for n in range(len(strip) - 2):
+                a, b, c = strip[n:n + 3]
+                triangles.append((b, a, c) if n % 2 else (a, b, c))
+            strip = []
+        else:
+            strip.append(int(i))
+    return [t for t in triangles if len(set(t)) == 3]
+
+
+def test_tipsify_is_permutation():
+    triangles = grid(20, 30)
+    rng = np.random.default_rng(0)
+    shuffled = triangles[rng.permutation(len(triangles))]
+
+    result = tipsify(shuffled, 21 * 31)
+
+    assert result.shape == shuffled.shape
+    assert result.min() >= 0 and result.max() < 21 * 31
+    # whole triangles are moved, their winding is kept
+    assert sorted(map(tuple, result.tolist())) == sorted(map(tuple, shuffled.tolist()))
+
+
+def test_tipsify_improves_acmr():
+    triangles = grid(40, 40)
+    rng = np.random.default_rng(1)
+    shuffled = triangles[rng.permutation(len(triangles))]
+
+    assert acmr(tipsify(shuffled, 41 * 41)) < acmr(shuffled)
+    assert acmr(tipsify(triangles, 41 * 41)) <= acmr(triangles) + 1e-12
+
+
+@pytest.mark.parametrize("rows, columns", [(1, 1), (3, 7), (16, 5)])
+def test_stripify_decodes_to_same_triangles(rows, columns):
+    triangles = grid(rows, columns)
+    restart_index = 65535
+
+    indices = stripify(triangles, restart_index)
+
+    assert canonical(unstrip(indices, restart_index)) == canonical(triangles)
+    assert len(unstrip(indices, restart_index)) == len(triangles)
+    # no empty strips and no strip ends with a restart
+    assert indices[0] != restart_index and indices[-1] != restart_index
+    assert not np.any((indices[1:] == restart_index) & (indices[:-1] == restart_index))
+
+
+def test_stripify_disjoint_triangles():
+    triangles = np.array([[0, 1, 2], [3, 4, 5], [6, 7, 8]])
+
+    indices = stripify(triangles, -1)
+
+    assert indices.tolist() == [0, 1, 2, -1, 3, 4, 5, -1, 6, 7, 8]
+
+
+def test_stripify_strip_order_winding():
+    # triangles already wound like a strip 0 1 2 3 4
+    triangles = np.array([[0, 1, 2], [2, 1, 3], [2, 3, 4]])
+
+    indices = stripify(triangles, 99)
+
+    assert indices.tolist() == [0, 1, 2, 3, 4]
+
+
+def test_build_index_buffer_strips():
+    triangles = grid(10, 12)
+    rng = np.random.default_rng(2)
+    triangles = triangles[rng.permutation(len(triangles))]
+
+    buffer = build_index_buffer(triangles, 11 * 13, strips=True)
+
+    assert buffer.mode == GL_TRIANGLE_STRIP
+    assert buffer.gl_type == GL_UNSIGNED_SHORT
+    assert buffer.indices.dtype == np.uint16
+    assert buffer.restart_index == 65535
+    assert canonical(unstrip(buffer.indices, buffer.restart_index)) == canonical(triangles)
+    assert buffer.acmr_after < buffer.acmr_before
+
+
+def test_build_index_buffer_wide_indexes():
+    # the max uint16 value is reserved for restart, vertex 65535 needs uint32
+    triangles = np.array([[0, 1, 65535], [65535, 1, 2]])
+
+    buffer = build_index_buffer(triangles, 65536, optimize=False, strips=True)
+
+    assert buffer.gl_type == GL_UNSIGNED_INT
+    assert buffer.indices.dtype == np.uint32
+    assert buffer.restart_index == np.iinfo(np.uint32).max
+    assert canonical(unstrip(buffer.indices, buffer.restart_index)) == canonical(triangles)
+
+
+def test_build_index_buffer_list():
+    triangles = grid(4, 4)
+
+    buffer = build_index_buffer(triangles, 25, optimize=False)
+
+    assert buffer.mode == GL_TRIANGLES
+    assert buffer.restart_index is None
+    assert np.array_equal(buffer.indices.reshape(-1, 3), triangles)
@@ -0,0 +1,223 @@
+import numpy as np
+import pytest
+
+from curves import BezierCurve
+from geometrix import Cube3D, Point, Transform
+from intersections import curve_curve, intersect_curves, intersect_plane, intersect_ray, ray_mesh, ray_patch
+
+SQRT_HALF = np.sqrt(0.5)
+
+
+def parabola():
+    # x = 2t, y = 2t(1 - t)
+    return BezierCurve([Point(0, 0, 0), Point(1, 1, 0), Point(2, 0, 0)])
+
+
+def quarter_circle():
+    return BezierCurve([Point(1, 0, 0), Point(1, 1, 0), Point(0, 1, 0)], weights=[1, SQRT_HALF, 1])
+
+
+def cylinder_net():
+    """
+    quarter of unit cylinder around x axis, x in [0, 1]: rows (param t) are quarter circles in yz
+    """
+    arc = np.array([[0, 1, 0, 1], [0, SQRT_HALF, SQRT_HALF, SQRT_HALF], [0, 0, 1, 1]], dtype=np.float64)
+    rows = []
+    for x in (0.0, 1.0):
+        row = arc.copy()
+        row[:, 0] = x * row[:, 3]
+        rows.append(row)
+    return np.stack(rows)
+
+
+def test_curve_line():
+    line = BezierCurve([Point(0, 0.25, 0), Point(2, 0.25, 0)])
+
+    params, points = intersect_curves(parabola(), line)
+
+    # 2t(1 - t) = 1/4
+    t = np.array([1 - SQRT_HALF, 1 + SQRT_HALF]) / 2
+    assert np.allclose(params[:, 0], t, atol=1e-9)
+    assert np.allclose(params[:, 1], t, atol=1e-9)
+    assert np.allclose(points, np.column_stack([2 * t, np.full(2, 0.25), np.zeros(2)]), atol=1e-9)
+
+
+def test_rational_curve_line():
+    line = BezierCurve([Point(0, 0, 0), Point(2, 2, 0)])
+
+    params, points = intersect_curves(quarter_circle(), line)
+
+    assert np.allclose(params, [[0.5, SQRT_HALF / 2]], atol=1e-9)
+    assert np.allclose(points, [[SQRT_HALF, SQRT_HALF, 0]], atol=1e-9)
+
+
+def test_curve_tangent_is_one_hit():
+    line = BezierCurve([Point(0, 0.5, 0), Point(2, 0.5, 0)])
+
+    params, points = intersect_curves(parabola(), line)
+
+    assert len(params) == 1
+    assert np.allclose(points, [[1, 0.5, 0]], atol=1e-5)
+
+
+def test_curve_transform():
+    line = BezierCurve([Point(0, 0.25, 0), Point(2, 0.25, 0)])
+    curve = parabola()
+    curve.transform = Transform(position=[0, -0.25, 0])
+
+    params, points = intersect_curves(curve, line)
+
+    # moved down: 2t(1 - t) = 1/2, tangent at top
+    assert len(params) == 1
+    assert np.allclose(points, [[1, 0.25, 0]], atol=1e-5)
+
+
+def test_curve_curve_batch_no_hits():
+    pairs = [(parabola(), BezierCurve([Point(0, 1, 0), Point(2, 1, 0)])),
+             (parabola(), BezierCurve([Point(0, 0.25, 0), Point(2, 0.25, 0)]))]
+
+    query, params, points = curve_curve(pairs)
+
+    assert query.tolist() == [1, 1]
+
+
+def test_curve_plane():
+    params, points = intersect_plane(parabola(), [0, 1, 0, -0.25])
+
+    assert np.allclose(params, np.array([1 - SQRT_HALF, 1 + SQRT_HALF]) / 2, atol=1e-9)
+    assert np.allclose(points[:, 1], 0.25, atol=1e-9)
+
+    params, points = intersect_plane(quarter_circle(), [1, -1, 0, 0])
+
+    assert np.allclose(params, [0.5], atol=1e-9)
+    assert np.allclose(points, [[SQRT_HALF, SQRT_HALF, 0]], atol=1e-9)
+
+
+def test_curve_plane_miss():
+    params, points = intersect_plane(parabola(), [0, 1, 0, -1])
+
+    assert len(params) == 0 and points.shape == (0, 3)
+
+
+def test_curve_in_plane_raises():
+    with pytest.raises(Exception):
+        intersect_plane(parabola(), [0, 0, 1, 0])
+
+
+def test_ray_planar_patch():
+    # S(t, u) = (2u, 3t, 0), cubic in u by elevation
+    net = np.array([[[2 * i / 3, 3 * j, 0] for i in range(4)] for j in range(2)], dtype=np.float64)
+    rng = np.random.default_rng(0)
+    targets = rng.random((50, 2))
+    origins = np.column_stack([targets[:, 1] * 2, targets[:, 0] * 3, np.full(50, 4.0)])
+
+    query, params, points = ray_patch([net] * 50, origins, np.tile([0, 0, -2.0], (50, 1)))
+
+    assert query.tolist() == list(range(50))
+    assert np.allclose(params[:, :2], targets, atol=1e-7)
+    assert np.allclose(params[:, 2], 4, atol=1e-7)
+    assert np.allclose(points, origins * [1, 1, 0], atol=1e-7)
+
+
+def test_ray_rational_patch():
+    rng = np.random.default_rng(1)
+    x = rng.uniform(0.05, 0.95, 40)
+    angle = rng.uniform(0.05, np.pi / 2 - 0.05, 40)
+    directions = np.column_stack([np.zeros(40), np.cos(angle), np.sin(angle)])
+    origins = np.column_stack([x, np.zeros(40), np.zeros(40)])
+
+    query, params, points = ray_patch([cylinder_net()] * 40, origins, directions)
+
+    # rays from axis hit unit cylinder at distance 1
+    assert query.tolist() == list(range(40))
+    assert np.allclose(params[:, 0], x, atol=1e-7)
+    assert np.allclose(params[:, 2], 1, atol=1e-7)
+    assert np.allclose(points, origins + directions, atol=1e-7)
+
+
+def test_ray_patch_hit_and_miss():
+    origins = np.array([[0.5, 2, 0.5], [0.5, 2, 2]])
+    directions = np.array([[0, -1, 0], [0, -1, 0]], dtype=np.float64)
+
+    query, params, points = ray_patch([cylinder_net()] * 2, origins, directions)
+
+    # first ray hits the arc from outside, second passes over it
+    assert query.tolist() == [0]
+    assert np.allclose(points, [[0.5, np.sqrt(0.75), 0.5]], atol=1e-7)
+
+    # reversed ray from inside hits once
+    query, params, points = ray_patch([cylinder_net()], [[0.5, 0.5, 0.5]], [[0, 1, 1]])
+    assert len(query) == 1
+    assert np.allclose(points, [[0.5, SQRT_HALF, SQRT_HALF]], atol=1e-7)
+
+
+def test_ray_patch_tangent_is_one_hit():
+    point = np.array([0.5, SQRT_HALF, SQRT_HALF])
+    tangent = np.array([0, -1, 1]) / np.sqrt(2)
+
+    query, params, points = ray_patch([cylinder_net()], [point - tangent], [tangent])
+
+    assert len(query) == 1
+    assert np.allclose(points, [point], atol=1e-4)
+
+
+def slab(origins, directions, low, high):
+    """
+    reference ray - box entry and exit distances, nan when missed
+    """
+    with np.errstate(divide="ignore", invalid="ignore"):
+        a = (low - origins) / directions
+        b = (high - origins) / directions
+    near = np.nanmax(np.minimum(a, b), axis=1)
+    far = np.nanmin(np.maximum(a, b), axis=1)
+    missed = (near > far) | (far < 0)
+    return np.where(missed, np.nan, near), np.where(missed, np.nan, far)
+
+
+def test_ray_mesh_matches_slab():
+    cube = Cube3D()
+    cube.transform = Transform(position=[1, -2, 0.5], rotation=[30, 45, 10], size=[2, 1, 0.5])
+    rng = np.random.default_rng(2)
+    count = 2000
+    origins = rng.uniform(-6, 6, (count, 3))
+    origins[:, 2] += 10
+    # aimed around the box, about half of rays hit
+    directions = np.array([1, -2, 0.5]) + rng.uniform(-2, 2, (count, 3)) - origins
+    directions /= np.linalg.norm(directions, axis=1, keepdims=True)
+
+    query, triangles, params, points = ray_mesh([cube] * count, origins, directions)
+
+    # box is [-1, 1]^3 in local space
+    inverse = np.linalg.inv(cube.transform.matrix())
+    local_origins = origins @ inverse[:3, :3].T + inverse[:3, 3]
+    local_directions = directions @ inverse[:3, :3].T
+    near, far = slab(local_origins, local_directions, -1, 1)
+
+    hits = np.bincount(query, minlength=count)
+    assert np.array_equal(hits, np.where(np.isnan(near), 0, 2))
+    assert np.count_nonzero(hits) > count // 10
+    assert np.allclose(params[0::2, 2], near[query[0::2]], atol=1e-9)
+    assert np.allclose(params[1::2, 2], far[query[1::2]], atol=1e-9)
+    assert np.allclose(points, origins[query] + params[:, 2:] * directions[query], atol=1e-9)
+    assert np.all(params[:, :2] >= 0) and np.all(params[:, :2].sum(axis=1) <= 1 + 1e-12)
+
+
+def test_ray_mesh_shared_edge_is_one_hit():
+    cube = Cube3D()
+
+    # through centers of faces, on their diagonals, and through a corner
+    query, triangles, params, points = ray_mesh([cube] * 2, [[0, 0, -5], [-3, -3, -3]], [[0, 0, 1], [1, 1, 1]])
+
+    assert query.tolist() == [0, 0, 1, 1]
+    assert np.allclose(params[:, 2], [4, 6, 2 * np.sqrt(3), 4 * np.sqrt(3)])
+
+
+def test_intersect_ray_mixed():
+    cube = Cube3D()
+    cube.transform = Transform(position=[0.5, 0, 4], size=[0.25, 0.25, 0.25])
+
+    objects, params, points = intersect_ray([cube, cylinder_net()], [0.5, 0, 0.5], [0, 0, 1])
+
+    # cylinder at z = 1, then cube at z = 3.75 and 4.25
+    assert objects.tolist() == [1, 0, 0]
+    assert np.allclose(params[:, 2], [0.5, 3.25, 3.75], atol=1e-7)
@@ -0,0 +1,141 @@
+import numpy as np
+import pytest
+
+from camera import perspective_matrix, rotation_matrix, translation_matrix
+from lights import ClusterGrid, LightSet, assign_lights, light_bounds
+
+
+VIEW = rotation_matrix(20, 1, 0, 0) @ rotation_matrix(-30, 0, 1, 0) @ translation_matrix(-2, -3, -10)
+
+
+def view_projection():
+    return perspective_matrix(60, 16 / 9, 1.0, 100.0) @ VIEW
+
+
+def cluster_lists(clusters, indices):
+    return [set(indices[offset:offset + count].tolist()) for offset, count in clusters]
+
+
+def brute_force(positions, radii, matrix, grid):
+    """
+    reference of assign_lights: every light tested against every cluster by tile and slice ranges
+    """
+    ndc_min, ndc_max, depth_min, depth_max = light_bounds(positions, radii, matrix)
+    result = [set() for _ in range(len(grid))]
+
+    for light in range(len(positions)):
+        if depth_max[light] <= 0 or depth_min[light] >= grid.far:
+            continue
+        if np.any(ndc_max[light] < -1) or np.any(ndc_min[light] > 1):
+            continue
+        first = grid.slice_of(np.array([depth_min[light]]))[0]
+        last = grid.slice_of(np.array([depth_max[light]]))[0]
+
+        for s in range(grid.slices):
+            for y in range(grid.tiles_y):
+                for x in range(grid.tiles_x):
+                    # ndc rectangle of tile
+                    low = np.array([x / grid.tiles_x, y / grid.tiles_y]) * 2 - 1
+                    high = np.array([(x + 1) / grid.tiles_x, (y + 1) / grid.tiles_y]) * 2 - 1
+                    # last tile also takes the right / top screen edge
+                    overlaps = np.all((ndc_max[light] >= low) & ((ndc_min[light] < high) | (high >= 1)))
+                    if overlaps and first <= s <= last:
+                        result[(s * grid.tiles_y + y) * grid.tiles_x + x].add(light)
+
+    return result
+
+
+def sample_clusters(positions, radii, matrix, grid, count=400, seed=0):
+    """
+    (cluster, light) pairs of random points inside light spheres
+    """
+    rng = np.random.default_rng(seed)
+    pairs = set()
+    for light, (position, radius) in enumerate(zip(positions, radii)):
+        directions = rng.normal(size=(count, 3))
+        directions /= np.linalg.norm(directions, axis=1, keepdims=True)
+        points = position + directions * radius * rng.random((count, 1)) ** (1 / 3)
+
+        clip = points @ matrix[:, :3].T + matrix[:, 3]
+        w = clip[:, 3]
+        ndc = clip[:, :2] / w[:, None]
+        inside = (w > grid.near) & (w < grid.far) & np.all(np.abs(ndc) < 1, axis=1)
+
+        tiles = np.floor((ndc[inside] + 1) / 2 * [grid.tiles_x, grid.tiles_y]).astype(np.int64)
+        slices = grid.slice_of(w[inside])
+        cluster = (slices * grid.tiles_y + tiles[:, 1]) * grid.tiles_x + tiles[:, 0]
+        pairs.update((int(c), light) for c in cluster)
+    return pairs
+
+
+@pytest.mark.parametrize("seed", [0, 1])
+def test_assign_lights_matches_brute_force(seed):
+    lights = LightSet.random(60, [[-15, -10, -40], [15, 10, 5]], seed=seed)
+    grid = ClusterGrid(8, 5, 6)
+    matrix = view_projection()
+
+    clusters, indices = assign_lights(lights.positions, lights.radii, matrix, grid)
+
+    assert clusters.shape == (len(grid), 2)
+    assert clusters[:, 1].sum() == len(indices)
+    assert np.array_equal(clusters[1:, 0], np.cumsum(clusters[:, 1])[:-1])
+    assert cluster_lists(clusters, indices) == brute_force(lights.positions, lights.radii, matrix, grid)
+
+
+def test_assign_lights_is_conservative():
+    lights = LightSet.random(40, [[-10, -8, -30], [10, 8, 0]], seed=2)
+    grid = ClusterGrid(16, 9, 24)
+    matrix = view_projection()
+
+    clusters, indices = assign_lights(lights.positions, lights.radii, matrix, grid)
+    lists = cluster_lists(clusters, indices)
+
+    pairs = sample_clusters(lights.positions, lights.radii, matrix, grid)
+    assert pairs
+    # every cluster a light sphere reaches has it in its list
+    assert all(light in lists[cluster] for cluster, light in pairs)
+
+
+def test_assign_lights_culls_invisible():
+    matrix = view_projection()
+    tan = np.tan(np.radians(60) / 2)
+
+    def world(ndc_x, ndc_y, depth):
+        # point of view depth projected at ndc xy
+        point = np.array([ndc_x * depth * tan * 16 / 9, ndc_y * depth * tan, -depth, 1.0])
+        return (np.linalg.inv(VIEW) @ point)[:3]
+
+    positions = np.array([
+        world(0, 0, 10),      # visible
+        world(0, 0, -10),     # behind eye
+        world(0, 0, 150),     # beyond far
+        world(5, 0, 10),      # right of screen
+    ])
+    radii = np.full(4, 0.5)
+    grid = ClusterGrid(4, 4, 4)
+
+    clusters, indices = assign_lights(positions, radii, matrix, grid)
+
+    assert set(indices.tolist()) == {0}
+
+
+def test_assign_lights_light_around_eye():
+    matrix = view_projection()
+    eye = np.linalg.inv(VIEW)[:3, 3]
+    grid = ClusterGrid(4, 3, 5)
+
+    # sphere containing eye reaches every tile of the first slice
+    clusters, indices = assign_lights(np.array([eye]), np.array([3.0]), matrix, grid)
+
+    lists = cluster_lists(clusters, indices)
+    first_slice = lists[:grid.tiles_x * grid.tiles_y]
+    assert all(lights == {0} for lights in first_slice)
+
+
+def test_assign_lights_empty():
+    grid = ClusterGrid(4, 3, 2)
+
+    clusters, indices = assign_lights(np.zeros((0, 3)), np.zeros(0), view_projection(), grid)
+
+    assert len(indices) == 0
+    assert np.all(clusters == 0)
@@ -0,0 +1,124 @@
+import numpy as np
+import pytest
+
+from vertex_format import COMPACT, COMPACT_OCT, FLOAT32, VertexFormat, oct_decode, oct_encode, \
+    pack_2_10_10_10, unpack_2_10_10_10
+
+
+def random_normals(rng, count):
+    normals = rng.normal(size=(count, 3))
+    return normals / np.linalg.norm(normals, axis=1, keepdims=True)
+
+
+def axes():
+    return np.vstack([np.eye(3), -np.eye(3)])
+
+
+def angle_degrees(a, b):
+    a = a / np.linalg.norm(a, axis=1, keepdims=True)
+    b = b / np.linalg.norm(b, axis=1, keepdims=True)
+    return np.degrees(np.arccos(np.clip((a * b).sum(axis=1), -1, 1)))
+
+
+def test_oct16_round_trip():
+    rng = np.random.default_rng(0)
+    normals = np.vstack([random_normals(rng, 20000), axes()])
+
+    decoded = oct_decode(oct_encode(normals))
+
+    assert np.allclose(np.linalg.norm(decoded, axis=1), 1)
+    # 16 bit octahedral cells are ~1/32767 wide, well under a hundredth of a degree
+    assert angle_degrees(normals, decoded).max() < 0.01
+    assert np.allclose(oct_decode(oct_encode(axes())), axes(), atol=1e-12)
+
+
+def test_2_10_10_10_round_trip():
+    rng = np.random.default_rng(1)
+    normals = np.vstack([random_normals(rng, 20000), axes()])
+
+    decoded = unpack_2_10_10_10(pack_2_10_10_10(normals))
+
+    # half a step of 1/511 per component
+    assert np.abs(decoded - normals).max() <= 0.5 / 511 + 1e-12
+    assert angle_degrees(normals, decoded).max() < 0.2
+    assert np.array_equal(unpack_2_10_10_10(pack_2_10_10_10(axes())), axes())
+
+
+def test_2_10_10_10_layout():
+    packed = pack_2_10_10_10(np.array([[1.0, -1.0, 0.0]]))
+
+    # x = 511, y = -511 as 10 bit two's complement, z = 0, w = 0
+    assert packed.dtype == np.uint32
+    assert packed[0] == 511 | (513 << 10)
+
+
+@pytest.mark.parametrize("vertex_format, normal_bound", [(COMPACT, 0.2), (COMPACT_OCT, 0.01)])
+def test_compact_error_report(vertex_format, normal_bound):
+    rng = np.random.default_rng(2)
+    count = 5000
+    positions = rng.uniform(-8, 8, (count, 3))
+    # not unit, packing normalizes
+    normals = random_normals(rng, count) * rng.uniform(0.5, 2, (count, 1))
+    tex_coords = rng.random((count, 2))
+
+    report = vertex_format.error_report(positions, normals, tex_coords)
+
+    # float16 ulp is 2^-8 for |component| < 8, rounding is within half of it
+    assert report["position"]["max"] <= np.sqrt(3) * 2.0 ** -9
+    assert report["normal_degrees"]["max"] < normal_bound
+    assert report["tex_coord"]["max"] <= 0.5 / 65535 + 1e-7
+    assert report["bytes_per_vertex"] == 16
+    assert report["float32_bytes_per_vertex"] == 32
+    assert report["bytes"] == 16 * count
+
+
+def test_float16_positions_per_component():
+    rng = np.random.default_rng(3)
+    positions = rng.uniform(-100, 100, (1000, 3))
+    normals = np.tile([0.0, 0.0, 1.0], (1000, 1))
+    tex_coords = np.zeros((1000, 2))
+
+    decoded, _, _ = COMPACT.unpack(COMPACT.pack(positions, normals, tex_coords))
+
+    assert np.all(np.abs(decoded - positions) <= np.abs(positions) * 2.0 ** -11)
+
+
+def test_pack_into_buffer():
+    rng = np.random.default_rng(4)
+    positions = rng.random((10, 3))
+    normals = random_normals(rng, 10)
+    tex_coords = rng.random((10, 2))
+    out = np.full(10 * COMPACT_OCT.stride, 0xFF, dtype=np.uint8)
+
+    packed = COMPACT_OCT.pack(positions, normals, tex_coords, out=out)
+
+    assert np.shares_memory(packed, out)
+    assert np.array_equal(packed, COMPACT_OCT.pack(positions, normals, tex_coords))
+
+
+def test_zero_normals():
+    positions = np.zeros((2, 3))
+    normals = np.zeros((2, 3))
+    tex_coords = np.zeros((2, 2))
+
+    for vertex_format in (COMPACT, COMPACT_OCT):
+        _, decoded, _ = vertex_format.unpack(vertex_format.pack(positions, normals, tex_coords))
+        assert np.all(np.isfinite(decoded))
+
+
+def test_float32_is_lossless():
+    rng = np.random.default_rng(5)
+    positions = rng.random((100, 3)).astype(np.float32)
+    normals = random_normals(rng, 100).astype(np.float32)
+    tex_coords = rng.random((100, 2)).astype(np.float32)
+
+    decoded = FLOAT32.unpack(FLOAT32.pack(positions, normals, tex_coords))
+
+    assert FLOAT32.stride == 32
+    for a, b in zip(decoded, (positions, normals, tex_coords)):
+        assert np.array_equal(a, b)
+
+
+def test_invalid_encoding():
+    with pytest.raises(Exception, match="Invalid vertex encoding"):
+        VertexFormat(normal="oct8")
@@ -3,37 +3,8 @@ from OpenGL.GL import *
 from OpenGL.GL.shaders import compileProgram, compileShader
 import numpy as np
 
-from curves import BezierCurve, BezierSurface
-from geometrix import Point, Composed
+from scene import load as load_scene
 
-# surface quality
-qul = 10
-
-# view 1 (Y = 8)
-bz = BezierCurve([Point(0, 0, "xz", depth=8), Point(2, 0, "xz", depth=8), Point(3, 2, "xz", depth=8)], quality=qul)
-bz2 = BezierCurve([Point(3, 2, "xz", depth=8), Point(4, 5, "xz", depth=8), Point(4, 8, "xz", depth=8)], quality=qul)
-
-# view 2 (Y = 0)
-bz3 = BezierCurve([Point(0, 1, "xz", depth=0), Point(6, 1, "xz", depth=0), Point(8, 0, "xz", depth=0)], quality=qul)
-bz4 = BezierCurve([Point(8, 0, "xz", depth=0), Point(5, 2, "xz", depth=0), Point(5, 8, "xz", depth=0)], quality=qul)
-
-# middle (Y = 4)
-bz_mid = BezierCurve([Point(0, 1, "xz", depth=4), Point(2, 1, "xz", depth=4), Point(3, 3, "xz", depth=4)], quality=qul)
-bz_mid2 = BezierCurve([Point(2, 2, "xz", depth=4), Point(3, 5, "xz", depth=4), Point(6, 8, "xz", depth=4)], quality=qul)
-
-# surfaces
-bs1 = BezierSurface([bz, bz_mid, bz3], last=True, quality=qul)
-bs2 = BezierSurface([bz2, bz_mid2, bz4], last=True, quality=qul)
-
-# mirrored
-bs3 = BezierSurface([bz, bz_mid, bz3], last=True, quality=qul)
-bs3.transform.size = [-1, 1, 1]
-bs4 = BezierSurface([bz2, bz_mid2, bz4], last=True, quality=qul)
-bs4.transform.size = [-1, 1, 1]
-
-# composed objects
-bsCurves = Composed([bz, bz2, bz3, bz4])
-bsSurface = Composed([bs1, bs2, bs3, bs4])
 
 class App:
     def __init__(self):
@@ -103,6 +74,10 @@ class App:
 
 class Triangle:
     def __init__(self):
+        # on start, importing texture loads nothing
+        scene = load_scene("demo_scene.json")
+        bs1 = scene["bs1"]
+        bsSurface = scene["bsSurface"]
 
         # x, y, z, r, g, b, s, t
         vertexes = np.array([p.to_list() for p in bs1.vertexes], dtype=np.float32) * 0.1
@@ -0,0 +1,121 @@
+import hashlib
+import os
+import tempfile
+
+import numpy as np
+
+# decoded textures, <source sha256>.mips
+CACHE_DIR = ".texcache"
+
+_MAGIC = b"TEXMIPS1"
+_HEADER = np.dtype([("magic", "S8"), ("levels", "<u4"), ("reserved", "<u4")])
+_LEVEL = np.dtype([("width", "<u4"), ("height", "<u4"), ("offset", "<u8")])
+
+
+def source_key(path: str) -> str:
+    """
+    sha256 of source file content
+    """
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def build_mip_chain(rgba: np.ndarray) -> list[np.ndarray]:
+    """
+    2x2 box filtered mip levels down to 1x1
+    :param rgba: np.ndarray of shape (height, width, 4), uint8
+    :return: list of levels, level 0 is rgba
+    """
+    levels = [rgba]
+    level = rgba.astype(np.float32)
+
+    while level.shape[0] > 1 or level.shape[1] > 1:
+        # odd sizes: last row / column is dropped
+        rows = np.minimum(np.arange(max(level.shape[0] // 2, 1)) * 2 + 1, level.shape[0] - 1)
+        cols = np.minimum(np.arange(max(level.shape[1] // 2, 1)) * 2 + 1, level.shape[1] - 1)
+        level = (level[rows - 1][:, cols - 1] + level[rows - 1][:, cols] +
+                 level[rows][:, cols - 1] + level[rows][:, cols]) / 4
+        levels.append(np.round(level).astype(np.uint8))
+
+    return levels
+
+
+def write_cache(path: str, levels: list[np.ndarray]):
+    """
+    writes mip chain into cache file, atomically
+    """
+    offset = _HEADER.itemsize + _LEVEL.itemsize * len(levels)
+    table = np.zeros(len(levels), dtype=_LEVEL)
+    for i, level in enumerate(levels):
+        table[i] = (level.shape[1], level.shape[0], offset)
+        offset += level.nbytes
+
+    header = np.array([(_MAGIC, len(levels), 0)], dtype=_HEADER)
+
+    # unique name, processes missing the cache at once write their own files
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(header.tobytes())
+            f.write(table.tobytes())
+            for level in levels:
+                f.write(np.ascontiguousarray(level).tobytes())
+        os.replace(tmp, path)
+    except OSError:
+        # lost race: other process published same content (e.g. mapped file can't be replaced on Windows)
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        if not os.path.exists(path):
+            raise
+
+
+def read_cache(path: str) -> list[np.ndarray]:
+    """
+    memory maps cache file
+    :return: list of levels, np.memmap views of shape (height, width, 4)
+    """
+    data = np.memmap(path, dtype=np.uint8, mode="r")
+    header = data[:_HEADER.itemsize].view(_HEADER)[0]
+    if header["magic"] != _MAGIC:
+        raise Exception("Invalid texture cache file {}".format(path))
+
+    count = int(header["levels"])
+    table = data[_HEADER.itemsize:_HEADER.itemsize + _LEVEL.itemsize * count].view(_LEVEL)
+
+    levels = []
+    for width, height, offset in table.tolist():
+        size = width * height * 4
+        levels.append(data[offset:offset + size].reshape(height, width, 4))
+    return levels
+
+
+def decode_image(path: str) -> np.ndarray:
+    """
+    decodes image file to RGBA array, rows in pygame order (top to bottom)
+    """
+    import pygame as pg
+
+    image = pg.image.load(path)
+    width, height = image.get_rect().size
+    return np.frombuffer(pg.image.tostring(image, "RGBA"), dtype=np.uint8).reshape(height, width, 4)
+
+
+def load_mips(path: str, cache_dir: str = CACHE_DIR) -> list[np.ndarray]:
+    """
+    mip chain of image, decoded on first load and memory mapped from cache afterwards
+    :param path: image file
+    :param cache_dir: cache directory, None -> no cache
+    :return: list of levels
+    """
+    if cache_dir is None:
+        return build_mip_chain(decode_image(path))
+
+    cache_path = os.path.join(cache_dir, source_key(path) + ".mips")
+    if not os.path.exists(cache_path):
+        os.makedirs(cache_dir, exist_ok=True)
+        write_cache(cache_path, build_mip_chain(decode_image(path)))
+
+    return read_cache(cache_path)
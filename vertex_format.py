@@ -0,0 +1,216 @@
+import numpy as np
+from OpenGL.GL import GL_FLOAT, GL_HALF_FLOAT, GL_SHORT, GL_UNSIGNED_SHORT, GL_INT_2_10_10_10_REV
+
+# normal encodings, same values as Normal_encoding shader uniform
+NORMAL_FLOAT32 = 0
+NORMAL_OCT16 = 1
+NORMAL_INT_2_10_10_10 = 2
+
+
+class VertexAttribute:
+    """
+    one attribute of interleaved vertex data, glVertexAttribPointer params
+    """
+
+    def __init__(self, size, gl_type, normalized, dtype, components):
+        """
+        :param size: components count passed to GL
+        :param gl_type: GL component type
+        :param normalized: GL integer normalization
+        :param dtype: numpy type of stored component
+        :param components: stored components count (>= size when padded)
+        """
+        self.size = size
+        self.gl_type = gl_type
+        self.normalized = normalized
+        self.dtype = dtype
+        self.components = components
+        self.offset = 0
+
+
+def oct_encode(normals: np.ndarray) -> np.ndarray:
+    """
+    octahedral encoding of unit vectors into snorm16 pairs
+    """
+    n = normals / np.maximum(np.abs(normals).sum(axis=1, keepdims=True), 1e-20)
+    xy = n[:, :2].copy()
+    lower = n[:, 2] < 0
+    signs = np.where(xy[lower] >= 0, 1.0, -1.0)
+    xy[lower] = (1 - np.abs(xy[lower][:, ::-1])) * signs
+    return np.round(np.clip(xy, -1, 1) * 32767).astype(np.int16)
+
+
+def oct_decode(encoded: np.ndarray) -> np.ndarray:
+    xy = np.maximum(encoded.astype(np.float64) / 32767, -1)
+    z = 1 - np.abs(xy).sum(axis=1)
+    lower = z < 0
+    signs = np.where(xy[lower] >= 0, 1.0, -1.0)
+    xy[lower] = (1 - np.abs(xy[lower][:, ::-1])) * signs
+    n = np.column_stack([xy, z])
+    return n / np.linalg.norm(n, axis=1, keepdims=True)
+
+
+def pack_2_10_10_10(normals: np.ndarray) -> np.ndarray:
+    """
+    signed normalized 10 bit xyz, GL_INT_2_10_10_10_REV layout
+    """
+    c = np.round(np.clip(normals, -1, 1) * 511).astype(np.int64) & 0x3FF
+    return (c[:, 0] | (c[:, 1] << 10) | (c[:, 2] << 20)).astype(np.uint32)
+
+
+def unpack_2_10_10_10(packed: np.ndarray) -> np.ndarray:
+    packed = packed.astype(np.int64)
+    c = np.stack([(packed >> shift) & 0x3FF for shift in (0, 10, 20)], axis=1)
+    c = np.where(c >= 512, c - 1024, c)
+    return np.maximum(c / 511, -1)
+
+
+class VertexFormat:
+    """
+    interleaved vertex layout: position, normal, tex_coord \n
+    position: "float32" | "float16" \n
+    normal: "float32" | "oct16" | "int2_10_10_10" \n
+    tex_coord: "float32" | "unorm16"
+    """
+
+    def __init__(self, position="float32", normal="float32", tex_coord="float32"):
+        positions = {
+            "float32": VertexAttribute(3, GL_FLOAT, False, np.float32, 3),
+            # padded to 8 bytes
+            "float16": VertexAttribute(3, GL_HALF_FLOAT, False, np.float16, 4),
+        }
+        normals = {
+            "float32": VertexAttribute(3, GL_FLOAT, False, np.float32, 3),
+            "oct16": VertexAttribute(2, GL_SHORT, True, np.int16, 2),
+            "int2_10_10_10": VertexAttribute(4, GL_INT_2_10_10_10_REV, True, np.uint32, 1),
+        }
+        tex_coords = {
+            "float32": VertexAttribute(2, GL_FLOAT, False, np.float32, 2),
+            "unorm16": VertexAttribute(2, GL_UNSIGNED_SHORT, True, np.uint16, 2),
+        }
+
+        try:
+            self.attributes = {
+                "position": positions[position],
+                "normal": normals[normal],
+                "tex_coord": tex_coords[tex_coord],
+            }
+        except KeyError as e:
+            raise Exception("Invalid vertex encoding {}".format(e))
+
+        self.encodings = {"position": position, "normal": normal, "tex_coord": tex_coord}
+        self.normal_encoding = {"float32": NORMAL_FLOAT32,
+                                "oct16": NORMAL_OCT16,
+                                "int2_10_10_10": NORMAL_INT_2_10_10_10}[normal]
+
+        offset = 0
+        fields = []
+        for name, attr in self.attributes.items():
+            attr.offset = offset
+            fields.append((name, attr.dtype, (attr.components,)))
+            offset += np.dtype(attr.dtype).itemsize * attr.components
+
+        self.stride = offset
+        self.dtype = np.dtype(fields)
+
+    def pack(self, positions: np.ndarray, normals: np.ndarray, tex_coords: np.ndarray,
+             out: np.ndarray = None) -> np.ndarray:
+        """
+        encodes float arrays into interleaved vertex data
+        :param out: uint8 array of vertex count * stride bytes to pack into
+        :return: flat np.ndarray of uint8, len = vertex count * stride
+        """
+        count = len(positions)
+        if out is None:
+            data = np.zeros(count, dtype=self.dtype)
+        else:
+            data = out.view(self.dtype)
+            data.fill(0)
+
+        if self.encodings["position"] == "float16":
+            data["position"][:, :3] = positions
+        else:
+            data["position"] = positions
+
+        normals = np.asarray(normals, dtype=np.float64).reshape(count, 3)
+        if self.encodings["normal"] == "float32":
+            data["normal"] = normals
+        else:
+            lengths = np.linalg.norm(normals, axis=1, keepdims=True)
+            unit = np.divide(normals, lengths, out=np.zeros_like(normals), where=lengths > 0)
+            if self.encodings["normal"] == "oct16":
+                data["normal"] = oct_encode(unit)
+            else:
+                data["normal"] = pack_2_10_10_10(unit)[:, None]
+
+        tex_coords = np.asarray(tex_coords, dtype=np.float64).reshape(count, 2)
+        if self.encodings["tex_coord"] == "unorm16":
+            data["tex_coord"] = np.round(np.clip(tex_coords, 0, 1) * 65535)
+        else:
+            data["tex_coord"] = tex_coords
+
+        return data.view(np.uint8)
+
+    def unpack(self, packed: np.ndarray):
+        """
+        decodes interleaved vertex data the same way GL does
+        :return: (positions, normals, tex_coords) float64 arrays
+        """
+        data = np.asarray(packed, dtype=np.uint8).view(self.dtype)
+
+        positions = data["position"][:, :3].astype(np.float64)
+
+        if self.encodings["normal"] == "oct16":
+            normals = oct_decode(data["normal"])
+        elif self.encodings["normal"] == "int2_10_10_10":
+            normals = unpack_2_10_10_10(data["normal"][:, 0])
+        else:
+            normals = data["normal"].astype(np.float64)
+
+        tex_coords = data["tex_coord"].astype(np.float64)
+        if self.encodings["tex_coord"] == "unorm16":
+            tex_coords /= 65535
+
+        return positions, normals, tex_coords
+
+    def error_report(self, positions: np.ndarray, normals: np.ndarray, tex_coords: np.ndarray) -> dict:
+        """
+        encoding error against float32 reference
+        :return: dict with max / mean errors per attribute and vertex sizes
+        """
+        count = len(positions)
+        reference = FLOAT32.unpack(FLOAT32.pack(positions, normals, tex_coords))
+        decoded = self.unpack(self.pack(positions, normals, tex_coords))
+
+        position_err = np.linalg.norm(decoded[0] - reference[0], axis=1)
+
+        ref_normals = reference[1]
+        lengths = np.linalg.norm(ref_normals, axis=1, keepdims=True)
+        ref_normals = np.divide(ref_normals, lengths, out=np.zeros_like(ref_normals), where=lengths > 0)
+        dec_normals = decoded[1] / np.maximum(np.linalg.norm(decoded[1], axis=1, keepdims=True), 1e-20)
+        cos = np.clip((ref_normals * dec_normals).sum(axis=1), -1, 1)
+        normal_err = np.degrees(np.arccos(cos))
+
+        tex_err = np.abs(decoded[2] - reference[2]).max(axis=1)
+
+        def stats(err):
+            if count == 0:
+                return {"max": 0.0, "mean": 0.0}
+            return {"max": float(err.max()), "mean": float(err.mean())}
+
+        return {
+            "position": stats(position_err),
+            "normal_degrees": stats(normal_err),
+            "tex_coord": stats(tex_err),
+            "bytes_per_vertex": self.stride,
+            "float32_bytes_per_vertex": FLOAT32.stride,
+            "bytes": self.stride * count,
+            "float32_bytes": FLOAT32.stride * count,
+        }
+
+
+# float32 reference layout, 32 bytes per vertex
+FLOAT32 = VertexFormat()
+# 16 bytes per vertex
+COMPACT = VertexFormat("float16", "int2_10_10_10", "unorm16")
+COMPACT_OCT = VertexFormat("float16", "oct16", "unorm16")